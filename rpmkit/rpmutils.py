@@ -111,12 +111,25 @@ def normalize(p):
     return p
 
 
-def h2nvrea(h, keys=RPM_BASIC_KEYS):
+def rpmtag(key):
+    """
+    :param key: RPM Package dict key, e.g. "name", "buildhost"
+    :return: Integer RPM tag, e.g. rpm.RPMTAG_NAME, or ``key`` itself if the
+        corresponding tag was not found
+    """
+    return getattr(rpm, "RPMTAG_" + key.upper(), key)
+
+
+def h2nvrea(h, keys=RPM_BASIC_KEYS, tags=None):
     """
     :param h: RPM DB header object
     :param keys: RPM Package dict keys
+    :param tags: Integer RPM tags corresponding to ``keys`` or None
     """
-    return dict(zip(keys, [h[k] for k in keys]))
+    if tags is None:
+        tags = keys
+
+    return dict(zip(keys, [h[t] for t in tags]))
 
 
 def _yum_list_installed(root=None, cachedir=None, persistdir=None):
@@ -174,13 +187,50 @@ def _list_installed_rpms(root='/', keys=RPM_BASIC_KEYS, yum=False):
         return sorted((p2d(p) for p in yum_list_installed(root)),
                       key=itemgetter(*keys))
     else:
-        ts = rpm_transactionset(root)
-        mi = ts.dbMatch()
+        return sorted(list_installed_rpms_g(root, keys),
+                      key=itemgetter(*keys))
+
+
+def list_installed_rpms_g(root='/', keys=RPM_BASIC_KEYS):
+    """
+    Iterate the RPM DB once and yield installed RPMs one by one. Only the tags
+    corresponding to given keys (projection) are fetched from each header and
+    headers are not kept, so that memory usage does not depend on the number
+    of installed RPMs.
+
+    :param root: RPM DB root dir
+    :param keys: RPM Package dict keys, e.g. ("name", "epoch", "version",
+        "release", "arch", "vendor", "buildhost")
+
+    :return: A generator yields RPM dicts of given keys
+    """
+    tags = [rpmtag(k) for k in keys]
+    ts = rpm_transactionset(root)
+    mi = ts.dbMatch()
+
+    for h in mi:
+        yield h2nvrea(h, keys, tags)
+
+    del mi, ts
 
-        ps = [h2nvrea(h, keys) for h in mi]
-        del mi, ts
 
-        return sorted(ps, key=itemgetter(*keys))
+def dump_installed_rpms(root, output, keys=RPM_BASIC_KEYS, fmt="json"):
+    """
+    Dump installed RPMs streamed from the RPM DB into ``output``. This is a
+    library function for tools processing RPM DBs of many hosts and not
+    exposed as a command.
+
+    :param root: RPM DB root dir
+    :param output: Output file object
+    :param keys: RPM Package dict keys
+    :param fmt: Output format, "json" or "csv"
+    """
+    ps = list_installed_rpms_g(root, keys)
+
+    if fmt == "csv":
+        RU.csv_dump_g(ps, output, keys)
+    else:
+        RU.json_dump_g(ps, output)
 
 
 yum_list_installed = RM.memoize(_yum_list_installed)
@@ -537,44 +587,60 @@ def _get_leaves(root=None):
 get_leaves = RM.memoize(_get_leaves)
 
 
-def _list_standalones_1_g(name, reqs, rreqs, nrpms=1, excludes=[]):
+def _standalones_map(names, reqs, rreqs, nrpms=1, excludes=None):
     """
-    List the RPMs no other RPMs require nor no required by.
+    Compute the lists of standalone RPMs found from each RPM at once.
 
-    :param name: Name of the RPM to start to find RPMs
+    An RPM (leaf) no other RPMs require and requires less than `n` RPMs is a
+    standalone found from itself and the standalones found from a RPM required
+    by less than `n` RPMs are the ones found from each of these RPMs requiring
+    it with `n - 1`. Results of each `n` are computed for all RPMs in a pass,
+    from the lowest `n` up to `nrpms`, and the results of `n - 1` are reused.
+
+    :param names: Names of the RPMs to start to find RPMs
     :param reqs: RPM Dependency relation map
     :param rreqs: Reversed RPM Dependency relation map
     :param nrpms: number of RPMs considered as standalones
     :param excludes: RPMs which should be skipped and excluded from results
+
+    :return: {name: (standalone_rpm_name, )}
+
+    >>> reqs = dict(a=[], b=["a"], c=["a", "d"], d=[], e=[])
+    >>> rreqs = dict(a=["b", "c"], b=[], c=[], d=["c"], e=[])
+    >>> m = _standalones_map(sorted(reqs), reqs, rreqs)
+    >>> sorted(n for n, xs in m.items() if xs)
+    ['e']
+    >>> m = _standalones_map(sorted(reqs), reqs, rreqs, 3)
+    >>> [(n, m[n]) for n in sorted(m)]
+    [('a', ('b',)), ('b', ('b',)), ('c', ('c',)), ('d', ()), ('e', ('e',))]
     """
-    if name in excludes:
-        logging.info("%s is in the excluded list" % name)
-        return
-
-    ps = rreqs.get(name, [])
-    if ps:
-        if any(e in ps for e in excludes):
-            logging.debug("%s is required by RPM[s] in the excluded list"
-                          % name)
-        elif len(ps) >= nrpms:
-            logging.debug("%s is required by more than %d RPMs" %
-                          (name, len(ps)))
-        else:
-            logging.debug("%s is required by %d RPMs: %s" %
-                          (name, len(ps), ' '.join(ps)))
-            for p in ps:
-                for x in _list_standalones_1_g(p, reqs, rreqs, nrpms - 1,
-                                               excludes):
-                    yield x
-    else:
-        ps = reqs.get(name, [])
-        if not ps or len(ps) < nrpms:
-            logging.debug("%s requires %d RPMs: %s" %
-                          (name, len(ps), ' '.join(ps)))
-            yield name
+    excludes = set() if excludes is None else set(excludes)
+    universe = set(names).union(*rreqs.values())
+    prev = {}
+
+    for n in range(min(nrpms, 1), nrpms + 1):
+        cur = {}
+        for name in universe:
+            if name in excludes:
+                cur[name] = ()
+                continue
+
+            ps = rreqs.get(name, [])
+            if ps:
+                if excludes.intersection(ps) or len(ps) >= n:
+                    cur[name] = ()
+                else:
+                    cur[name] = tuple(x for p in ps for x in prev[p])
+            else:
+                rs = reqs.get(name, [])
+                cur[name] = (name, ) if not rs or len(rs) < n else ()
+
+        prev = cur
 
+    return prev
 
-def list_standalones_g(root=None, nrpms=1, excludes=[]):
+
+def list_standalones_g(root=None, nrpms=1, excludes=None):
     """
     List the RPMs no other RPMs require nor no required by.
 
@@ -586,12 +652,13 @@ def list_standalones_g(root=None, nrpms=1, excludes=[]):
     reqs = make_requires_dict(root)
     rreqs = make_reversed_requires_dict(root)
 
+    standalones = _standalones_map(all_rpms, reqs, rreqs, nrpms, excludes)
     for r in all_rpms:
-        for x in _list_standalones_1_g(r, reqs, rreqs, nrpms, excludes):
+        for x in standalones[r]:
             yield x
 
 
-def list_standalones(root=None, nrpms=1, excludes=[]):
+def list_standalones(root=None, nrpms=1, excludes=None):
     """
     List the RPMs no other RPMs require nor no required by.
 
@@ -622,63 +689,57 @@ def list_required_rpms_not_required_by_others(rpmname, root=None):
     :param root: RPM Database root dir
     :return: List of result RPMs
     """
-    result = [rpmname]
-    targets = [rpmname]
-
     reqs = make_requires_dict(root)  # p -> [required]
     rreqs = make_reversed_requires_dict(root)  # r -> [requires]
 
-    def get_cs(p, seen=[]):
-        if p not in seen:
-            seen.append(p)
-
-        return [r for r in reqs.get(p, []) if r not in seen and
-                all(x in seen for x in rreqs.get(r, []))]
+    return plan_removals([rpmname], reqs, rreqs)[rpmname]
 
-    if not all(y in result for y in rreqs.get(rpmname, [])):
-        return []  # Given RPM is not a leaf.
 
-    while targets:
-        targets = ucat(get_cs(p, result) for p in targets)
-        logging.debug("targets=%s, result=%s" % (str(targets), str(result)))
+def _reversed_closure_g(name, rreqs, seen):
+    """
+    Traverse the reversed dependency graph iteratively from ``name`` and yield
+    RPMs not in ``seen`` one by one, that is, RPMs requiring ``name`` directly
+    or indirectly.
 
-        if targets:
-            result += targets
+    :param name: The name of RPM to start traversal from
+    :param rreqs: Reversed RPM Dependency relation map
+    :param seen: A set of RPM names already visited, updated in place
+    """
+    stack = [name]
+    while stack:
+        rs = sorted(rreqs.get(stack.pop(), []))
+        rnext = [p for p in rs if p not in seen]
+        seen.update(rnext)
+        for p in rnext:
+            yield p
 
-    return result
+        stack.extend(reversed(rnext))
 
 
-def _compute_removed_1(remove, rreqs, acc=[]):
+def _compute_removed_1(remove, rreqs, acc=None):
     """
-    Recursively, it will traverse dependency tree and Return a list of RPMs if
-    given ``remove`` RPM was uninstalled such like yum does with 'remove
-    (uninstall)' sub command.
+    Traverse dependency tree and Return a list of RPMs if given ``remove`` RPM
+    was uninstalled such like yum does with 'remove (uninstall)' sub command.
 
     :param remove: The name of RPM to remove (uninstall).
     :param rreqs: Reversed RPM Dependency relation map
-    :param acc: Accumulator
+    :param acc: A list of RPM names already resolved and not traversed
 
     :return: [pname], a list of RPM names to be uninstalled along with
-        ``removes`` RPMs.
+        ``removes`` RPMs, which starts with the items in ``acc``.
     """
-    removes_next = sorted(p for p in rreqs.get(remove, []) if p not in acc)
+    acc = [] if acc is None else list(acc)
+    rs = list(_reversed_closure_g(remove, rreqs, set(acc)))
     logging.debug("Resolved requires: "
-                  "%s -> %s" % (remove, ' '.join(removes_next) or 'none'))
-
-    if removes_next:
-        for r in removes_next:
-            acc.extend(x for x in _compute_removed_1(r, rreqs, acc + [r])
-                       if x not in acc)
+                  "%s -> %s" % (remove, ' '.join(rs) or 'none'))
 
-    return acc
+    return acc + rs
 
 
-# :note: This function should not be memoized as argument ``acc`` may be
-# changed everytime it's called.
 compute_removed_1 = _compute_removed_1
 
 
-def compute_removed_g(removes, rreqs, acc=[], excludes=[]):
+def compute_removed_g(removes, rreqs, acc=None, excludes=None):
     """
     This is a derived version of :function:``compute_removed_1`` which accepts
     multiple RPMs as ``removes`` parameter.
@@ -688,30 +749,43 @@ def compute_removed_g(removes, rreqs, acc=[], excludes=[]):
 
     :param removes: The list of name of RPMs to remove (uninstall).
     :param rreqs: Reversed RPM Dependency relation map
-    :param acc: Accumulator
+    :param acc: A list of RPM names already resolved to be removed
     :param excludes: RPMs which should not be removed and excluded from the
         RPMs to be removed
 
-    :yield: [pname], a list of RPM names to be uninstalled along with
-        ``removes`` RPMs one by one.
+    :yield: [pname], a list of RPM names to be uninstalled along with each
+        RPM in ``removes`` one by one.
+
+    .. note::
+       It yields RPMs newly resolved for each RPM in ``removes``, starting
+       with that RPM, instead of the accumulated list of all RPMs resolved so
+       far as older versions did. RPMs resolved already are not yielded
+       again, and the union of the lists yielded is the result.
     """
+    seen = set() if acc is None else set(acc)
+    excludes = set() if excludes is None else set(excludes)
+
     for r in removes:
         if r in excludes:
             logging.info("Excluded and not resolve requires: " + r)
             continue
 
-        xs = compute_removed_1(r, rreqs, acc + [r])
+        if r in seen:
+            continue
+
+        # Traverse with a copy to keep ``seen`` intact if it's excluded.
+        xs = [r] + list(_reversed_closure_g(r, rreqs, seen | set([r])))
 
         if any(x in excludes for x in xs):
             logging.info("Excluded as some of requires are so: " + r)
-            excludes.extend([r] + xs)
+            excludes.update(xs)
             continue
 
-        acc.extend([r] + xs)
-        yield acc
+        seen.update(xs)
+        yield xs
 
 
-def compute_removed(removes, root=None, rreqs=None, acc=[], excludes=[]):
+def compute_removed(removes, root=None, rreqs=None, acc=None, excludes=None):
     """
     Returns a list of RPMs if given list of RPMs ``removes`` was uninstalled
     such like yum does with 'remove (uninstall)' sub command.
@@ -719,17 +793,211 @@ def compute_removed(removes, root=None, rreqs=None, acc=[], excludes=[]):
     :param removes: The list of name of RPMs to remove (uninstall).
     :param root: RPM Database root dir or None (use /var/lib/rpm).
     :param rreqs: Reversed RPM Dependency relation map
-    :param acc: Accumulator
+    :param acc: A list of RPM names already resolved to be removed
     :param excludes: RPMs which should not be removed and excluded from the
         RPMs to be removed
 
-    :return: [pname], a list of RPM names to be uninstalled along with
-        ``removes`` RPMs.
+    :return: [pname], a sorted list of unique RPM names to be uninstalled
+        along with ``removes`` RPMs, including ``acc``.
+
+    >>> rreqs = dict(a=["b", "c"], b=["d"], c=["d"], d=[], e=["a"])
+    >>> compute_removed(["a"], rreqs=rreqs)
+    ['a', 'b', 'c', 'd']
+    >>> compute_removed(["a", "e"], rreqs=rreqs, excludes=["c"])
+    []
     """
     if not rreqs:
         rreqs = make_reversed_requires_dict(root)
 
-    return ucat(compute_removed_g(removes, rreqs, acc, excludes))
+    acc = [] if acc is None else acc
+    return sorted(set(acc).union(*compute_removed_g(removes, rreqs, acc,
+                                                    excludes)))
+
+
+def _sccs_g(nodes, graph):
+    """
+    Find strongly connected components of ``graph`` reachable from ``nodes``
+    with the iterative version of Tarjan's algorithm.
+
+    :param nodes: Nodes to start traversal from
+    :param graph: Adjacency list of a directed graph, {node: [node]}
+
+    :return: A generator to yield SCCs (lists of nodes); successors of a SCC
+        are always yielded before it (reversed topological order).
+
+    >>> list(_sccs_g(["a"], dict(a=["b"], b=["c", "a"], c=[])))
+    [['c'], ['b', 'a']]
+    """
+    index = {}
+    lowlink = {}
+    stack = []
+    onstack = set()
+
+    for node in nodes:
+        if node in index:
+            continue
+
+        work = [(node, iter(graph.get(node, [])))]
+        index[node] = lowlink[node] = len(index)
+        stack.append(node)
+        onstack.add(node)
+
+        while work:
+            (v, succs) = work[-1]
+            for w in succs:
+                if w not in index:
+                    index[w] = lowlink[w] = len(index)
+                    stack.append(w)
+                    onstack.add(w)
+                    work.append((w, iter(graph.get(w, []))))
+                    break
+                elif w in onstack:
+                    lowlink[v] = min(lowlink[v], index[w])
+            else:
+                work.pop()
+                if work:
+                    u = work[-1][0]
+                    lowlink[u] = min(lowlink[u], lowlink[v])
+
+                if lowlink[v] == index[v]:
+                    scc = []
+                    while True:
+                        w = stack.pop()
+                        onstack.discard(w)
+                        scc.append(w)
+                        if w == v:
+                            break
+
+                    yield scc
+
+
+def compute_removed_closures(removes, rreqs):
+    """
+    Batch version of :function:`compute_removed`. It computes RPMs to be
+    uninstalled along with each RPM in ``removes`` at once, sharing (memoized)
+    closures of the RPMs depended on in common.
+
+    :param removes: The list of name of RPMs to remove (uninstall).
+    :param rreqs: Reversed RPM Dependency relation map
+
+    :return: {pname: [pname_removed]}, a dict of which keys are items in
+        ``removes`` and values are sorted lists of RPM names to be uninstalled
+        along with it, including itself
+
+    >>> rreqs = dict(a=["b", "c"], b=["d"], c=["d"], d=["b"], e=["a"])
+    >>> cs = compute_removed_closures(["a", "d", "e"], rreqs)
+    >>> cs["a"], cs["d"], cs["e"]
+    (['a', 'b', 'c', 'd'], ['b', 'd'], ['a', 'b', 'c', 'd', 'e'])
+    """
+    closures = {}  # :: {pname: frozenset}
+
+    # SCCs are yielded after the ones reachable from them so that closures of
+    # RPMs required by members of a SCC have been computed already.
+    for scc in _sccs_g(removes, rreqs):
+        members = set(scc)
+        cs = set(scc)
+        for p in scc:
+            for r in rreqs.get(p, []):
+                if r not in members:
+                    cs.update(closures[r])
+
+        cs = frozenset(cs)
+        for p in scc:
+            closures[p] = cs
+
+    return dict((r, sorted(closures[r])) for r in removes)
+
+
+def _reachables(nodes, graph):
+    """
+    :param nodes: Nodes to start traversal from
+    :param graph: Adjacency list of a directed graph, {node: [node]}
+
+    :return: A set of nodes reachable from ``nodes`` including themselves
+    """
+    seen = set(nodes)
+    stack = list(seen)
+    while stack:
+        for n in graph.get(stack.pop(), []):
+            if n not in seen:
+                seen.add(n)
+                stack.append(n)
+
+    return seen
+
+
+def plan_removals(candidates, reqs, rreqs):
+    """
+    Compute RPMs can be removed safely along with each RPM in ``candidates``,
+    that is, RPMs required by it directly or indirectly and not required by
+    any other RPMs than themselves. See also
+    :function:`list_required_rpms_not_required_by_others`.
+
+    Let A(r) be the set of candidates of which removal allows to remove r,
+    then A(r) = ({r} & candidates) | (the intersection of A(p) for each p
+    requiring r). These are computed for all RPMs in a sweep over RPMs in
+    topological order (RPMs requiring others first).
+
+    :param candidates: A list of names of RPMs to remove
+    :param reqs: RPM Dependency relation map
+    :param rreqs: Reversed RPM Dependency relation map
+
+    :return: {candidate: [pname]}, a dict of which values are lists of RPM
+        names start with the candidate itself, or [] if it's required by other
+        RPMs
+
+    >>> reqs = dict(a=["b", "c"], b=["c"], c=[], d=["c"], e=["a"])
+    >>> rreqs = dict(a=["e"], b=["a"], c=["a", "b", "d"], d=[], e=[])
+    >>> ps = plan_removals(["a", "d", "e"], reqs, rreqs)
+    >>> ps["a"], ps["d"], ps["e"]
+    ([], ['d'], ['e', 'a', 'b'])
+    """
+    cset = frozenset(candidates)
+    nodes = _reachables(cset, reqs)
+    graph = dict((r, [p for p in rreqs.get(r, []) if p in nodes]) for r
+                 in nodes)
+
+    def _removed_by(r, ars):
+        ps = rreqs.get(r, [])
+        xs = cset.intersection((r, ))
+        if ps and all(p in nodes for p in ps):
+            xs = xs.union(frozenset.intersection(*[ars.get(p, frozenset())
+                                                   for p in ps]))
+        return xs
+
+    ars = {}  # :: {pname: frozenset(candidate)}
+    order = []
+    for scc in _sccs_g(sorted(nodes), graph):
+        for r in scc:
+            ars[r] = cset.intersection((r, ))
+
+        changed = True
+        while changed:  # It converges in an iteration unless it's a cycle.
+            changed = False
+            for r in scc:
+                xs = _removed_by(r, ars)
+                if xs != ars[r]:
+                    ars[r] = xs
+                    changed = True
+
+        order.extend(scc)
+
+    plans = dict((c, [c]) for c in cset
+                 if all(p == c for p in rreqs.get(c, [])))
+    for r in order:
+        for c in ars[r]:
+            if c != r and c in plans:
+                plans[c].append(r)
+
+    def _sort_by_depth(c, rs):
+        depths = {c: 0}
+        for r in rs[1:]:
+            depths[r] = max(depths[p] for p in rreqs[r]) + 1
+
+        return sorted(rs, key=lambda r: (depths[r], r))
+
+    return dict((c, _sort_by_depth(c, plans[c]) if c in plans else []) for c
+                in candidates)
 
 
 def guess_os_version_from_rpmfile(rpmfile):
@@ -18,6 +18,10 @@
 import rpmkit.rpmutils as RU
 import rpmkit.utils as U
 
+import StringIO
+import itertools
+import json
+import logging
 import random
 import unittest
 
@@ -131,4 +135,229 @@ class Test_60_find_updates_g(unittest.TestCase):
 
         self.assertEquals(updates, expected)
 
+
+class _TS(object):
+    """Fake rpm.TransactionSet of which headers are dicts keyed by tags.
+    """
+    def __init__(self, headers):
+        self.headers = headers
+
+    def dbMatch(self):
+        return iter(self.headers)
+
+
+_HEADERS = [dict((RU.rpmtag(k), v) for k, v in
+                 zip(RU.RPM_BASIC_KEYS, ("bash", "4.1.2", "15.el6", 0,
+                                         "x86_64"))),
+            dict((RU.rpmtag(k), v) for k, v in
+                 zip(RU.RPM_BASIC_KEYS, ("zlib", "1.2.3", "29.el6", 0,
+                                         "x86_64")))]
+
+
+class Test_65_list_installed_rpms_g(unittest.TestCase):
+
+    def setUp(self):
+        self.saved = RU.rpm_transactionset
+        RU.rpm_transactionset = lambda root: _TS(_HEADERS)
+
+    def tearDown(self):
+        RU.rpm_transactionset = self.saved
+
+    def test_10_list_installed_rpms_g(self):
+        ps = RU.list_installed_rpms_g('/', ("name", "version"))
+        self.assertEquals(list(ps), [dict(name="bash", version="4.1.2"),
+                                     dict(name="zlib", version="1.2.3")])
+
+    def test_20_dump_installed_rpms__json(self):
+        out = StringIO.StringIO()
+        RU.dump_installed_rpms('/', out, ("name", ))
+        self.assertEquals(json.loads(out.getvalue()),
+                          [dict(name="bash"), dict(name="zlib")])
+
+    def test_22_dump_installed_rpms__csv(self):
+        out = StringIO.StringIO()
+        RU.dump_installed_rpms('/', out, ("name", "arch"), "csv")
+        self.assertEquals(out.getvalue().splitlines(),
+                          ["name,arch", "bash,x86_64", "zlib,x86_64"])
+
+
+def _mk_rreqs(npkgs=5000, nreqs=3, seed=0):
+    """
+    Make up a synthetic reversed dependency map of ``npkgs`` RPMs. Each RPM
+    is required by (at most) ``nreqs`` RPMs of larger indices and some back
+    edges make cycles in it.
+    """
+    rnd = random.Random(seed)
+    names = ["p%04d" % i for i in range(npkgs)]
+    rreqs = dict((n, []) for n in names)
+
+    for i, n in enumerate(names[:-1]):
+        rreqs[n] = sorted(set(rnd.choice(names[i + 1:])
+                              for _ in range(nreqs)))
+    for i in range(0, npkgs, 100):  # cycles
+        rreqs[names[min(i + 50, npkgs - 1)]].append(names[i])
+
+    return rreqs
+
+
+def _naive_closure(name, rreqs):
+    acc = set([name])
+    targets = [name]
+    while targets:
+        targets = [p for t in targets for p in rreqs.get(t, [])
+                   if p not in acc]
+        acc.update(targets)
+
+    return sorted(acc)
+
+
+class Test_70_compute_removed(unittest.TestCase):
+
+    def test_00_compute_removed_1(self):
+        rreqs = dict(a=["b", "c"], b=["d"], c=["d"], d=[], e=["a"])
+
+        self.assertEquals(RU.compute_removed_1("a", rreqs), ["b", "c", "d"])
+        self.assertEquals(RU.compute_removed_1("e", rreqs),
+                          ["a", "b", "c", "d"])
+        self.assertEquals(RU.compute_removed_1("d", rreqs), [])
+
+    def test_10_compute_removed_1__no_shared_state(self):
+        rreqs = dict(a=["b"], b=[], c=["d"], d=[])
+
+        self.assertEquals(RU.compute_removed_1("a", rreqs), ["b"])
+        self.assertEquals(RU.compute_removed_1("c", rreqs), ["d"])
+
+    def test_20_compute_removed__w_excludes(self):
+        rreqs = dict(a=["b"], b=[], c=["d"], d=[])
+        excludes = ["d"]
+
+        self.assertEquals(RU.compute_removed(["a", "c"], rreqs=rreqs,
+                                             excludes=excludes), ["a", "b"])
+        self.assertEquals(excludes, ["d"])
+        self.assertEquals(RU.compute_removed(["a", "c"], rreqs=rreqs),
+                          ["a", "b", "c", "d"])
+
+    def test_30_compute_removed__same_as_naive_closure(self):
+        rreqs = _mk_rreqs(500)
+        for r in sorted(rreqs)[::10]:
+            self.assertEquals(RU.compute_removed([r], rreqs=rreqs),
+                              _naive_closure(r, rreqs))
+
+    def test_40_compute_removed_closures(self):
+        rreqs = _mk_rreqs(500)
+        removes = sorted(rreqs)[::10]
+        closures = RU.compute_removed_closures(removes, rreqs)
+
+        self.assertEquals(sorted(closures), removes)
+        for r in removes:
+            self.assertEquals(closures[r], _naive_closure(r, rreqs))
+
+    def test_90_compute_removed_closures__benchmark(self):
+        """
+        Benchmark with a synthetic 5,000 RPMs graph. Elapsed times are only
+        logged and not checked as they depend on the machine.
+        """
+        rreqs = _mk_rreqs(5000)
+        removes = sorted(rreqs)
+
+        (closures, elapsed) = U.timeit(RU.compute_removed_closures, removes,
+                                       rreqs)
+        self.assertEquals(len(closures), len(removes))
+        logging.info("compute_removed_closures: %d RPMs: %s", len(removes),
+                     elapsed)
+
+        (_xs, elapsed) = U.timeit(lambda: [RU.compute_removed([r],
+                                                              rreqs=rreqs)
+                                           for r in removes[:100]])
+        logging.info("compute_removed: %d RPMs one by one: %s", 100, elapsed)
+
+
+def _list_standalones_1_g(name, reqs, rreqs, nrpms=1, excludes=[]):
+    """The previous (recursive) implementation to compare results with.
+    """
+    if name in excludes:
+        return
+
+    ps = rreqs.get(name, [])
+    if ps:
+        if any(e in ps for e in excludes) or len(ps) >= nrpms:
+            return
+
+        for p in ps:
+            for x in _list_standalones_1_g(p, reqs, rreqs, nrpms - 1,
+                                           excludes):
+                yield x
+    else:
+        ps = reqs.get(name, [])
+        if not ps or len(ps) < nrpms:
+            yield name
+
+
+def _mk_reqs(rreqs):
+    reqs = dict((n, []) for n in rreqs)
+    for r, ps in rreqs.items():
+        for p in ps:
+            reqs[p].append(r)
+
+    return reqs
+
+
+class Test_80__standalones_map(unittest.TestCase):
+
+    def test_00__same_as_recursive_version(self):
+        rreqs = _mk_rreqs(300, 1)
+        for n in range(0, 300, 3):  # Make some leaves.
+            rreqs["p%04d" % n] = []
+
+        reqs = _mk_reqs(rreqs)
+        names = sorted(rreqs)
+        excludes = names[::17]
+
+        for nrpms in (0, 1, 2, 3, 5):
+            for exs in ([], excludes):
+                smap = RU._standalones_map(names, reqs, rreqs, nrpms, exs)
+                for n in names:
+                    ref = list(_list_standalones_1_g(n, reqs, rreqs, nrpms,
+                                                     exs))
+                    self.assertEquals(list(smap[n]), ref)
+
+
+def _list_required_rpms_not_required_by_others(rpmname, reqs, rreqs):
+    """The previous implementation to compare results with.
+    """
+    result = [rpmname]
+    targets = [rpmname]
+
+    def get_cs(p, seen):
+        return [r for r in reqs.get(p, []) if r not in seen and
+                all(x in seen for x in rreqs.get(r, []))]
+
+    if not all(y in result for y in rreqs.get(rpmname, [])):
+        return []
+
+    while targets:
+        targets = U.uconcat(get_cs(p, result) for p in targets)
+        if targets:
+            result += targets
+
+    return result
+
+
+class Test_90_plan_removals(unittest.TestCase):
+
+    def test_00__same_as_previous_version(self):
+        for (seed, nreqs) in itertools.product(range(3), (1, 2)):
+            rreqs = _mk_rreqs(300, nreqs, seed)
+            for n in range(0, 300, 7):  # Make some leaves.
+                rreqs["p%04d" % n] = []
+
+            reqs = _mk_reqs(rreqs)
+            names = sorted(rreqs)
+            plans = RU.plan_removals(names, reqs, rreqs)
+
+            for n in names:
+                ref = _list_required_rpms_not_required_by_others(n, reqs,
+                                                                 rreqs)
+                self.assertEquals(plans[n], ref)
+
 # vim:sw=4:ts=4:et:
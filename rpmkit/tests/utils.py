@@ -16,8 +16,11 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 #
 import rpmkit.utils as TT
+import StringIO
 import functools
+import json
 import operator
+import random
 import unittest
 
 
@@ -28,6 +31,25 @@ def plus(xs):
     return functools.reduce(operator.add, xs)
 
 
+def _unique(xs):
+    """Old O(n^2) implementation of :function:`TT.unique_g`."""
+    acc = []
+    for x in xs:
+        if x not in acc:
+            acc.append(x)
+
+    return acc
+
+
+def _mk_packages(npkgs=3000, seed=0):
+    rand = random.Random(seed)
+    return [dict(name="pkg-%d" % rand.randint(0, npkgs / 3), epoch=0,
+                 version="1.%d" % rand.randint(0, 2), release="1",
+                 arch=rand.choice(("x86_64", "i686")),
+                 cves=["CVE-2014-%04d" % rand.randint(0, 3)])
+            for _i in range(npkgs)]
+
+
 class Test_00(unittest.TestCase):
 
     def test_00_typecheck(self):
@@ -54,4 +76,105 @@ class Test_00(unittest.TestCase):
         res = TT.pcall(plus, [(1, 2), (2, 3, 4)], 2)
         self.assertEquals(res, [3, 9])
 
+
+class Test_10_unique(unittest.TestCase):
+
+    def test_10_unique_g__same_as_old_impl(self):
+        for seed in range(3):
+            ps = _mk_packages(300, seed)
+            self.assertEquals(list(TT.unique_g(ps)), _unique(ps))
+
+    def test_20_unique_g__key(self):
+        ps = _mk_packages(300)
+        nas = operator.itemgetter("name", "arch")
+        ref = _unique(nas(p) for p in ps)
+
+        self.assertEquals([nas(p) for p in TT.unique_g(ps, nas)], ref)
+
+    def test_30_unique_g__unhashable_objects(self):
+        class A(object):
+            __hash__ = None
+
+            def __init__(self, x):
+                self.x = x
+
+            def __eq__(self, other):
+                return self.x == other.x
+
+        xs = [A(1), A(2), A(1)]
+        self.assertEquals([a.x for a in TT.unique_g(xs)], [1, 2])
+
+    def test_40_unique_g__objects_having_eq_and_id_hash(self):
+        """
+        Objects having __eq__ but the default hash based on its identity are
+        hash-able and compared with their hash values, so that equal ones
+        are not made unique unlike the old implementation.
+        """
+        class A(object):
+            def __init__(self, x):
+                self.x = x
+
+            def __eq__(self, other):
+                return self.x == other.x
+
+        xs = [A(1), A(2), A(1)]
+        self.assertEquals(_unique(xs), xs[:2])
+        self.assertEquals(list(TT.unique_g(xs)), xs)
+        self.assertEquals([a.x for a in TT.unique_g(xs, lambda a: a.x)],
+                          [1, 2])
+
+    def test_50_uniq__same_as_old_impl(self):
+        ps = _mk_packages()
+        ref = _unique(ps)
+
+        self.assertEquals(TT.uniq(ps, False), ref)
+        self.assertEquals(TT.uniq(ps), sorted(ref))
+        self.assertEquals(TT.uniq(ps, key=operator.itemgetter("name"),
+                                  reverse=True),
+                          sorted(ref, key=operator.itemgetter("name"),
+                                 reverse=True))
+
+
+class _CountingReader(object):
+
+    def __init__(self, content):
+        self.inp = StringIO.StringIO(content)
+        self.nreads = 0
+
+    def read(self, size):
+        self.nreads += 1
+        return self.inp.read(size)
+
+
+class Test_20_json_load_g(unittest.TestCase):
+
+    def test_10_same_as_json_loads(self):
+        data = dict(metadata=dict(data=[0], keys=["data", "[1]"]),
+                    data=[{"a": 0, "b": "]\"["}, [1, 2.5], -30, None,
+                          "x" * 100, dict(data=[3])],
+                    extra=True)
+        content = json.dumps(data, indent=2)
+
+        for bufsize in (1, 2, 3, 7, 64, 65536):
+            inp = StringIO.StringIO(content)
+            self.assertEquals(list(TT.json_load_g(inp, "data", bufsize)),
+                              data["data"])
+            inp = StringIO.StringIO(json.dumps(data["data"]))
+            self.assertEquals(list(TT.json_load_g(inp, None, bufsize)),
+                              data["data"])
+
+    def test_20_not_found(self):
+        for content in ('{"a": {"data": [0]}}', '{}', '[]', ''):
+            inp = StringIO.StringIO(content)
+            with self.assertRaises(ValueError):
+                list(TT.json_load_g(inp, "data", 4))
+
+    def test_30_large_item__not_decoded_many_times(self):
+        content = json.dumps(dict(data=["x" * 100000]))
+        inp = _CountingReader(content)
+
+        self.assertEquals(list(TT.json_load_g(inp, "data", 16)),
+                          ["x" * 100000])
+        self.assertTrue(inp.nreads < 20, inp.nreads)
+
 # vim:sw=4 ts=4 et:
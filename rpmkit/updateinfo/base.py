@@ -66,6 +66,14 @@ class Base(object):
 
         return xs
 
+    def list_errata_g(self, **kwargs):
+        """
+        A generator yields applicable errata one by one. Backends able to
+        find errata lazily should override this.
+        """
+        for errata in self.list_errata(**kwargs):
+            yield errata
+
     def list_installed_impl(self, **kwargs):
         raise NotImplementedError("list_installed_impl")
 
@@ -75,6 +83,20 @@ class Base(object):
     def list_errata_impl(self, **kwargs):
         raise NotImplementedError("list_errata_impl")
 
+    def list_repo_packages(self, **kwargs):
+        """
+        List all available packages in enabled repos regardless of installed
+        packages to construct :class:`rpmkit.updateinfo.repodata.RepoData`.
+        """
+        raise NotImplementedError("list_repo_packages")
+
+    def list_repo_errata(self, **kwargs):
+        """
+        List all errata in enabled repos regardless of installed packages to
+        construct :class:`rpmkit.updateinfo.repodata.RepoData`.
+        """
+        raise NotImplementedError("list_repo_errata")
+
 
 _VENDOR_RH = "Red Hat, Inc."
 _VENDOR_MAPS = {_VENDOR_RH: ("redhat", ".redhat.com"),
@@ -84,6 +106,21 @@ _VENDOR_MAPS = {_VENDOR_RH: ("redhat", ".redhat.com"),
                 }
 
 
+def evr(pkg):
+    """
+    :param pkg: A dict represents package info including E, V, R
+    :return: A tuple of (epoch, version, release) to pass to rpm.labelCompare
+
+    >>> evr(dict(epoch=None, version="1.0", release="1"))
+    ('0', '1.0', '1')
+    >>> evr(dict(epoch=2, version="1.0", release="1"))
+    ('2', '1.0', '1')
+    """
+    epoch = pkg.get("epoch")
+    return ("0" if epoch in (None, '') else str(epoch), str(pkg["version"]),
+            str(pkg["release"]))
+
+
 def may_be_rebuilt(vendor, buildhost, vbmap=_VENDOR_MAPS):
     """
     >>> may_be_rebuilt("Red Hat, Inc.", "abc.builder.redhat.com")
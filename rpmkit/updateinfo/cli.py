@@ -10,6 +10,8 @@
 #
 import rpmkit.updateinfo.main as RUM
 import rpmkit.updateinfo.multihosts as RUMS
+import rpmkit.updateinfo.report as RUR
+import rpmkit.updateinfo.store as RUS
 import datetime
 import optparse
 import os.path
@@ -17,10 +19,11 @@ import os.path
 
 _TODAY = datetime.datetime.now().strftime("%F")
 _DEFAULTS = dict(path=None, workdir="/tmp/rk-updateinfo-{}".format(_TODAY),
-                 repos=[], multiproc=False, id=None,
+                 repos=[], multiproc=False, incremental=True, id=None,
                  score=0, keywords=RUM.ERRATA_KEYWORDS,
                  rpms=RUM.CORE_RPMS, period='', cachedir=None, refdir=None,
-                 backend=RUM.DEFAULT_BACKEND, verbosity=0)
+                 backend=RUM.DEFAULT_BACKEND, format=RUR.DEFAULT_FORMAT,
+                 store=False, months=0, windows=[], verbosity=0)
 _USAGE = """\
 %prog [Options...] ROOT
 
@@ -42,10 +45,13 @@ def option_parser(defaults=_DEFAULTS, usage=_USAGE, backends=RUM.BACKENDS):
                       "RPM DBs automatically, and please not that any other "
                       "repos are disabled if this option was set.")
     p.add_option("-I", "--id", help="Data ID [None]")
-    # TODO: Disabled until issue of yum vs. multiprocessing module is fixed.
-    # p.add_option("-M", "--multiproc", action="store_true",
-    #             help="Specify this option if you want to analyze data "
-    #                  "in parallel (disabled currently)")
+    p.add_option("-M", "--multiproc", action="store_true",
+                 help="Specify this option if you want to analyze data "
+                      "of hosts in parallel [multihosts mode]")
+    p.add_option("-F", "--full", dest="incremental", action="store_false",
+                 help="Analyze all hosts again even if their RPM DBs, repos "
+                      "and options were not changed since the last run "
+                      "[multihosts mode]")
     p.add_option("-B", "--backend", choices=backends.keys(),
                  help="Specify backend to get updates and errata. Choices: "
                       "%s [%%default]" % ', '.join(backends.keys()))
@@ -64,10 +70,25 @@ def option_parser(defaults=_DEFAULTS, usage=_USAGE, backends=RUM.BACKENDS):
                       "YYYY[-MM[-DD]][,YYYY[-MM[-DD]]], "
                       "ex. '2014-10-01,2014-12-31', '2014-01-01'. "
                       "If end date is omitted, Today will be used instead")
+    p.add_option('', "--months", type="int",
+                 help="Summarize errata in each month of the last N months "
+                      "including this month, e.g. 12 [%default]")
+    p.add_option('', "--window", dest="windows", action="append",
+                 help="Period to summarize errata in, in the same format as "
+                      "--period. It can be given multiple times and errata "
+                      "in these periods are summarized at once")
     p.add_option("-C", "--cachedir",
                  help="Specify yum repo metadata cachedir [root/var/cache]")
     p.add_option("-R", "--refdir",
                  help="Output 'delta' result compared to the data in this dir")
+    p.add_option('', "--format", choices=RUR.FORMATS,
+                 help="Format of reports. Choices: %s [%%default]. csv "
+                      "outputs dirs holding CSV files of sheets instead of "
+                      "files" % ', '.join(RUR.FORMATS))
+    p.add_option('', "--store", action="store_true",
+                 help="Save results in a SQLite database (%s) also to "
+                      "query them later, e.g. hosts need some errata"
+                      % RUS.STORE_FILE)
     p.add_option("-v", "--verbose", action="count", dest="verbosity",
                  help="Verbose mode")
     p.add_option("-D", "--debug", action="store_const", dest="verbosity",
@@ -84,20 +105,26 @@ def main():
     assert os.path.exists(root), "Not found RPM DB Root: %s" % root
 
     period = options.period.split(',') if options.period else ()
+    periods = [RUM.period_to_dates(*w.split(',')) for w in options.windows]
+    if options.months > 0:
+        periods += RUM.monthly_periods(options.months)
 
     if os.path.exists(os.path.join(root, "var/lib/rpm")):
         RUM.main(root, options.workdir, options.repos, options.id,
                  options.score, options.keywords, options.rpms, period,
-                 options.cachedir, options.refdir, options.verbosity)
+                 options.cachedir, options.refdir, options.verbosity,
+                 fmt=options.format, store=options.store, periods=periods)
     else:
         # multihosts mode.
         #
-        # TODO: multiproc mode is disabled and options.multiproc is not passed
-        # to RUMS.main until the issue of yum that its thread locks conflict w/
-        # multiprocessing module is fixed.
+        # NOTE: Backend objects are instantiated in worker processes in
+        # multiproc mode to avoid the issue of yum that its thread locks
+        # conflict w/ multiprocessing module.
         RUMS.main(root, options.workdir, options.repos, options.score,
                   options.keywords, options.rpms, period, options.cachedir,
-                  options.refdir, options.verbosity)
+                  options.refdir, options.verbosity, options.multiproc,
+                  backend=options.backend, incremental=options.incremental,
+                  fmt=options.format, store=options.store, periods=periods)
 
 
 if __name__ == '__main__':
@@ -162,6 +162,26 @@ def hawkey_adv_to_errata(hadv):
     return errata
 
 
+def applicable_advisories_g(pkgs, cmptype, req_apkg):
+    """
+    Yield advisories of given packages applicable to the system, each of them
+    only once, without keeping advisories already yielded.
+
+    :param pkgs: An iterable yields hawkey.Package objects
+    :param cmptype: Comparison type passed to get_advisories, e.g. hawkey.GT
+    :param req_apkg: A function to test if the advisory's package is required
+    """
+    seen = set()
+    for package in pkgs:
+        for advisory in package.get_advisories(cmptype):
+            if advisory.id in seen:
+                continue
+
+            if any(req_apkg(apkg) for apkg in advisory.packages):
+                seen.add(advisory.id)
+                yield advisory
+
+
 class Base(rpmkit.updateinfo.base.Base):
     name = "rpmkit.updateinfo.dnfbase"
 
@@ -324,15 +344,11 @@ class Base(rpmkit.updateinfo.base.Base):
 
     def _apackage_advisory_installeds(self, pkgs, cmptype, req_apkg, specs=()):
         """
-        Stolen from :class:`dnf.cli.commands.updateinfo.UpdateInfoCommand`.
+        Stolen from :class:`dnf.cli.commands.updateinfo.UpdateInfoCommand`
+        but yields advisories only (not packages and installed status) and
+        each of them only once.
         """
-        for package in pkgs:
-            for advisory in package.get_advisories(cmptype):
-                for apkg in advisory.packages:
-                    if req_apkg(apkg):
-                        # installed = self._newer_equal_installed(apkg)
-                        # yield apkg, advisory, installed
-                        yield advisory  # we just need advisory object.
+        return applicable_advisories_g(pkgs, cmptype, req_apkg)
 
     def list_available_errata(self, specs=()):
         """
@@ -344,9 +360,10 @@ class Base(rpmkit.updateinfo.base.Base):
                                                   self._older_installed,
                                                   specs)
 
-    def list_errata_impl(self, **kwargs):
+    def list_errata_g(self, **kwargs):
         """
-        Stolen from :class:`dnf.cli.commands.updateinfo.UpdateInfoCommand`.
+        A generator yields applicable errata converted from hawkey advisories
+        one by one.
 
         TODO: Maybe it's better to inherit that class or write dnf plugin
         to acomplish the goal.
@@ -355,7 +372,10 @@ class Base(rpmkit.updateinfo.base.Base):
         self.load_repos()
         self.refresh_installed_cache()
 
-        hadvs = rpmkit.utils.uniq(self.list_available_errata())
-        return [hawkey_adv_to_errata(hadv) for hadv in hadvs]
+        for hadv in self.list_available_errata():
+            yield hawkey_adv_to_errata(hadv)
+
+    def list_errata_impl(self, **kwargs):
+        return list(self.list_errata_g(**kwargs))
 
 # vim:sw=4:ts=4:et:
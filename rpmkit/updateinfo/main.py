@@ -14,6 +14,8 @@ from operator import itemgetter
 import rpmkit.updateinfo.yumwrapper
 import rpmkit.updateinfo.yumbase
 import rpmkit.updateinfo.dnfbase
+import rpmkit.updateinfo.report as RUR
+import rpmkit.updateinfo.store as RUS
 import rpmkit.updateinfo.utils
 import rpmkit.memoize
 import rpmkit.rpmutils
@@ -22,6 +24,7 @@ import rpmkit.swapi
 
 # It looks available in EPEL for RHELs:
 #   https://apps.fedoraproject.org/packages/python-bunch
+import bisect
 import bunch
 import calendar
 import collections
@@ -31,7 +34,6 @@ import logging
 import os
 import os.path
 import re
-import tablib
 
 
 LOG = logging.getLogger("rpmkit.updateinfo")
@@ -107,35 +109,99 @@ def mk_cve_vs_cvss_map():
                 rpmkit.swapi.call("swapi.cve.getAll") if c)
 
 
-def fetch_cve_details(cve, cve_cvss_map={}):
-    """
-    :param cve: A dict represents CVE :: {id:, url:, ...}
-    :param cve_cvss_map: A dict :: {cve: cve_and_cvss_data}
+def _cveid(cve):
+    return cve.get("id", cve.get("cve"))
 
-    :return: A dict represents CVE and its CVSS metrics
-    """
-    cveid = cve.get("id", cve.get("cve"))
-    dcve = cve_cvss_map.get(cveid)
-    if dcve:
-        cve.update(**dcve)
-        return cve
 
+def _fetch_cvss(cveid):
+    """
+    :param cveid: CVE ID, e.g. "CVE-2014-0160"
+    :return: A dict represents CVSS metrics of the CVE or None
+    """
     try:
         dcve = rpmkit.swapi.call("swapi.cve.getCvss", [cveid])
         if dcve:
-            dcve = dcve[0]  # :: dict
-            dcve["nvd_url"] = dcve["url"]
-            dcve["url"] = cve["url"]
-            cve.update(**dcve)
+            return dcve[0]  # :: dict
 
     except Exception as e:
         LOG.warn(_("Could not fetch CVSS metrics of %s, err=%s"),
                  cveid, str(e))
-        dcve = dict(cve=cveid, )
 
+    return None
+
+
+def _update_cve(cve, dcve):
+    """
+    :param cve: A dict represents CVE :: {id:, url:, ...}
+    :param dcve: A dict represents CVE and its CVSS metrics
+    """
+    dcve = dict(dcve)
+    if "nvd_url" not in dcve and "url" in dcve:
+        dcve["nvd_url"] = dcve["url"]
+    if "url" in cve:
+        dcve["url"] = cve["url"]
+
+    cve.update(**dcve)
     return cve
 
 
+def fetch_cve_details(cve, cve_cvss_map=None):
+    """
+    :param cve: A dict represents CVE :: {id:, url:, ...}
+    :param cve_cvss_map: A dict :: {cve: cve_and_cvss_data} or None
+
+    :return: A dict represents CVE and its CVSS metrics
+    """
+    cveid = _cveid(cve)
+    dcve = None if cve_cvss_map is None else cve_cvss_map.get(cveid)
+    if dcve is None:
+        dcve = _fetch_cvss(cveid)
+
+    if dcve:
+        _update_cve(cve, dcve)
+
+    return cve
+
+
+def fetch_cves_cvss_map(errata, cve_cvss_map=None,
+                        fetch_all=mk_cve_vs_cvss_map, fetch=_fetch_cvss):
+    """
+    Fetch CVSS metrics of unique CVEs of all errata at once. CVSS metrics of
+    all CVEs are fetched in bulk and only CVEs not found or not having scores
+    in them are fetched one by one. These are not fetched in parallel as
+    rpmkit.swapi.call is not thread safe.
+
+    :param errata: A list of errata
+    :param cve_cvss_map: A dict :: {cve: cve_and_cvss_data} to populate or
+        None to make a new one
+    :param fetch_all: Function to fetch CVSS metrics of all CVEs, returns a
+        dict :: {cve: cve_and_cvss_data}
+    :param fetch: Function to fetch CVSS metrics of a CVE
+
+    :return: `cve_cvss_map` populated, where CVEs of which CVSS metrics are
+        not available are mapped to {}
+    """
+    if cve_cvss_map is None:
+        cve_cvss_map = dict()
+
+    cveids = sorted(set(_cveid(c) for e in errata for c
+                        in e.get("cves", [])) - set(cve_cvss_map.keys()))
+    if not cveids:
+        return cve_cvss_map
+
+    LOG.info(_("Fetch CVSS metrics of %d CVEs"), len(cveids))
+    all_cvss_map = fetch_all()
+
+    for cveid in cveids:
+        dcve = all_cvss_map.get(cveid)
+        if dcve is None or "score" not in dcve:
+            dcve = fetch(cveid) or dcve
+
+        cve_cvss_map[cveid] = dcve or dict()
+
+    return cve_cvss_map
+
+
 def _fmt_cve(cve):
     if 'score' in cve:
         return '%(cve)s (score=%(score)s, metrics=%(metrics)s, url=%(url)s)'
@@ -195,33 +261,21 @@ def _make_cell_data(x, key, default="N/A"):
         return ", ".join(v) if isinstance(v, (list, tuple)) else v
 
 
-def make_dataset(list_data, title=None, headers=[], lheaders=[]):
+def make_sheet(list_data, title, headers, lheaders=[]):
     """
+    Make a sheet of which rows are generated from `list_data` when they're
+    written.
+
     :param list_data: List of data
-    :param title: Dataset title to be used as worksheet's name
-    :param headers: Dataset headers to be used as column headers, etc.
+    :param title: Sheet title to be used as worksheet's name
+    :param headers: Keys of data to be used as columns
     :param lheaders: Localized version of `headers`
-    """
-    dataset = tablib.Dataset()
-
-    # TODO: Check title as valid worksheet name, ex. len(title) <= 31.
-    # See also xlwt.Utils.valid_sheet_name.
-    if title:
-        dataset.title = title
 
-    if headers:
-        if lheaders:
-            dataset.headers = [h.replace('_s', '') for h in lheaders]
-        else:
-            dataset.headers = [h.replace('_s', '') for h in headers]
-
-        for x in list_data:
-            dataset.append([_make_cell_data(x, h) for h in headers])
-    else:
-        for x in list_data:
-            dataset.append(x.values())
-
-    return dataset
+    :return: A :class:`rpmkit.updateinfo.report.Sheet` object
+    """
+    rows = ([_make_cell_data(x, h) for h in headers] for x in list_data)
+    return RUR.Sheet(title, [h.replace('_s', '') for h
+                             in (lheaders or headers)], rows)
 
 
 def errata_date(date_s):
@@ -278,6 +332,7 @@ def p2na(pkg):
 
 
 _ERRATA_CHARS = dict(E=1, B=2, S=3)
+(_RHEA, _RHBA, _RHSA) = (_ERRATA_CHARS[c] for c in "EBS")
 _RHSA_SEVERITIES = collections.defaultdict(int,
                                            dict(Low=2, Moderate=4,
                                                 Important=6, Critical=8))
@@ -319,6 +374,60 @@ def errata_to_int(errata, echars=_ERRATA_CHARS, severities=_RHSA_SEVERITIES,
                                  d["year"], d["seq"], rev))
 
 
+def normalize_errata(errata, echars=_ERRATA_CHARS,
+                     severities=_RHSA_SEVERITIES):
+    """
+    Add integer keys to sort, filter and group errata computed only once.
+    These are dumped in errata JSON files together and not computed again
+    when errata are loaded from them.
+
+    - id: Sorting key, see :function:`errata_to_int`
+    - issue_date_i: Issue date :: int, YYYYMMDD
+    - type_c: Type code, RHSA (3) > RHBA (2) > RHEA (1)
+    - severity_c: Severity code of RHSA, Critical (8) > ... > Low (2), or 0
+
+    :param errata: A dict represents an errata
+    :return: `errata` having the above keys
+
+    >>> e = normalize_errata(dict(advisory="RHSA-2014:0422",
+    ...                           severity="Moderate",
+    ...                           issue_date="2014-04-22 00:00:00"))
+    >>> (e["id"], e["issue_date_i"], e["type_c"], e["severity_c"])
+    (342014042200, 20140422, 3, 4)
+    """
+    if "id" not in errata:
+        errata["id"] = errata_to_int(errata, echars, severities)
+
+    if "issue_date_i" not in errata:
+        date_s = errata.get("issue_date")
+        errata["issue_date_i"] = _d2i(errata_date(date_s)) if date_s else 0
+
+    if "type_c" not in errata:
+        errata["type_c"] = echars.get(errata["advisory"][2:3], 0)
+
+    if "severity_c" not in errata:
+        errata["severity_c"] = severities[errata.get("severity", 0)]
+
+    return errata
+
+
+def issue_date_i(errata):
+    """
+    :param errata: A dict represents an errata
+    :return: Issue date of `errata` :: int, YYYYMMDD
+
+    >>> issue_date_i(dict(issue_date="12/16/10"))
+    20101216
+    >>> issue_date_i(dict(issue_date="12/16/10", issue_date_i=20101217))
+    20101217
+    """
+    ret = errata.get("issue_date_i")
+    if ret is None:
+        ret = _d2i(errata_date(errata["issue_date"]))
+
+    return ret
+
+
 def sgroupby(xs, kf, kf2=None):
     """
     :param xs: Iterable object, e.g. a list, a tuple, etc.
@@ -331,80 +440,210 @@ def sgroupby(xs, kf, kf2=None):
             in itertools.groupby(sorted(xs, key=kf), kf))
 
 
-def list_updates_from_errata(errata):
-    """
-    :param errata: A list of errata dict
-    """
-    us = sorted(U.uconcat(e.get("updates", []) for e in errata),
-                key=itemgetter("name"))
-    return [sorted(g, cmp=rpmkit.rpmutils.pcmp, reverse=True)[0]
-            for g in sgroupby(us, itemgetter("name"))]
-
-
 def list_latest_errata_groupby_updates(es):
     """
     :param es: A list of errata dict
     :return: A list of items in `es` grouped by update names
     """
     ung = lambda e: sorted(set(u["name"] for u in e.get("updates", [])))
-    return [xs[-1] for xs in sgroupby(es, ung, itemgetter("issue_date"))]
+    return [xs[-1] for xs in sgroupby(es, ung, issue_date_i)]
 
 
-def compute_delta(refdir, errata, updates, nevra_keys=NEVRA_KEYS):
+def _ref_data_g(refdir, filename):
+    """
+    :param refdir: Dir has reference data files
+    :param filename: Reference data filename, e.g. errata.json
+    :return: A generator to yield items in the reference data file
+    """
+    path = os.path.join(refdir, filename)
+    with U.copen(path) as inp:
+        for x in U.json_load_g(inp, "data"):
+            yield x
+
+
+def _errata_sig(errata, nevra_keys=NEVRA_KEYS):
+    """
+    :param errata: A dict represents an errata
+    :return: A tuple of the errata's content may be changed
+    """
+    ups = sorted(tuple(u[k] for k in nevra_keys) for u
+                 in errata.get("updates", []))
+    return (errata.get("update_date"), errata.get("severity"), tuple(ups))
+
+
+def compute_delta_diff(refdir, errata, updates, nevra_keys=NEVRA_KEYS):
     """
+    Compute the difference between reference errata and updates and the
+    current ones. Reference data files are streamed and only keys of the
+    reference data are kept on memory, so that they may be very large.
+
+    - errata: keyed by advisory and changed if its update date, severity or
+      update packages are changed
+    - updates: keyed by name and arch and changed if its version is changed
+
     :param refdir: Dir has reference data files: packages.json, errata.json
         and updates.json
     :param errata: A list of errata
     :param updates: A list of update packages
+
+    :return: A dict of {errata: diff, updates: diff} where diff is a dict of
+        {added: [current item], removed: [reference item], changed: [current
+        item]}
     """
     emsg = "Reference %s not found: %s"
     assert os.path.exists(refdir), emsg % ("data dir", refdir)
 
-    ref_es_file = os.path.join(refdir, "errata.json")
-    ref_us_file = os.path.join(refdir, "updates.json")
-    assert os.path.exists(ref_es_file), emsg % ("errata file", ref_es_file)
-    assert os.path.exists(ref_us_file), emsg % ("updates file", ref_us_file)
+    for filename in (_ERRATA_LIST_FILE, _UPDATES_LIST_FILE):
+        path = os.path.join(refdir, filename)
+        assert os.path.exists(path), emsg % ("data file", path)
+
+    nevra = itemgetter(*nevra_keys)
+    na = itemgetter("name", "arch")
+
+    # :: {advisory: signature of errata}, {(name, arch): (N, E, V, R, A)}
+    ref_esigs = dict((e["advisory"], _errata_sig(e, nevra_keys)) for e
+                     in _ref_data_g(refdir, _ERRATA_LIST_FILE))
+    ref_unevras = dict((na(u), nevra(u)) for u
+                       in _ref_data_g(refdir, _UPDATES_LIST_FILE))
+    LOG.debug(_("Loaded keys of reference errata and updates: %d, %d"),
+              len(ref_esigs), len(ref_unevras))
+
+    ediff = dict(added=[], removed=[], changed=[])
+    for e in errata:
+        sig = ref_esigs.get(e["advisory"])
+        if sig is None:
+            ediff["added"].append(e)
+        elif sig != _errata_sig(e, nevra_keys):
+            ediff["changed"].append(e)
 
-    ref_es_data = U.json_load(ref_es_file)
-    ref_us_data = U.json_load(ref_us_file)
-    LOG.debug(_("Loaded reference errata and updates file"))
+    udiff = dict(added=[], removed=[], changed=[])
+    for u in updates:
+        ref_nevra = ref_unevras.get(na(u))
+        if ref_nevra is None:
+            udiff["added"].append(u)
+        elif ref_nevra != nevra(u):
+            udiff["changed"].append(u)
 
-    ref_eadvs = set(e["advisory"] for e in ref_es_data["data"])
-    ref_nevras = set((p[k] for k in nevra_keys) for p in ref_us_data["data"])
+    # Stream reference data again to find removed ones.
+    advs = set(e["advisory"] for e in errata)
+    ediff["removed"] = [e for e in _ref_data_g(refdir, _ERRATA_LIST_FILE)
+                        if e["advisory"] not in advs]
 
-    return ([e for e in errata if e["advisory"] not in ref_eadvs],
-            [u for u in updates
-             if (u[k] for k in nevra_keys) not in ref_nevras])
+    nas = set(na(u) for u in updates)
+    udiff["removed"] = [u for u in _ref_data_g(refdir, _UPDATES_LIST_FILE)
+                        if na(u) not in nas]
 
+    return dict(errata=ediff, updates=udiff)
 
-def errata_matches_keywords_g(errata, keywords=ERRATA_KEYWORDS):
+
+def compute_delta(refdir, errata, updates, nevra_keys=NEVRA_KEYS):
     """
+    :param refdir: Dir has reference data files: packages.json, errata.json
+        and updates.json
     :param errata: A list of errata
-    :param keywords: Keyword list to filter 'important' RHBAs
+    :param updates: A list of update packages
 
-    :return: A generator to yield errata of which description contains any of
-        given keywords
+    :return: A tuple of (errata not in reference errata, updates of which
+        NEVRAs are not in reference updates)
     """
-    for e in errata:
-        mks = [k for k in keywords if k in e["description"]]
-        if mks:
-            e["keywords"] = mks
-            yield e
+    diff = compute_delta_diff(refdir, errata, updates, nevra_keys)
+    return (diff["errata"]["added"],
+            diff["updates"]["added"] + diff["updates"]["changed"])
 
 
-def _ekeyfunc(e):
-    return (len(e["update_names"]), itemgetter("issue_date"))
+def _is_word_boundary(lhs, rhs, reg=re.compile(r"\w", re.UNICODE)):
+    """
+    :param lhs, rhs: Characters next to each other
 
+    >>> _is_word_boundary('a', ' '), _is_word_boundary('a', 'b')
+    (True, False)
+    """
+    return bool(reg.match(lhs)) != bool(reg.match(rhs))
 
-def errata_of_rpms(es, rpms=[], keyfunc=_ekeyfunc):
+
+class KeywordMatcher(object):
     """
-    :param es: A list of errata
-    :param rpms: RPM names to select relevant errata
+    Multi-pattern matcher compiled from keywords into one regexp to find all
+    keywords in a text with a scan.
 
-    :return: A list of errata relevant to any of given RPMs
+    >>> m = KeywordMatcher(["crash", "hang", "segmentation fault",
+    ...                     "fault", "segmentation"])
+    >>> m.match("A segmentation fault occurs.")
+    ['segmentation fault', 'fault', 'segmentation']
+    >>> m.match("It hangs and Crashes")
+    ['hang']
+    >>> m = KeywordMatcher(["crash", "hang"], ignorecase=True, wordmatch=True)
+    >>> m.match("It hangs and Crashes"), m.match("It may crash or HANG.")
+    ([], ['crash', 'hang'])
     """
-    return sorted((e for e in es if any(n in e["update_names"] for n in rpms)),
-                  key=keyfunc, reverse=True)
+    def __init__(self, keywords, ignorecase=False, wordmatch=False):
+        """
+        :param keywords: Keyword list
+        :param ignorecase: Match keywords case-insensitively if True
+        :param wordmatch: Match keywords only at word boundaries if True
+        """
+        self.keywords = list(keywords)
+        self.ignorecase = ignorecase
+        self._cache = dict()
+
+        # Try longer ones first to find keywords having other keywords as
+        # their prefixes, and find the latter from the former later.
+        kws = sorted(set(self.keywords), key=len, reverse=True)
+        pat = '|'.join(re.escape(k) for k in kws)
+        if wordmatch:
+            pat = r"\b(?:%s)\b" % pat
+
+        flags = re.UNICODE | (re.IGNORECASE if ignorecase else 0)
+        self.reg = re.compile(r"(?=(%s))" % pat, flags) if kws else None
+
+        # :: {normalized_matched_text: [keyword]}
+        self.kwmap = collections.defaultdict(set)
+        for k in kws:
+            nk = self.normalize(k)
+            self.kwmap[nk].add(k)
+            for pk in kws:
+                npk = self.normalize(pk)
+                if len(npk) < len(nk) and nk.startswith(npk) and \
+                        (not wordmatch or
+                         _is_word_boundary(nk[len(npk) - 1], nk[len(npk)])):
+                    self.kwmap[nk].add(pk)
+
+    def normalize(self, text):
+        return text.lower() if self.ignorecase else text
+
+    def match(self, text):
+        """
+        :param text: A string to find keywords in
+        :return: A list of keywords found in `text`, in the order of keywords
+        """
+        if self.reg is None:
+            return []
+
+        found = set()
+        for mat in self.reg.finditer(text):
+            found.update(self.kwmap[self.normalize(mat.group(1))])
+
+        return [k for k in self.keywords if k in found]
+
+    def match_errata(self, errata):
+        """
+        :param errata: A dict represents an errata
+        :return: A list of keywords found in the description of `errata`.
+            Results are cached by advisories because same errata may be
+            checked for many hosts.
+        """
+        adv = errata["advisory"]
+        if adv not in self._cache:
+            self._cache[adv] = self.match(errata["description"])
+
+        return list(self._cache[adv])
+
+
+def _keywords_matcher(keywords, ignorecase=False, wordmatch=False):
+    return KeywordMatcher(keywords, ignorecase, wordmatch)
+
+
+keywords_matcher = rpmkit.memoize.memoize(_keywords_matcher)
 
 
 def higher_score_cve_errata_g(errata, score=DEFAULT_CVSS_SCORE):
@@ -425,17 +664,22 @@ def higher_score_cve_errata_g(errata, score=DEFAULT_CVSS_SCORE):
             yield e
 
 
-def errata_complement_g(errata, updates, score=0):
+def errata_complement_g(errata, updates, score=0, cve_cvss_map=None):
     """
     TODO: What should be complemented?
 
     :param errata: A list of errata
     :param updates: A list of update packages
     :param score: CVSS score
+    :param cve_cvss_map: A dict :: {cve: cve_and_cvss_data} or None
     """
     unas = set(p2na(u) for u in updates)
+    if score > 0:
+        errata = list(errata)
+        cve_cvss_map = fetch_cves_cvss_map(errata, cve_cvss_map)
+
     for e in errata:
-        e["id"] = errata_to_int(e)  # Sorting key
+        normalize_errata(e)  # Sorting and filtering keys
         e["updates"] = U.uniq(p for p in e.get("packages", []) if p2na(p)
                               in unas)
         e["update_names"] = list(set(u["name"] for u in e["updates"]))
@@ -445,26 +689,12 @@ def errata_complement_g(errata, updates, score=0):
         e["synopsis"] = e["synopsis"].strip()
 
         if score > 0:
-            e["cves"] = [fetch_cve_details(cve) for cve in e.get("cves", [])]
+            e["cves"] = [fetch_cve_details(cve, cve_cvss_map) for cve
+                         in e.get("cves", [])]
 
         yield e
 
 
-def list_num_of_es_for_updates(es):
-    """
-    List number of specific type of errata for each package names.
-
-    :param es: List of reference errata of specific type (and severity)
-    :return: [(package_name :: str, num_of_relevant_errata :: Int)]
-    """
-    unes = U.uconcat([(u["name"], e) for u in e["updates"]] for e in es)
-    uess = [(k, [ue[1]["advisory"] for ue in g]) for k, g in
-            itertools.groupby(unes, itemgetter(0))]
-
-    return sorted(((un, len(es)) for un, es in uess), key=itemgetter(1),
-                  reverse=True)
-
-
 _DATE_REG = re.compile(r"^(\d{4})(?:.(\d{2})(?:.(\d{2}))?)?$")
 
 
@@ -543,23 +773,109 @@ def ymd_to_date(ymd, roundout=False, datereg=_DATE_REG):
     return round_ymd(int(d[0]), int_(d[1]), int_(d[2]), roundout)
 
 
-def mk_update_name_vs_advs_map(errata):
+def _latest_updates(errata):
+    """
+    :param errata: A list of errata dict
+    :return: A list of the latest update packages sorted by names
+    """
+    ups = dict()
+    for e in errata:
+        for u in e.get("updates", []):
+            cur = ups.get(u["name"])
+            if cur is None:
+                ups[u["name"]] = u
+            else:
+                ret = rpmkit.rpmutils.pcmp(u, cur)
+                if ret > 0 or (ret == 0 and u < cur):
+                    ups[u["name"]] = u
+
+    return [ups[n] for n in sorted(ups)]
+
+
+def _sort_by_lens(pairs):
+    """
+    :param pairs: A list of (key, list)
+    :return: A list of `pairs` sorted by length of lists in descending order
+        and keys in ascending order
+
+    >>> _sort_by_lens([("b", [1]), ("c", [1, 2]), ("a", [3])])
+    [('c', [1, 2]), ('a', [3]), ('b', [1])]
+    """
+    return sorted(sorted(pairs), key=lambda t: len(t[1]), reverse=True)
+
+
+class ErrataBuckets(object):
     """
-    Make a list of a dict {name: [adv]} where name is name of update
-    package relevant to an errata and [adv] is a list of its advisories.
+    Errata of a type (and severity) and indexes of them by update names.
+    """
+    def __init__(self):
+        self.list = []
+        self.advs_by_pnames = collections.defaultdict(list)
+
+    def add(self, errata):
+        self.list.append(errata)
+        for name in errata.get("update_names", []):
+            self.advs_by_pnames[name].append(errata["advisory"])
+
+    def list_by_packages(self):
+        """
+        :return: A list of (update_name, [advisory]) sorted by number of
+            advisories in descending order
+        """
+        return _sort_by_lens(self.advs_by_pnames.items())
+
+    def list_n_by_pnames(self):
+        """
+        :return: A list of (update_name, number of advisories)
+        """
+        return [(n, len(advs)) for n, advs in self.list_by_packages()]
+
+
+def classify_errata(errata, keywords=ERRATA_KEYWORDS, core_rpms=CORE_RPMS,
+                    ignorecase=False, wordmatch=False):
+    """
+    Classify errata by types and severities in one pass. Keywords in
+    descriptions and relevance to core RPMs of RHBAs are checked in that pass
+    also.
 
     :param errata: A list of applicable errata sorted by severity
         if it's RHSA and advisory in ascending sequence
+    :param keywords: Keyword list to filter 'important' RHBAs
+    :param core_rpms: Core RPMs to filter errata by them
+    :param ignorecase: Match keywords case-insensitively if True
+    :param wordmatch: Match keywords only at word boundaries if True
+
+    :return: A dict of {type_c: ErrataBuckets} and {severity_c:
+        ErrataBuckets} of RHSAs, and lists of RHBAs matched with keywords and
+        relevant to core RPMs; see :function:`normalize_errata` about type_c
+        and severity_c
     """
-    def un_adv_pairs(errata):
-        for e in errata:
-            for un in e.get("update_names", []):
-                yield (un, e["advisory"])
+    types = dict((c, ErrataBuckets()) for c in (_RHSA, _RHBA, _RHEA))
+    sevs = collections.defaultdict(ErrataBuckets)
+    (rhba_by_kwds, rhba_of_rpms) = ([], [])
+    core_rpms = set(core_rpms)
+    matcher = keywords_matcher(keywords, ignorecase, wordmatch)
+
+    for e in errata:
+        type_c = normalize_errata(e)["type_c"]
+        if type_c not in types:
+            continue
+
+        types[type_c].add(e)
 
-    un_advs_list = sorted(un_adv_pairs(errata), key=itemgetter(0))
-    return sorted(((k, [t[1] for t in g]) for k, g in
-                   itertools.groupby(un_advs_list, key=itemgetter(0))),
-                  key=lambda t: len(t[1]), reverse=True)
+        if type_c == _RHSA:
+            sevs[e["severity_c"]].add(e)
+
+        elif type_c == _RHBA:
+            mks = matcher.match_errata(e)
+            if mks:
+                e["keywords"] = mks
+                rhba_by_kwds.append(e)
+
+            if not core_rpms.isdisjoint(e["update_names"]):
+                rhba_of_rpms.append(e)
+
+    return (types, sevs, rhba_by_kwds, rhba_of_rpms)
 
 
 def analyze_errata(errata, updates, score=0, keywords=ERRATA_KEYWORDS,
@@ -574,55 +890,49 @@ def analyze_errata(errata, updates, score=0, keywords=ERRATA_KEYWORDS,
     :param period: Period of errata in format of YYYY[-MM[-DD]],
         ex. ("2014-10-01", "2014-11-01")
     """
-    rhsa = [e for e in errata if e["advisory"][2] == 'S']
-    cri_rhsa = [e for e in rhsa if e.get("severity") == "Critical"]
-    imp_rhsa = [e for e in rhsa if e.get("severity") == "Important"]
+    (types, sevs, rhba_by_kwds, rhba_of_rpms) = \
+        classify_errata(errata, keywords, core_rpms)
+
+    (cri, imp) = (sevs[_RHSA_SEVERITIES[sev]] for sev
+                  in ("Critical", "Important"))
+
+    rhsa = types[_RHSA].list
+    cri_rhsa = cri.list
+    imp_rhsa = imp.list
     latest_cri_rhsa = list_latest_errata_groupby_updates(cri_rhsa)
     latest_imp_rhsa = list_latest_errata_groupby_updates(imp_rhsa)
 
-    us_of_cri_rhsa = list_updates_from_errata(cri_rhsa)
-    us_of_imp_rhsa = list_updates_from_errata(imp_rhsa)
+    us_of_cri_rhsa = _latest_updates(cri_rhsa)
+    us_of_imp_rhsa = _latest_updates(imp_rhsa)
 
-    rhba = [e for e in errata if e["advisory"][2] == 'B']
+    rhba = types[_RHBA].list
 
-    kf = lambda e: (len(e.get("keywords", [])), e["issue_date"],
+    kf = lambda e: (len(e.get("keywords", [])), issue_date_i(e),
                     e["update_names"])
-    rhba_by_kwds = sorted(errata_matches_keywords_g(rhba, keywords),
-                          key=kf, reverse=True)
-    rhba_of_rpms_by_kwds = errata_of_rpms(rhba_by_kwds, core_rpms, kf)
-    rhba_of_rpms = errata_of_rpms(rhba, core_rpms,
-                                  itemgetter("update_names"))
+    rhba_by_kwds = sorted(rhba_by_kwds, key=kf, reverse=True)
+    eids = set(id(e) for e in rhba_of_rpms)
+    rhba_of_rpms_by_kwds = [e for e in rhba_by_kwds if id(e) in eids]
+    rhba_of_rpms = sorted(rhba_of_rpms, key=itemgetter("update_names"),
+                          reverse=True)
     latest_rhba_of_rpms = list_latest_errata_groupby_updates(rhba_of_rpms)
 
     if score > 0:
         rhsa_by_score = list(higher_score_cve_errata_g(rhsa, score))
         rhba_by_score = list(higher_score_cve_errata_g(rhba, score))
-        us_of_rhsa_by_score = list_updates_from_errata(rhsa_by_score)
-        us_of_rhba_by_score = list_updates_from_errata(rhba_by_score)
+        us_of_rhsa_by_score = _latest_updates(rhsa_by_score)
+        us_of_rhba_by_score = _latest_updates(rhba_by_score)
     else:
         rhsa_by_score = []
         rhba_by_score = []
         us_of_rhsa_by_score = []
         us_of_rhba_by_score = []
 
-    us_of_rhba_by_kwds = list_updates_from_errata(rhba_by_kwds)
-
-    rhea = [e for e in errata if e["advisory"][2] == 'E']
-
-    rhsa_rate_by_sev = [("Critical", len(cri_rhsa)),
-                        ("Important", len(imp_rhsa)),
-                        ("Moderate",
-                         len([e for e in rhsa
-                              if e.get("severity") == "Moderate"])),
-                        ("Low",
-                         len([e for e in rhsa
-                              if e.get("severity") == "Low"]))]
+    us_of_rhba_by_kwds = _latest_updates(rhba_by_kwds)
 
-    n_rhsa_by_pns = list_num_of_es_for_updates(rhsa)
-    n_cri_rhsa_by_pns = list_num_of_es_for_updates(cri_rhsa)
-    n_imp_rhsa_by_pns = list_num_of_es_for_updates(imp_rhsa)
+    rhea = types[_RHEA].list
 
-    n_rhba_by_pns = list_num_of_es_for_updates(rhba)
+    rhsa_rate_by_sev = [(sev, len(sevs[_RHSA_SEVERITIES[sev]].list)) for sev
+                        in ("Critical", "Important", "Moderate", "Low")]
 
     return dict(rhsa=dict(list=rhsa,
                           list_critical=cri_rhsa,
@@ -634,10 +944,10 @@ def analyze_errata(errata, updates, score=0, keywords=ERRATA_KEYWORDS,
                           list_important_updates=us_of_imp_rhsa,
                           list_higher_cvss_updates=us_of_rhsa_by_score,
                           rate_by_sev=rhsa_rate_by_sev,
-                          list_n_by_pnames=n_rhsa_by_pns,
-                          list_n_cri_by_pnames=n_cri_rhsa_by_pns,
-                          list_n_imp_by_pnames=n_imp_rhsa_by_pns,
-                          list_by_packages=mk_update_name_vs_advs_map(rhsa)),
+                          list_n_by_pnames=types[_RHSA].list_n_by_pnames(),
+                          list_n_cri_by_pnames=cri.list_n_by_pnames(),
+                          list_n_imp_by_pnames=imp.list_n_by_pnames(),
+                          list_by_packages=types[_RHSA].list_by_packages()),
                 rhba=dict(list=rhba,
                           list_by_kwds=rhba_by_kwds,
                           list_of_core_rpms=rhba_of_rpms,
@@ -646,10 +956,10 @@ def analyze_errata(errata, updates, score=0, keywords=ERRATA_KEYWORDS,
                           list_higher_cvss_score=rhba_by_score,
                           list_updates_by_kwds=us_of_rhba_by_kwds,
                           list_higher_cvss_updates=us_of_rhba_by_score,
-                          list_n_by_pnames=n_rhba_by_pns,
-                          list_by_packages=mk_update_name_vs_advs_map(rhba)),
+                          list_n_by_pnames=types[_RHBA].list_n_by_pnames(),
+                          list_by_packages=types[_RHBA].list_by_packages()),
                 rhea=dict(list=rhea,
-                          list_by_packages=mk_update_name_vs_advs_map(rhea)),
+                          list_by_packages=types[_RHEA].list_by_packages()),
                 rate_by_type=[("Security", len(rhsa)),
                               ("Bug", len(rhba)),
                               ("Enhancement", len(rhea))])
@@ -667,16 +977,26 @@ def padding_row(row, mcols):
     return row + [''] * (mcols - len(row))
 
 
-def make_overview_dataset(workdir, data, score=0, keywords=ERRATA_KEYWORDS,
-                          core_rpms=[]):
+def make_overview_sheet(data, score=0, keywords=ERRATA_KEYWORDS,
+                        core_rpms=[]):
     """
-    :param workdir: Working dir to dump the result
     :param data: RPMs, Update RPMs and various errata data summarized
     :param score: CVSS base metrics score limit
+    :param keywords: Keyword list to filter 'important' RHBAs
     :param core_rpms: Core RPMs to filter errata by them
 
-    :return: An instance of tablib.Dataset becomes a worksheet represents the
-        overview of analysys reuslts
+    :return: A :class:`rpmkit.updateinfo.report.Sheet` object
+    """
+    headers = (_("Item"), _("Value"), _("Notes"))
+    rows = (padding_row(row, len(headers)) for row
+            in _overview_rows(data, score, keywords, core_rpms))
+
+    return RUR.Sheet(_("Overview of analysis results"), headers, rows)
+
+
+def _overview_rows(data, score=0, keywords=ERRATA_KEYWORDS, core_rpms=[]):
+    """
+    :return: A list of rows in the overview of analysis results
     """
     rows = [[_("Critical or Important RHSAs (Security Errata)")],
             [_("# of Critical RHSAs"),
@@ -732,33 +1052,12 @@ def make_overview_dataset(workdir, data, score=0, keywords=ERRATA_KEYWORDS,
              [_("# of RPMs from other vendors (non Red Hat)"),
               len(data["installed"]["list_from_others"])]]
 
-    headers = (_("Item"), _("Value"), _("Notes"))
-    dataset = tablib.Dataset(headers=headers)
-    dataset.title = _("Overview of analysis results")
-
-    mcols = len(headers)
-    for row in rows:
-        try:
-            if row and len(row) == 1:  # Special case: separator
-                dataset.append_separator(row[0])
-            else:
-                dataset.append(padding_row(row, mcols))
-        except:
-            LOG.error("row=" + str(row))
-            raise
-
-    return dataset
-
-
-def dump_xls(dataset, filepath):
-    book = tablib.Databook(dataset)
-    with open(filepath, 'wb') as out:
-        out.write(book.xls)
+    return rows
 
 
 def dump_results(workdir, rpms, errata, updates, score=0,
                  keywords=ERRATA_KEYWORDS, core_rpms=[], details=True,
-                 rpmkeys=NEVRA_KEYS, vendor="redhat"):
+                 rpmkeys=NEVRA_KEYS, vendor="redhat", fmt=None):
     """
     :param workdir: Working dir to dump the result
     :param rpms: A list of installed RPMs
@@ -768,6 +1067,8 @@ def dump_results(workdir, rpms, errata, updates, score=0,
     :param keywords: Keyword list to filter 'important' RHBAs
     :param core_rpms: Core RPMs to filter errata by them
     :param details: Dump details also if True
+    :param fmt: Format of reports, one of rpmkit.updateinfo.report.FORMATS or
+        None (default format)
     """
     rpms_rebuilt = [p for p in rpms if p.get("rebuilt", False)]
     rpms_replaced = [p for p in rpms if p.get("replaced", False)]
@@ -806,72 +1107,74 @@ def dump_results(workdir, rpms, errata, updates, score=0,
     lbekeys = (_("advisory"), _("keywords"), _("synopsis"), _("url"),
                _("update_names"))
 
-    ds = [make_overview_dataset(workdir, data, score, keywords, core_rpms),
-          make_dataset((data["errata"]["rhsa"]["list_latest_critical"] +
-                        data["errata"]["rhsa"]["list_latest_important"]),
-                       _("Cri-Important RHSAs (latests)"), sekeys, lsekeys),
-          make_dataset(sorted(data["errata"]["rhsa"]["list_critical"],
-                              key=itemgetter("update_names")) +
-                       sorted(data["errata"]["rhsa"]["list_important"],
-                              key=itemgetter("update_names")),
-                       _("Critical or Important RHSAs"), sekeys, lsekeys),
-          make_dataset(data["errata"]["rhba"]["list_by_kwds_of_core_rpms"],
-                       _("RHBAs (core rpms, keywords)"), bekeys, lbekeys),
-          make_dataset(data["errata"]["rhba"]["list_by_kwds"],
-                       _("RHBAs (keyword)"), bekeys, lbekeys),
-          make_dataset(data["errata"]["rhba"]["list_latests_of_core_rpms"],
-                       _("RHBAs (core rpms, latests)"), bekeys, lbekeys),
-          make_dataset(data["errata"]["rhsa"]["list_critical_updates"],
-                       _("Update RPMs by RHSAs (Critical)"), rpmkeys,
-                       lrpmkeys),
-          make_dataset(data["errata"]["rhsa"]["list_important_updates"],
-                       _("Updates by RHSAs (Important)"), rpmkeys, lrpmkeys),
-          make_dataset(data["errata"]["rhba"]["list_updates_by_kwds"],
-                       _("Updates by RHBAs (Keyword)"), rpmkeys, lrpmkeys)]
+    ds = [make_overview_sheet(data, score, keywords, core_rpms),
+          make_sheet(itertools.chain(
+                         data["errata"]["rhsa"]["list_latest_critical"],
+                         data["errata"]["rhsa"]["list_latest_important"]),
+                     _("Cri-Important RHSAs (latests)"), sekeys, lsekeys),
+          make_sheet(itertools.chain(
+                         sorted(data["errata"]["rhsa"]["list_critical"],
+                                key=itemgetter("update_names")),
+                         sorted(data["errata"]["rhsa"]["list_important"],
+                                key=itemgetter("update_names"))),
+                     _("Critical or Important RHSAs"), sekeys, lsekeys),
+          make_sheet(data["errata"]["rhba"]["list_by_kwds_of_core_rpms"],
+                     _("RHBAs (core rpms, keywords)"), bekeys, lbekeys),
+          make_sheet(data["errata"]["rhba"]["list_by_kwds"],
+                     _("RHBAs (keyword)"), bekeys, lbekeys),
+          make_sheet(data["errata"]["rhba"]["list_latests_of_core_rpms"],
+                     _("RHBAs (core rpms, latests)"), bekeys, lbekeys),
+          make_sheet(data["errata"]["rhsa"]["list_critical_updates"],
+                     _("Update RPMs by RHSAs (Critical)"), rpmkeys,
+                     lrpmkeys),
+          make_sheet(data["errata"]["rhsa"]["list_important_updates"],
+                     _("Updates by RHSAs (Important)"), rpmkeys, lrpmkeys),
+          make_sheet(data["errata"]["rhba"]["list_updates_by_kwds"],
+                     _("Updates by RHBAs (Keyword)"), rpmkeys, lrpmkeys)]
 
     if score > 0:
         cvss_ds = [
-            make_dataset(data["errata"]["rhsa"]["list_higher_cvss_score"],
-                         _("RHSAs (CVSS score >= %.1f)") % score,
-                         ("advisory", "severity", "synopsis",
-                         "cves", "cvsses_s", "url"),
-                         (_("advisory"), _("severity"), _("synopsis"),
-                         _("cves"), _("cvsses_s"), _("url"))),
-            make_dataset(data["errata"]["rhsa"]["list_higher_cvss_score"],
-                         _("RHBAs (CVSS score >= %.1f)") % score,
-                         ("advisory", "synopsis", "cves", "cvsses_s", "url"),
-                         (_("advisory"), _("synopsis"), _("cves"),
-                         _("cvsses_s"), _("url")))]
+            make_sheet(data["errata"]["rhsa"]["list_higher_cvss_score"],
+                       _("RHSAs (CVSS score >= %.1f)") % score,
+                       ("advisory", "severity", "synopsis",
+                       "cves", "cvsses_s", "url"),
+                       (_("advisory"), _("severity"), _("synopsis"),
+                       _("cves"), _("cvsses_s"), _("url"))),
+            make_sheet(data["errata"]["rhsa"]["list_higher_cvss_score"],
+                       _("RHBAs (CVSS score >= %.1f)") % score,
+                       ("advisory", "synopsis", "cves", "cvsses_s", "url"),
+                       (_("advisory"), _("synopsis"), _("cves"),
+                       _("cvsses_s"), _("url")))]
         ds.extend(cvss_ds)
 
     if data["installed"]["list_rebuilt"]:
-        ds.append(make_dataset(data["installed"]["list_rebuilt"],
-                               _("Rebuilt RPMs"), rpmdkeys, lrpmdkeys))
+        ds.append(make_sheet(data["installed"]["list_rebuilt"],
+                             _("Rebuilt RPMs"), rpmdkeys, lrpmdkeys))
 
     if data["installed"]["list_replaced"]:
-        ds.append(make_dataset(data["installed"]["list_replaced"],
-                               _("Replaced RPMs"), rpmdkeys, lrpmdkeys))
+        ds.append(make_sheet(data["installed"]["list_replaced"],
+                             _("Replaced RPMs"), rpmdkeys, lrpmdkeys))
 
     if data["installed"]["list_from_others"]:
-        ds.append(make_dataset(data["installed"]["list_from_others"],
-                               _("RPMs from other vendors"), rpmdkeys,
-                               lrpmdkeys))
+        ds.append(make_sheet(data["installed"]["list_from_others"],
+                             _("RPMs from other vendors"), rpmdkeys,
+                             lrpmdkeys))
 
-    dump_xls(ds, os.path.join(workdir, "errata_summary.xls"))
+    RUR.dump(ds, os.path.join(workdir, "errata_summary"), fmt)
 
     if details:
-        dds = [make_dataset(errata, _("Errata Details"),
-                            ("advisory", "type", "severity", "synopsis",
-                             "description", "issue_date", "update_date", "url",
-                             "cves", "bzs", "update_names"),
-                            (_("advisory"), _("type"), _("severity"),
-                            _("synopsis"), _("description"), _("issue_date"),
-                            _("update_date"), _("url"), _("cves"),
-                            _("bzs"), _("update_names"))),
-               make_dataset(updates, _("Update RPMs"), rpmkeys, lrpmkeys),
-               make_dataset(rpms, _("Installed RPMs"), rpmdkeys, lrpmdkeys)]
+        dds = [make_sheet(errata, _("Errata Details"),
+                          ("advisory", "type", "severity", "synopsis",
+                           "description", "issue_date", "update_date", "url",
+                           "cves", "bzs", "update_names"),
+                          (_("advisory"), _("type"), _("severity"),
+                          _("synopsis"), _("description"), _("issue_date"),
+                          _("update_date"), _("url"), _("cves"),
+                          _("bzs"), _("update_names"))),
+               make_sheet(updates, _("Update RPMs"), rpmkeys, lrpmkeys),
+               make_sheet(rpms, _("Installed RPMs"), rpmdkeys, lrpmdkeys)]
 
-        dump_xls(dds, os.path.join(workdir, "errata_details.xls"))
+        RUR.dump(dds, os.path.join(workdir, "errata_details"), fmt)
 
 
 def get_backend(backend, fallback=rpmkit.updateinfo.yumbase.Base,
@@ -917,8 +1220,9 @@ def prepare(root, workdir=None, repos=[], did=None, cachedir=None,
                  host.id, root)
         return host
 
-    base = get_backend(backend)(host.root, host.repos, workdir=host.workdir,
-                                cachedir=cachedir)
+    bcls = get_backend(backend, backends=backends)
+    base = bcls(host.root, host.repos, workdir=host.workdir,
+                cachedir=cachedir)
     LOG.debug(_("%s: Initialized backend %s"), host.id, base.name)
     host.base = base
 
@@ -969,13 +1273,136 @@ def errata_in_period(errata, start_date, end_date):
     :param start_date, end_date: Start and end date of period,
         (year :: int, month :: int, day :: int)
     """
-    d = _d2i(errata_date(errata["issue_date"]))
+    d = issue_date_i(errata)
 
     return start_date <= d and d < end_date
 
 
+def monthly_periods(nmonths, end_date=_TODAY):
+    """
+    :param nmonths: Number of months
+    :param end_date: Date in the last month in format of YYYY[-MM[-DD]]
+
+    :return: A list of periods of months, [(start_date, end_date)]
+
+    >>> monthly_periods(3, "2014-02-10")
+    [(20131201, 20140101), (20140101, 20140201), (20140201, 20140301)]
+    """
+    (year, mon, _day) = ymd_to_date(end_date)
+    periods = []
+    for _i in range(nmonths):
+        periods.append((_d2i((year, mon, 1)),
+                        _d2i(round_ymd(year, mon, None, True))))
+        (year, mon) = (year - 1, 12) if mon == 1 else (year, mon - 1)
+
+    return periods[::-1]
+
+
+def partition_errata_by_periods(errata, periods):
+    """
+    Partition errata into periods by their issue dates in one pass.
+
+    :param errata: A list of errata
+    :param periods: A list of periods, [(start_date, end_date)], may overlap
+        each other. See also :function:`errata_in_period`
+
+    :return: A list of lists of errata in each period in order of `periods`
+
+    >>> es = [dict(issue_date_i=d) for d in (20140105, 20140201, 20140310)]
+    >>> ps = monthly_periods(2, "2014-02")
+    >>> [[e["issue_date_i"] for e in pes] for pes
+    ...  in partition_errata_by_periods(es, ps)]
+    [[20140105], [20140201]]
+    """
+    idxs = sorted(range(len(periods)), key=lambda i: periods[i])
+    starts = [periods[i][0] for i in idxs]
+    parts = [[] for _p in periods]
+
+    for e in errata:
+        d = issue_date_i(e)
+        for j in range(bisect.bisect_right(starts, d) - 1, -1, -1):
+            if d < periods[idxs[j]][1]:
+                parts[idxs[j]].append(e)
+
+    return parts
+
+
+_SEVERITIES = ("Critical", "Important", "Moderate", "Low")
+
+
+def summarize_errata_in_period(errata, start_date, end_date,
+                               severities=_SEVERITIES):
+    """
+    Summarize errata in a period classified already, that is, keywords of
+    RHBAs were checked by :function:`classify_errata`.
+
+    :param errata: A list of errata in the period
+    :param start_date, end_date: Start and end date of period
+    :return: A dict of numbers of errata by types and severities
+    """
+    ret = dict(start_date=start_date, end_date=end_date, rhsa=0, rhba=0,
+               rhea=0, rhba_by_kwds=0)
+    sevkeys = dict((_RHSA_SEVERITIES[sev], "rhsa_" + sev.lower()) for sev
+                   in severities)
+    for key in sevkeys.values():
+        ret[key] = 0
+
+    names = set()
+    for e in errata:
+        type_c = normalize_errata(e)["type_c"]
+        if type_c == _RHSA:
+            ret["rhsa"] += 1
+            key = sevkeys.get(e["severity_c"])
+            if key is not None:
+                ret[key] += 1
+
+        elif type_c == _RHBA:
+            ret["rhba"] += 1
+            if e.get("keywords"):
+                ret["rhba_by_kwds"] += 1
+
+        elif type_c == _RHEA:
+            ret["rhea"] += 1
+
+        names.update(e.get("update_names", []))
+
+    ret["update_names"] = len(names)
+    return ret
+
+
+def dump_periods_results(workdir, errata, periods, fmt=None):
+    """
+    Partition errata into periods and dump summaries of them at once
+    instead of analyzing errata in each period.
+
+    :param workdir: Working dir to dump the result
+    :param errata: A list of errata classified already
+    :param periods: A list of periods, [(start_date, end_date)]
+    :param fmt: Format of reports or None (default format)
+
+    :return: A list of summaries of errata in periods
+    """
+    data = [summarize_errata_in_period(pes, *period) for pes, period
+            in itertools.izip(partition_errata_by_periods(errata, periods),
+                              periods)]
+    U.json_dump(dict(data=data), os.path.join(workdir, "periods.json"))
+
+    keys = ["start_date", "end_date", "rhsa"] + \
+        ["rhsa_" + sev.lower() for sev in _SEVERITIES] + \
+        ["rhba", "rhba_by_kwds", "rhea", "update_names"]
+    lkeys = [_("start date"), _("end date"), _("# of RHSAs")] + \
+        [_("# of %s RHSAs") % _(sev) for sev in _SEVERITIES] + \
+        [_("# of RHBAs"), _("# of RHBAs by keywords"), _("# of RHEAs"),
+         _("# of Update RPMs")]
+    RUR.dump([make_sheet(data, _("Errata by periods"), keys, lkeys)],
+             os.path.join(workdir, "errata_periods"), fmt)
+
+    return data
+
+
 def analyze(host, score=0, keywords=ERRATA_KEYWORDS, core_rpms=[],
-            period=(), refdir=None, nevra_keys=NEVRA_KEYS):
+            period=(), refdir=None, fmt=None, store=False, periods=(),
+            nevra_keys=NEVRA_KEYS):
     """
     :param host: host object function :function:`prepare` returns
     :param score: CVSS base metrics score
@@ -985,6 +1412,10 @@ def analyze(host, score=0, keywords=ERRATA_KEYWORDS, core_rpms=[],
         ex. ("2014-10-01", "2014-11-01")
     :param refdir: A dir holding reference data previously generated to
         compute delta (updates since that data)
+    :param fmt: Format of reports or None (default format)
+    :param store: Save results in the database also if True
+    :param periods: A list of periods, [(start_date, end_date)], to summarize
+        errata in each period, e.g. :function:`monthly_periods` returns
     """
     base = host.base
     workdir = host.workdir
@@ -1003,9 +1434,10 @@ def analyze(host, score=0, keywords=ERRATA_KEYWORDS, core_rpms=[],
     U.json_dump(metadata.toDict(), os.path.join(workdir, "metadata.json"))
 
     us = U.uniq(base.list_updates(), key=itemgetter(*nevra_keys))
-    es = base.list_errata()
-    es = U.uniq(errata_complement_g(es, us, score), key=itemgetter("id"),
-                reverse=True)
+    es = base.list_errata_g()
+    es = sorted(U.unique_g(errata_complement_g(es, us, score),
+                           itemgetter("advisory")),
+                key=itemgetter("id"), reverse=True)
     LOG.info(_("%s: Found %d Errata, %d Update RPMs"), host.id, len(es),
              len(us))
 
@@ -1017,9 +1449,14 @@ def analyze(host, score=0, keywords=ERRATA_KEYWORDS, core_rpms=[],
     host.updates = us
     ips = host.installed
 
+    if store:
+        path = RUS.dump_results(workdir, host.id or host.root, ips, es, us)
+        LOG.debug(_("%s: Saved results in %s"), host.id, path)
+
     LOG.info(_("%s: Analyze and dump results of errata data in %s"),
              host.id, workdir)
-    dump_results(workdir, ips, es, us, score, keywords, core_rpms)
+    dump_results(workdir, ips, es, us, score, keywords, core_rpms,
+                 fmt=fmt)
 
     if period:
         (start_date, end_date) = period_to_dates(*period)
@@ -1032,12 +1469,20 @@ def analyze(host, score=0, keywords=ERRATA_KEYWORDS, core_rpms=[],
             LOG.debug(_("%s: Creating period working dir %s"), host.id, pdir)
             os.makedirs(pdir)
 
-        dump_results(pdir, ips, pes, us, score, keywords, core_rpms, False)
+        dump_results(pdir, ips, pes, us, score, keywords, core_rpms, False,
+                     fmt=fmt)
+
+    if periods:
+        LOG.info(_("%s: Summarize errata in %d periods"), host.id,
+                 len(periods))
+        dump_periods_results(workdir, es, periods, fmt)
 
     if refdir:
         LOG.debug(_("%s [delta]: Analyze delta errata data by refering %s"),
                   host.id, refdir)
-        (es, us) = compute_delta(refdir, es, us)
+        diff = compute_delta_diff(refdir, es, us)
+        es = diff["errata"]["added"]
+        us = diff["updates"]["added"] + diff["updates"]["changed"]
         LOG.info(_("%s [delta]: Found %d Errata, %d Update RPMs"), host.id,
                  len(es), len(us))
 
@@ -1049,16 +1494,19 @@ def analyze(host, score=0, keywords=ERRATA_KEYWORDS, core_rpms=[],
 
         U.json_dump(dict(data=es, ), errata_list_path(deltadir))
         U.json_dump(dict(data=us, ), updates_file_path(deltadir))
+        U.json_dump(diff, os.path.join(deltadir, "diff.json"))
 
         LOG.info(_("%s: Analyze and dump results of delta errata in %s"),
                  host.id, deltadir)
-        dump_results(workdir, ips, es, us, score, keywords, core_rpms)
+        dump_results(deltadir, ips, es, us, score, keywords, core_rpms,
+                     fmt=fmt)
 
 
 def main(root, workdir=None, repos=[], did=None, score=0,
          keywords=ERRATA_KEYWORDS, rpms=CORE_RPMS, period=(),
          cachedir=None, refdir=None, verbosity=0,
-         backend=DEFAULT_BACKEND, backends=BACKENDS):
+         backend=DEFAULT_BACKEND, backends=BACKENDS, fmt=None,
+         store=False, periods=()):
     """
     :param root: Root dir of RPM db, ex. / (/var/lib/rpm)
     :param workdir: Working dir to save results
@@ -1075,11 +1523,15 @@ def main(root, workdir=None, repos=[], did=None, score=0,
     :param verbosity: Verbosity level: 0 (default), 1 (verbose), 2 (debug)
     :param backend: Backend module to use to get updates and errata
     :param backends: Backend list
+    :param fmt: Format of reports or None (default format)
+    :param store: Save results in the database also if True
+    :param periods: A list of periods to summarize errata in each period
     """
     set_loglevel(verbosity)
 
     host = prepare(root, workdir, repos, did, cachedir, backend, backends)
     if host.available:
-        analyze(host, score, keywords, rpms, period, refdir)
+        analyze(host, score, keywords, rpms, period, refdir, fmt, store,
+                periods)
 
 # vim:sw=4:ts=4:et:
@@ -8,104 +8,418 @@
 # License: GPLv3+
 #
 from rpmkit.globals import _
+from operator import itemgetter
 
 import rpmkit.updateinfo.main as RUM
+import rpmkit.updateinfo.base
+import rpmkit.updateinfo.repodata
+import rpmkit.updateinfo.report
+import rpmkit.updateinfo.store
 import rpmkit.updateinfo.utils
+import rpmkit.updateinfo.yumwrapper
+import rpmkit.rpmutils
 import rpmkit.utils as U
 
 # It looks available in EPEL for RHELs:
 #   https://apps.fedoraproject.org/packages/python-bunch
 import bunch
+import collections
+import contextlib
+import functools
 import glob
+import hashlib
 import itertools
+import json
 import logging
 import multiprocessing
 import operator
 import os
 import os.path
 import shutil
+import time
 
 
 LOG = logging.getLogger("rpmkit.updateinfo")
 
 
-def hosts_rpmroot_g(hosts_datadir):
+def scan_rpmdb(args):
     """
-    List system names from assessment datadir.
+    Scan the RPM DB of a host and extract its installed RPMs table. This is
+    run in a worker process and opens its own rpm.TransactionSet in it.
 
-    This function expects that assessment data (rpm db files) of each hosts are
-    found under $host_identity/ in `datadir`, that is,
-    `datadir`/<host_identity>/var/lib/rpm/Packages exists. If rpm db file[s]
-    are not found for a host, that host will be simply ignored.
+    :param args: A tuple of (host_identity, host_rpmroot, keys) where keys
+        are RPM Package dict keys (columns of the table)
 
-    <host_identity> may be a hostname, host id, fqdn or something to
-    identify that host.
+    :return: A tuple of (host_identity, [(value_of_keys, ...)] or None if RPM
+        DB is not available, elapsed time to scan in seconds)
+    """
+    (hid, root, keys) = args
+    start = time.time()
+
+    if not rpmkit.updateinfo.utils.check_rpmdb_root(root):
+        return (hid, None, time.time() - start)
+
+    try:
+        table = sorted(tuple(p[k] for k in keys) for p
+                       in rpmkit.rpmutils.list_installed_rpms_g(root, keys))
+    except Exception as exc:
+        LOG.warn(_("%s: Failed to scan RPM DB: %s"), hid, exc)
+        table = None
+
+    return (hid, table, time.time() - start)
+
+
+def fingerprint(table):
+    """
+    Compute the fingerprint of an installed RPMs table, that is, a hash of
+    the sorted set of its rows.
+
+    :param table: A list of tuples of RPM info, e.g. [(N, E, V, R, A)]
+
+    >>> t0 = [("bash", 0, "4.1.2", "15.el6", "x86_64"),
+    ...       ("zlib", 0, "1.2.3", "29.el6", "x86_64")]
+    >>> fingerprint(t0) == fingerprint(list(reversed(t0)) + t0[:1])
+    True
+    >>> fingerprint(t0) == fingerprint(t0[:1])
+    False
+    """
+    digest = hashlib.sha1()
+    for row in sorted(set(tuple(r) for r in table)):
+        digest.update('\t'.join(str(c) for c in row) + '\n')
+
+    return digest.hexdigest()
+
+
+def fingerprint_rpmdb(args):
+    """
+    Scan the RPM DB of a host and compute the fingerprint of its installed
+    RPMs in a worker process. Only the fingerprint is sent back to the parent
+    process instead of the whole table.
 
+    :param args: Same as :function:`scan_rpmdb`'s
+
+    :return: A tuple of (host_identity, fingerprint or None if RPM DB is not
+        available, number of RPMs, elapsed time to scan in seconds)
+    """
+    (hid, table, elapsed) = scan_rpmdb(args)
+    if table is None:
+        return (hid, None, 0, elapsed)
+
+    return (hid, fingerprint(table), len(table), elapsed)
+
+
+def _map_hosts_g(worker, hosts_datadir, keys, nprocs):
+    """
+    :param worker: Function to process each host's RPM DB
     :param hosts_datadir: Dir in which rpm db roots of hosts exist
-    :return: A generator to yield a tuple,
-        (host_identity, host_rpmroot or None)
+    :param keys: RPM Package dict keys (columns of the table)
+    :param nprocs: Number of worker processes; cpu_count() is used if None,
+        and the RPM DBs are processed in this process if it's 1
+
+    :return: A generator to yield results of `worker`
     """
-    for hostdir in glob.glob(os.path.join(hosts_datadir, '*')):
-        if rpmkit.updateinfo.utils.check_rpmdb_root(hostdir):
-            yield (os.path.basename(hostdir), hostdir)
+    hostdirs = sorted(glob.glob(os.path.join(hosts_datadir, '*')))
+    args = [(os.path.basename(d), d, keys) for d in hostdirs]
+
+    if nprocs is None:
+        nprocs = multiprocessing.cpu_count()
+
+    if nprocs == 1 or len(args) < 2:
+        results = itertools.imap(worker, args)
+        pool = None
+    else:
+        pool = multiprocessing.Pool(min(nprocs, len(args)))
+        results = pool.imap_unordered(worker, args)
+
+    done = False
+    try:
+        for result in results:
+            yield result
+        done = True
+    finally:
+        if pool is not None:
+            if done:
+                pool.close()
+            else:  # Stopped in the middle; do not wait for the rest.
+                pool.terminate()
+            pool.join()
+
+
+def scan_rpmdbs_g(hosts_datadir, keys=RUM.NEVRA_KEYS, nprocs=None):
+    """
+    Scan RPM DBs of hosts under ``hosts_datadir`` in parallel and extract
+    installed RPMs tables of them.
+
+    :param hosts_datadir: Dir in which rpm db roots of hosts exist
+    :param keys: RPM Package dict keys (columns of the table)
+    :param nprocs: Number of worker processes; cpu_count() is used if None,
+        and the RPM DBs are scanned in this process if it's 1
+
+    :return: A generator to yield a tuple of (host_identity, table or None,
+        elapsed time to scan in seconds) in order of completion
+    """
+    for (hid, table, elapsed) in _map_hosts_g(scan_rpmdb, hosts_datadir,
+                                              keys, nprocs):
+        if table is None:
+            LOG.warn(_("Failed to find RPM DBs of %s"), hid)
         else:
-            LOG.warn(_("Failed to find RPM DBs under %s"), hostdir)
-            yield (os.path.basename(hostdir), None)
+            LOG.info(_("%s: Scanned %d RPMs in %.2f [sec]"), hid,
+                     len(table), elapsed)
+        yield (hid, table, elapsed)
+
+
+def fingerprint_rpmdbs_g(hosts_datadir, keys=RUM.NEVRA_KEYS, nprocs=None):
+    """
+    Scan RPM DBs of hosts under ``hosts_datadir`` in parallel and compute
+    fingerprints of their installed RPMs.
+
+    :param hosts_datadir: Dir in which rpm db roots of hosts exist
+    :param keys: RPM Package dict keys (columns of the table)
+    :param nprocs: Number of worker processes or None (cpu_count())
+
+    :return: A generator to yield a tuple of (host_identity, fingerprint or
+        None) in order of completion
+    """
+    for (hid, fprint, nrpms, elapsed) in _map_hosts_g(fingerprint_rpmdb,
+                                                      hosts_datadir, keys,
+                                                      nprocs):
+        if fprint is None:
+            LOG.warn(_("Failed to find RPM DBs of %s"), hid)
+        else:
+            LOG.info(_("%s: Scanned %d RPMs in %.2f [sec], fingerprint=%s"),
+                     hid, nrpms, elapsed, fprint)
+        yield (hid, fprint)
 
 
 def touch(filepath):
-    open(filepath, 'w').write()
+    open(filepath, 'w').write('')
+
+
+REPODATA_BACKEND = "repodata"
+
+# Repo metadata loaded before worker processes are forked, shared (inherited)
+# among them in multiproc mode: {repos_key: RepoData or None}
+_REPODATAS = dict()
 
 
-def prepare(hosts_datadir, workdir=None, repos=[], cachedir=None,
-            backend=RUM.DEFAULT_BACKEND, backends=RUM.BACKENDS):
+def host_repos(root, repos=[]):
     """
-    Scan and collect hosts' basic data (installed rpms list, etc.).
+    :param root: RPM DB root dir of the host
+    :param repos: List of yum repos given or empty list to guess them
+    """
+    return repos if repos else rpmkit.updateinfo.utils.guess_rhel_repos(root)
 
-    :param hosts_datadir: Dir in which rpm db roots of hosts exist
-    :param workdir: Working dir to save results
-    :param repos: List of yum repos to get updateinfo data (errata and updtes)
-    :param cachedir: A dir to save metadata cache of yum repos
+
+def load_repodata(args):
+    """
+    Load repo metadata with the backend. It may be run in a worker process.
+
+    :param args: A tuple of (host_rpmroot, host_workdir, repos, cachedir,
+        backend, backends)
+
+    :return: A :class:`rpmkit.updateinfo.repodata.RepoData` object or None if
+        the backend does not support to load repo metadata
+    """
+    (root, hworkdir, repos, cachedir, backend, backends) = args
+    start = time.time()
+
+    base = RUM.get_backend(backend, backends=backends)(root, repos,
+                                                       workdir=hworkdir,
+                                                       cachedir=cachedir)
+    try:
+        repodata = rpmkit.updateinfo.repodata.load(base)
+    except NotImplementedError:
+        LOG.info(_("Backend %s cannot share repo metadata among hosts"),
+                 base.name)
+        return None
+
+    LOG.info(_("Loaded metadata of repos %s in %.1f [sec]"), ', '.join(repos),
+             time.time() - start)
+    return repodata
+
+
+def repodata_backends(repodata):
+    """
+    :param repodata: A :class:`rpmkit.updateinfo.repodata.RepoData` object
+    :return: Backends dict to query `repodata` instead of loading repos
+    """
+    backend = functools.partial(rpmkit.updateinfo.repodata.Base,
+                                repodata=repodata)
+    return {REPODATA_BACKEND: backend}
+
+
+YUM_RESULT_BACKEND = "yumresult"
+
+# Results of yum run for hosts before worker processes are forked, shared
+# (inherited) among them: {host_identity: result of yumwrapper.run_job}
+_YUM_RESULTS = dict()
+
+
+_YUM_ERRATA_KEYS = ("advisory", "type", "severity", "url")
+
+
+class YumResultBase(rpmkit.updateinfo.base.Base):
+    name = "rpmkit.updateinfo.multihosts.yumresult"
+
+    def __init__(self, root='/', repos=[], disabled_repos=['*'],
+                 workdir=None, result=None, **kwargs):
+        """
+        Backend to return errata and updates found by yum run for the host in
+        advance instead of running yum. Installed packages are read from the
+        RPM DB under `root` directly.
+
+        :param root: RPM DB root dir
+        :param repos: A list of repos to enable
+        :param disabled_repos: A list of repos to disable
+        :param workdir: Working dir to save logs and results
+        :param result: A result of :function:`yumwrapper.run_job`
+        """
+        super(YumResultBase, self).__init__(root, repos, disabled_repos,
+                                            workdir, **kwargs)
+        assert result is not None, "No results of yum were given!"
+        self.result = result
+
+    def list_installed_impl(self, **kwargs):
+        keys = rpmkit.updateinfo.repodata.INSTALLED_KEYS
+        xs = [rpmkit.updateinfo.base.Package(**p) for p
+              in rpmkit.rpmutils.list_installed_rpms_g(self.root, keys)]
+        self._packages["installed"] = xs
+
+        return xs
+
+    def list_updates_impl(self, **kwargs):
+        return self.result["updates"]
+
+    def list_errata_impl(self, **kwargs):
+        """
+        'yum list-sec' lists errata per update package and does not show
+        their synopsis, description and issue date, so make an errata having
+        packages from them and empty values of these.
+        """
+        errata = collections.OrderedDict()
+        for x in self.result["errata"]:
+            e = errata.get(x["advisory"])
+            if e is None:
+                e = errata[x["advisory"]] = dict(synopsis='', description='',
+                                                 issue_date='', packages=[],
+                                                 **dict((k, x[k]) for k in
+                                                        _YUM_ERRATA_KEYS))
+            e["packages"].append(dict((k, x[k]) for k in RUM.NEVRA_KEYS))
+
+        return errata.values()
+
+
+def yum_result_backends(result):
+    """
+    :param result: A result of :function:`yumwrapper.run_job`
+    :return: Backends dict to return `result` instead of running yum
+    """
+    return {YUM_RESULT_BACKEND: functools.partial(YumResultBase,
+                                                  result=result)}
+
+
+def is_yumwrapper(backend, backends=RUM.BACKENDS):
+    """
     :param backend: Backend module to use to get updates and errata
     :param backends: Backend list
+    """
+    bcls = RUM.get_backend(backend, backends=backends)
+    return bcls is rpmkit.updateinfo.yumwrapper.Base
+
 
-    :return: A generator to yield a tuple,
-        (host_identity, host_rpmroot or None)
+def run_yum_jobs(jobs, nworkers, cachedir=None):
     """
-    if workdir is None:
-        LOG.info(_("Set workdir to hosts_datadir: %s"), hosts_datadir)
-        workdir = hosts_datadir
-    else:
-        if not os.path.exists(workdir):
-            LOG.debug(_("Creating working dir: %s"), workdir)
-            os.makedirs(workdir)
+    Run yum for hosts with at most `nworkers` yum processes running
+    concurrently and keep results in this process to share with worker
+    processes forked later.
 
-    for h, root in hosts_rpmroot_g(hosts_datadir):
-        hworkdir = os.path.join(workdir, h)
-        if not hworkdir:
-            os.makedirs(hworkdir)
+    :param jobs: A list of arguments of :function:`prepare_and_analyze`
+    :param nworkers: Max number of yum processes run concurrently
+    :param cachedir: Shared yum cache dir or None, see
+        :function:`yumwrapper.run_jobs_g`
 
-        if root is None:
-            touch(os.path.join(hworkdir, "RPMDB_NOT_AVAILABLE"))
-            yield bunch.bunchify(dict(id=h, workdir=hworkdir, available=False))
+    :return: A list of host identities of which yum runs failed
+    """
+    yjobs = [dict(id=hid, root=root, workdir=hworkdir, repos=repos) for
+             (hid, root, hworkdir, repos, _cachedir, _backend, _backends,
+              _aargs) in jobs]
+    failed = []
+    results = rpmkit.updateinfo.yumwrapper.run_jobs_g(yjobs, nworkers,
+                                                      shared_cachedir=cachedir)
+    for i, result in enumerate(results, 1):
+        hid = result["id"]
+        if result["error"] is None:
+            _YUM_RESULTS[hid] = result
         else:
-            yield RUM.prepare(root, hworkdir, repos, h, cachedir, backend,
-                              backends)
+            LOG.error(_("%s: Failed to run yum: %s"), hid, result["error"])
+            failed.append(hid)
+
+        LOG.info(_("[%d/%d] %s: Ran yum in %.1f [sec]"), i, len(yjobs), hid,
+                 result["elapsed"])
 
+    return failed
 
-def p2nevra(p):
+
+_GROUPS_FILE = "hosts_groups.json"
+
+
+def group_hosts(hosts_datadir, workdir, nprocs=None):
     """
-    :param p: A dict represents package info including N, E, V, R, A
+    Group hosts having same installed RPMs by fingerprints computed from their
+    RPM DBs directly, before any backend objects are instantiated.
+
+    :param hosts_datadir: Dir in which rpm db roots of hosts exist
+    :param workdir: Working dir to save results
+    :param nprocs: Number of worker processes or None (cpu_count())
+
+    :return: A list of tuples of (fingerprint, [host_identity]); the first
+        host in each list is the representative host to analyze
     """
-    return operator.itemgetter("name", "epoch", "version", "release",
-                               "arch")(p)
+    if not os.path.exists(workdir):
+        LOG.debug(_("Creating working dir: %s"), workdir)
+        os.makedirs(workdir)
+
+    # :: {fingerprint: [host_identity]}
+    groups = collections.defaultdict(list)
+    unavailables = []
+
+    for hid, fprint in fingerprint_rpmdbs_g(hosts_datadir, nprocs=nprocs):
+        hworkdir = os.path.join(workdir, hid)
+        if not os.path.exists(hworkdir):
+            os.makedirs(hworkdir)
+
+        if fprint is None:
+            touch(os.path.join(hworkdir, "RPMDB_NOT_AVAILABLE"))
+            unavailables.append(hid)
+        else:
+            groups[fprint].append(hid)
+
+    fhss = sorted(((fp, sorted(hs)) for fp, hs in groups.items()),
+                  key=operator.itemgetter(1))
+    nhosts = sum(len(hs) for _fp, hs in fhss)
+    ratio = (1.0 - float(len(fhss)) / nhosts) if nhosts else 0.0
+
+    LOG.info(_("Found %d unique hosts in %d hosts (%d hosts have same "
+               "installed RPMs as others, dedup ratio: %.1f%%, RPM DB not "
+               "available: %d)"), len(fhss), nhosts, nhosts - len(fhss),
+             ratio * 100, len(unavailables))
+
+    U.json_dump(dict(hosts=nhosts, unique=len(fhss), dedup_ratio=ratio,
+                     unavailables=sorted(unavailables),
+                     groups=[dict(fingerprint=fp, hosts=hs) for fp, hs
+                             in fhss]),
+                os.path.join(workdir, _GROUPS_FILE))
+    return fhss
 
 
 def add_host_to_metadata(workdir, host):
     metadatafile = os.path.join(workdir, "metadata.json")
 
-    shutil.copy2(metadatafile, metadatafile + ".save")
     metadata = U.json_load(metadatafile)
+    if host in metadata["hosts"]:
+        return
+
+    shutil.copy2(metadatafile, metadatafile + ".save")
     metadata["hosts"].append(host)
     U.json_dump(metadata, metadatafile)
 
@@ -124,7 +438,12 @@ def mk_symlinks_to_results_of_ref_host(href, hsrest, curdir=os.curdir):
         LOG.info(_("%s: Make symlinks to results in %s/"), h.id, href_workdir)
         for src in glob.glob(os.path.join(href_workdir, '*.*')):
             dst = os.path.basename(src)
-            if not os.path.exists(dst):
+            if os.path.lexists(dst) and \
+                    os.path.realpath(dst) != os.path.realpath(src):
+                LOG.debug("Remove old result %s", dst)
+                os.remove(dst)
+
+            if not os.path.lexists(dst):
                 LOG.debug("Make a symlink to %s", src)
                 os.symlink(src, dst)
 
@@ -132,14 +451,432 @@ def mk_symlinks_to_results_of_ref_host(href, hsrest, curdir=os.curdir):
         os.chdir(curdir)
 
 
-def analyze(args):
-    RUM.analyze(*args)
+def prepare_and_analyze(args):
+    """
+    Prepare and analyze a host. This is run in a worker process and
+    everything including the backend object is instantiated in it, so that
+    no yum/dnf objects (and their locks) are shared with the parent process.
+
+    :param args: A tuple of (host_identity, host_rpmroot, host_workdir, repos,
+        cachedir, backend, backends, analyze_args) where analyze_args is a
+        tuple of arguments passed to :function:`RUM.analyze` after the host
+
+    :return: A tuple of (host_identity, True if analyzed successfully else
+        False, elapsed time in seconds)
+    """
+    (hid, root, hworkdir, repos, cachedir, backend, backends, aargs) = args
+    start = time.time()
+
+    repodata = _REPODATAS.get(rpmkit.updateinfo.repodata.repos_key(repos,
+                                                                   cachedir))
+    if repodata is not None:
+        (backend, backends) = (REPODATA_BACKEND, repodata_backends(repodata))
+
+    result = _YUM_RESULTS.get(hid)
+    if result is not None:
+        (backend, backends) = (YUM_RESULT_BACKEND, yum_result_backends(result))
+
+    try:
+        host = RUM.prepare(root, hworkdir, repos, hid, cachedir, backend,
+                           backends)
+        if host.available:
+            RUM.analyze(host, *aargs)
+        ok = host.available
+    except Exception as exc:
+        LOG.error(_("%s: Failed to analyze: %s"), hid, exc)
+        ok = False
+
+    return (hid, ok, time.time() - start)
+
+
+def load_repodatas(jobs, nprocs):
+    """
+    Load repo metadata once per repo set in worker processes and keep them in
+    this process to share with worker processes forked later.
+
+    :param jobs: A list of arguments of :function:`prepare_and_analyze`
+    :param nprocs: Number of worker processes; repo metadata are loaded in
+        this process if it's 1
+    """
+    largs = dict()
+    for (_hid, root, hworkdir, repos, cachedir, backend, backends,
+         _aargs) in jobs:
+        key = rpmkit.updateinfo.repodata.repos_key(repos, cachedir)
+        if key not in largs and key not in _REPODATAS:
+            largs[key] = (root, hworkdir, repos, cachedir, backend, backends)
+
+    if not largs:
+        return
+
+    keys = sorted(largs.keys())
+    if nprocs == 1:
+        repodatas = [load_repodata(largs[k]) for k in keys]
+    else:
+        pool = multiprocessing.Pool(min(nprocs, len(keys)),
+                                    maxtasksperchild=1)
+        try:
+            repodatas = pool.map(load_repodata, [largs[k] for k in keys])
+        finally:
+            pool.close()
+            pool.join()
+
+    _REPODATAS.update(zip(keys, repodatas))
+
+
+_STATE_FILE = "run_state.json"
+_RESULT_FILES = ("metadata.json", RUM._ERRATA_LIST_FILE,
+                 RUM._UPDATES_LIST_FILE)
+
+
+def load_run_state(workdir):
+    """
+    :param workdir: Working dir to save results
+    :return: A dict of {host_identity: state of the last run} or {}
+    """
+    path = os.path.join(workdir, _STATE_FILE)
+    if not os.path.exists(path):
+        return dict()
+
+    try:
+        return U.json_load(path)
+    except (IOError, ValueError) as exc:
+        LOG.warn(_("Failed to load the state of the last run: %s"), exc)
+        return dict()
+
+
+def save_run_state(workdir, state):
+    """
+    :param workdir: Working dir to save results
+    :param state: A dict of {host_identity: state}
+    """
+    path = os.path.join(workdir, _STATE_FILE)
+    U.json_dump(state, path + ".new")
+    os.rename(path + ".new", path)
+
+
+def repos_revision(repos, cachedir=None):
+    """
+    Revision of repo metadata, content hash of the loaded repo metadata or
+    checksum of repomd.xml files in `cachedir` if repo metadata is not
+    shared.
+
+    :param repos: List of yum repos
+    :param cachedir: A dir to save metadata cache of yum repos
+    :return: A revision string or None if it's unknown
+    """
+    repodata = _REPODATAS.get(rpmkit.updateinfo.repodata.repos_key(repos,
+                                                                   cachedir))
+    if repodata is not None:
+        return repodata.revision()
+
+    if cachedir is None:
+        return None
+
+    paths = [os.path.join(cachedir, r, "repomd.xml") for r in sorted(repos)]
+    if not all(os.path.exists(p) for p in paths):
+        return None
+
+    digest = hashlib.sha1()
+    for path in paths:
+        digest.update(open(path).read())
+
+    return digest.hexdigest()
+
+
+def host_state(fprint, job):
+    """
+    :param fprint: Fingerprint of installed RPMs of the host
+    :param job: Arguments of :function:`prepare_and_analyze` for the host
+
+    :return: A dict represents inputs of the analysis of the host
+    """
+    (_hid, _root, _hworkdir, repos, cachedir, backend, _backends,
+     aargs) = job
+    state = dict(fingerprint=fprint, repos=sorted(repos),
+                 revision=repos_revision(repos, cachedir),
+                 backend=getattr(backend, "name", backend), params=aargs)
+
+    return json.loads(json.dumps(state))  # Normalize tuples, etc.
+
+
+def is_unchanged(hworkdir, state, prev_state):
+    """
+    :param hworkdir: Working dir of the host
+    :param state: State of the host in this run, see :function:`host_state`
+    :param prev_state: State of the host in the last run or None
+    """
+    if state["revision"] is None or state != prev_state:
+        return False
+
+    return all(os.path.exists(os.path.join(hworkdir, f)) for f
+               in _RESULT_FILES)
+
+
+def remove_symlinks(hworkdir):
+    """
+    Remove symlinks to other host's results made in the last run not to
+    overwrite that host's results.
+
+    :param hworkdir: Working dir of the host
+    """
+    for path in glob.glob(os.path.join(hworkdir, '*')):
+        if os.path.islink(path):
+            os.remove(path)
+
+
+def analyze_hosts(hosts_datadir, workdir, repos=[], cachedir=None,
+                  backend=RUM.DEFAULT_BACKEND, backends=RUM.BACKENDS,
+                  aargs=(), nprocs=None, share_repodata=True,
+                  incremental=True, fmt=None, store=False):
+    """
+    Analyze hosts with a bounded process pool. Hosts having same installed
+    RPMs are found from the RPM DB scan results and only one of them is
+    analyzed.
+
+    :param hosts_datadir: Dir in which rpm db roots of hosts exist
+    :param workdir: Working dir to save results
+    :param repos: List of yum repos to get updateinfo data (errata and updtes)
+    :param cachedir: A dir to save metadata cache of yum repos. It's shared
+        among hosts as yum's cache dir for the yumwrapper backend.
+    :param backend: Backend module to use to get updates and errata
+    :param backends: Backend list
+    :param aargs: A tuple of arguments passed to :function:`RUM.analyze`
+    :param nprocs: Number of worker processes or None (cpu_count()); hosts
+        are analyzed in this process one by one if it's 1. It's also the max
+        number of yum processes run concurrently for the yumwrapper backend.
+    :param share_repodata: Load repo metadata only once per repo set and
+        share it among hosts if True
+    :param incremental: Skip to analyze hosts of which RPM DB, repo metadata
+        and analysis parameters are same as the last run if True
+    :param fmt: Format of the fleet level report or None (default format)
+    :param store: Save results of all hosts in the database also if True
+    """
+    if nprocs is None:
+        nprocs = multiprocessing.cpu_count()
+
+    fhss = group_hosts(hosts_datadir, workdir, nprocs)
+    roots = [os.path.join(hosts_datadir, hs[0]) for _fp, hs in fhss]
+    jobs = [(hs[0], root, os.path.join(workdir, hs[0]),
+             host_repos(root, repos), cachedir, backend, backends, aargs)
+            for (_fp, hs), root in itertools.izip(fhss, roots)]
+    results = {}
+
+    if share_repodata:
+        load_repodatas(jobs, nprocs)
+
+    prev_states = load_run_state(workdir) if incremental else dict()
+    states = dict((job[0], host_state(fp, job)) for (fp, _hs), job
+                  in itertools.izip(fhss, jobs))
+
+    todo = []
+    for job in jobs:
+        (hid, hworkdir) = (job[0], job[2])
+        if is_unchanged(hworkdir, states[hid], prev_states.get(hid)):
+            LOG.info(_("%s: Skip to analyze as nothing was changed since the "
+                       "last run"), hid)
+            results[hid] = True
+        else:
+            remove_symlinks(hworkdir)
+            todo.append(job)
+
+    # Run yum for hosts concurrently in advance and analyze its results in
+    # worker processes, instead of running yum there one by one.
+    nunchanged = len(jobs) - len(todo)
+    _YUM_RESULTS.clear()
+    if todo and is_yumwrapper(backend, backends):
+        failed = run_yum_jobs(todo, nprocs, cachedir)
+        results.update((hid, False) for hid in failed)
+        todo = [job for job in todo if job[0] not in failed]
+
+    LOG.info(_("Analyze %d hosts (%d hosts were not changed)"), len(todo),
+             nunchanged)
+
+    if nprocs == 1:
+        (pool, rs) = (None, itertools.imap(prepare_and_analyze, todo))
+    else:
+        # New worker process per task to start from a clean state every time.
+        pool = multiprocessing.Pool(nprocs, maxtasksperchild=1)
+        rs = pool.imap_unordered(prepare_and_analyze, todo)
+    try:
+        for i, (hid, ok, elapsed) in enumerate(rs, 1):
+            results[hid] = ok
+            LOG.info(_("[%d/%d] %s: %s in %.1f [sec]"), i, len(todo), hid,
+                     "Analyzed" if ok else "Failed", elapsed)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    save_run_state(workdir, dict((hid, state) for hid, state
+                                 in states.items() if results.get(hid)))
+    hss = [hs for _fp, hs in fhss if results.get(hs[0])]
+    link_results_of_groups(workdir, hss, results)
+
+    LOG.info(_("Aggregate results of %d hosts"), sum(len(hs) for hs in hss))
+    dump_fleet_results(workdir, aggregate_results(workdir, hss), fmt)
+
+    if store:
+        dump_fleet_store(workdir, hss)
+
+
+def link_results_of_groups(workdir, hss, results):
+    """
+    Make symlinks to the results of the representative host in each group
+    from the rest of hosts in that group.
+
+    :param workdir: Working dir to save results
+    :param hss: A list of lists of host identities, see :function:`group_hosts`
+    :param results: A dict of {host_identity: True if analyzed successfully}
+    """
+    def mkh(hid):
+        return bunch.bunchify(dict(id=hid, workdir=os.path.join(workdir,
+                                                                hid)))
+
+    curdir = os.getcwd()
+    for hs in hss:
+        if len(hs) > 1 and results.get(hs[0]):
+            LOG.info(_("Skip to analyze %s as its installed RPMs are "
+                       "exactly same as %s's"), ','.join(hs[1:]), hs[0])
+            mk_symlinks_to_results_of_ref_host(mkh(hs[0]),
+                                               [mkh(h) for h in hs[1:]],
+                                               curdir)
+
+
+def _load_data_g(path):
+    """
+    :param path: Path of the errata or updates list file of a host
+    :return: A generator yields items in the list file one by one without
+        loading all of them
+    """
+    if os.path.exists(path):
+        with U.copen(path) as inp:
+            for x in U.json_load_g(inp, "data"):
+                yield x
+
+
+def aggregate_results(workdir, hss):
+    """
+    Aggregate the results of hosts and index errata and update RPMs with the
+    number of hosts affected by them. Results of the hosts are loaded one by
+    one and only once for each group of hosts having same installed RPMs.
+
+    :param workdir: Working dir to save results
+    :param hss: A list of lists of host identities, see :function:`group_hosts`
+
+    :return: A dict of aggregated data
+    """
+    errata = dict()  # :: {advisory: errata summary}
+    updates = dict()  # :: {(name, arch): update rpm summary}
+    sevs = dict()  # :: {(type, severity): totals}
+    nhosts = 0
+
+    for hs in hss:
+        hworkdir = os.path.join(workdir, hs[0])
+        nhs = len(hs)
+        nhosts += nhs
+
+        hsevs = set()
+        for e in _load_data_g(RUM.errata_list_path(hworkdir)):
+            adv = e["advisory"]
+            if adv not in errata:
+                errata[adv] = dict(advisory=adv, type=e.get("type", "N/A"),
+                                   severity=e.get("severity", "N/A"),
+                                   synopsis=e.get("synopsis", ''),
+                                   url=e.get("url", ''), hosts=0)
+            errata[adv]["hosts"] += nhs
+
+            skey = (errata[adv]["type"], errata[adv]["severity"])
+            if skey not in sevs:
+                sevs[skey] = dict(type=skey[0], severity=skey[1],
+                                  advisories=set(), errata=0, hosts=0)
+            sevs[skey]["advisories"].add(adv)
+            sevs[skey]["errata"] += nhs
+            hsevs.add(skey)
+
+        for skey in hsevs:
+            sevs[skey]["hosts"] += nhs
+
+        for u in _load_data_g(RUM.updates_file_path(hworkdir)):
+            ukey = (u["name"], u["arch"])
+            if ukey not in updates:
+                updates[ukey] = dict(name=u["name"], arch=u["arch"], hosts=0)
+            updates[ukey]["hosts"] += nhs
+
+    for sev in sevs.values():
+        sev["advisories"] = len(sev["advisories"])
+
+    def bycount(xs, key):
+        return sorted(xs, key=lambda x: (-x["hosts"], x[key]))
+
+    return dict(hosts=nhosts,
+                errata=bycount(errata.values(), "advisory"),
+                updates=bycount(updates.values(), "name"),
+                severities=sorted(sevs.values(),
+                                  key=itemgetter("type", "severity")))
+
+
+def dump_fleet_store(workdir, hss):
+    """
+    Save results of all hosts in the database. Results of each group of hosts
+    having same installed RPMs are loaded and saved only once.
+
+    :param workdir: Working dir to save results
+    :param hss: A list of lists of host identities, see :function:`group_hosts`
+
+    :return: Path to the database file
+    """
+    path = os.path.join(workdir, rpmkit.updateinfo.store.STORE_FILE)
+    if os.path.exists(path):
+        os.remove(path)  # Results of hosts removed must be removed also.
+
+    with contextlib.closing(rpmkit.updateinfo.store.connect(path)) as conn:
+        for hs in hss:
+            hworkdir = os.path.join(workdir, hs[0])
+            rpmkit.updateinfo.store.save_results(
+                conn, hs[0], _load_data_g(RUM.rpm_list_path(hworkdir)),
+                _load_data_g(RUM.errata_list_path(hworkdir)),
+                _load_data_g(RUM.updates_file_path(hworkdir)), hs)
+
+    LOG.info(_("Saved results of %d hosts in %s"),
+             sum(len(hs) for hs in hss), path)
+    return path
+
+
+_FLEET_SUMMARY = "fleet_summary"
+
+
+def dump_fleet_results(workdir, data, fmt=None):
+    """
+    :param workdir: Working dir to save results
+    :param data: Aggregated data :function:`aggregate_results` returns
+    :param fmt: Format of reports or None (default format)
+    """
+    U.json_dump(data, os.path.join(workdir, _FLEET_SUMMARY + ".json"))
+
+    ekeys = ("advisory", "type", "severity", "hosts", "synopsis", "url")
+    lekeys = (_("advisory"), _("type"), _("severity"), _("hosts"),
+              _("synopsis"), _("url"))
+    ukeys = ("name", "arch", "hosts")
+    lukeys = (_("name"), _("arch"), _("hosts"))
+    skeys = ("type", "severity", "advisories", "errata", "hosts")
+    lskeys = (_("type"), _("severity"), _("advisories"),
+              _("errata x hosts"), _("hosts"))
+
+    ds = [RUM.make_sheet(data["severities"], _("Errata by severity"), skeys,
+                         lskeys),
+          RUM.make_sheet(data["errata"], _("Errata x hosts"), ekeys, lekeys),
+          RUM.make_sheet(data["updates"], _("Update RPMs x hosts"), ukeys,
+                         lukeys)]
+    rpmkit.updateinfo.report.dump(ds, os.path.join(workdir, _FLEET_SUMMARY),
+                                  fmt)
 
 
 def main(hosts_datadir, workdir=None, repos=[], score=-1,
          keywords=RUM.ERRATA_KEYWORDS, rpms=[], period=(), cachedir=None,
          refdir=None, verbosity=0, multiproc=False,
-         backend=RUM.DEFAULT_BACKEND, backends=RUM.BACKENDS):
+         backend=RUM.DEFAULT_BACKEND, backends=RUM.BACKENDS, nprocs=None,
+         share_repodata=True, incremental=True, fmt=None, store=False,
+         periods=()):
     """
     :param hosts_datadir: Dir in which rpm db roots of hosts exist
     :param workdir: Working dir to save results
@@ -157,40 +894,27 @@ def main(hosts_datadir, workdir=None, repos=[], score=-1,
         in parallel as much as possible if True
     :param backend: Backend module to use to get updates and errata
     :param backends: Backend list
+    :param nprocs: Number of worker processes in multiproc mode or None
+        (cpu_count())
+    :param share_repodata: Load repo metadata only once per repo set and
+        share it among hosts if True
+    :param incremental: Skip to analyze hosts of which RPM DB, repo metadata
+        and analysis parameters are same as the last run if True
+    :param fmt: Format of reports or None (default format)
+    :param store: Save results of all hosts in the database also if True
+    :param periods: A list of periods to summarize errata in each period
     """
     RUM.set_loglevel(verbosity)
 
-    all_hosts = list(prepare(hosts_datadir, workdir, repos, cachedir, backend,
-                             backends))
-    hosts = [h for h in all_hosts if h.available]
-
-    LOG.info(_("Analyze %d/%d hosts"), len(hosts), len(all_hosts))
-
-    ilen = lambda h: len(h.installed)
-    hps = lambda h: [p2nevra(p) for p in h.installed]
-    gby = lambda xs, kf: itertools.groupby(sorted(xs, key=kf), kf)
-
-    # Group hosts by installed rpms to degenerate these hosts and avoid to
-    # analyze for same installed RPMs more than once. his :: [[[h]]]
-    his = [[list(g2) for _k2, g2 in gby(g, hps)] for _k, g in gby(hosts, ilen)]
-
-    for hss in his:
-        hset = [(hs[0], hs[1:]) for hs in hss]
-        hsdata = [(h, score, keywords, rpms, period, refdir) for h, _hrest
-                  in hset]
+    if workdir is None:
+        LOG.info(_("Set workdir to hosts_datadir: %s"), hosts_datadir)
+        workdir = hosts_datadir
 
-        if multiproc:
-            pool = multiprocessing.Pool(multiprocessing.cpu_count())
-            pool.map(analyze, hsdata)
-        else:
-            for args in hsdata:
-                analyze(args)
-
-        for h, hsrest in hset:
-            if hsrest:
-                LOG.info(_("Skip to analyze %s as its installed RPMs are "
-                           "exactly same as %s's"),
-                         ','.join(x.id for x in hsrest), h)
-                mk_symlinks_to_results_of_ref_host(h, hsrest, os.curdir)
+    # NOTE: Results of hosts are saved in the database of all hosts
+    # instead of the ones of each host if `store` is True.
+    aargs = (score, keywords, rpms, period, refdir, fmt, False, periods)
+    analyze_hosts(hosts_datadir, workdir, repos, cachedir, backend, backends,
+                  aargs, nprocs if multiproc else 1, share_repodata,
+                  incremental, fmt, store)
 
 # vim:sw=4:ts=4:et:
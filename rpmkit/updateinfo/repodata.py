@@ -0,0 +1,240 @@
+#
+# Copyright (C) 2014 Red Hat, Inc.
+# Red Hat Author(s): Satoru SATOH <ssato@redhat.com>
+# License: GPLv3+
+#
+"""Read-only repo metadata model shared among hosts.
+
+Backends (yumbase, etc.) parse repo metadata (primary and updateinfo) of
+enabled repos every time they are instantiated, and it's the dominant cost to
+analyze many hosts using same repos. :class:`RepoData` keeps the available
+packages and errata loaded once per repo set and computes updates and
+applicable errata of each host from its installed packages in memory.
+"""
+import rpmkit.updateinfo.base
+import rpmkit.rpmutils
+
+import hashlib
+import logging
+import operator
+import rpm
+
+
+LOG = logging.getLogger("rpmkit.updateinfo.repodata")
+
+_NEVRA_KEYS = ("name", "epoch", "version", "release", "arch")
+_NA_KEYS = ("name", "arch")
+
+# Columns of the installed RPMs table read from RPM DBs directly.
+INSTALLED_KEYS = _NEVRA_KEYS + ("summary", "vendor", "buildhost")
+
+
+def _newer(lhs, rhs):
+    """
+    :return: True if package `lhs` is newer than package `rhs`
+    """
+    return rpm.labelCompare(rpmkit.updateinfo.base.evr(lhs),
+                            rpmkit.updateinfo.base.evr(rhs)) > 0
+
+
+def _nevra(pkg):
+    """
+    :param pkg: A package dict
+    :return: A tuple of (name, epoch, version, release, arch) normalized to
+        compare packages from RPM DBs and repos, epoch of which may be None,
+        an int or a str
+
+    >>> _nevra(dict(name="a", epoch=None, version="1", release="1", arch="x"))
+    ('a', '0', '1', '1', 'x')
+    >>> _nevra(dict(name="a", epoch=0, version="1", release="1", arch="x"))
+    ('a', '0', '1', '1', 'x')
+    """
+    return (pkg["name"], ) + rpmkit.updateinfo.base.evr(pkg) + (pkg["arch"], )
+
+
+def _latests(pkgs, keyfunc=operator.itemgetter(*_NA_KEYS)):
+    """
+    :param pkgs: An iterable yields package dicts
+    :return: A dict of {(name, arch): the latest package}
+    """
+    latests = dict()
+    for pkg in pkgs:
+        key = keyfunc(pkg)
+        cur = latests.get(key)
+        if cur is None or _newer(pkg, cur):
+            latests[key] = pkg
+
+    return latests
+
+
+def repos_key(repos, cachedir=None):
+    """
+    :param repos: List of yum repos
+    :param cachedir: A dir to save metadata cache of yum repos
+
+    >>> repos_key(["rhel-x86_64-server-6", "rhel-x86_64-server-optional-6"])
+    (('rhel-x86_64-server-6', 'rhel-x86_64-server-optional-6'), None)
+    >>> repos_key(["b", "a", "b"], "/tmp") == repos_key(["a", "b"], "/tmp")
+    True
+    """
+    return (tuple(sorted(set(repos))), cachedir)
+
+
+class RepoData(object):
+
+    def __init__(self, packages, errata):
+        """
+        :param packages: An iterable yields dicts of all available packages in
+            repos, having name, epoch, version, release and arch at least
+        :param errata: An iterable yields dicts of all errata in repos, having
+            'packages' (list of package dicts updated by the errata)
+        """
+        packages = list(packages)
+
+        self.errata = list(errata)
+        self.nevras = set(_nevra(p) for p in packages)
+        self.latests = _latests(packages)
+
+        # :: {(name, arch): [(package_in_errata, index_of_errata)]}
+        self.index = dict()
+        for idx, errata in enumerate(self.errata):
+            for pkg in errata.get("packages", []):
+                key = operator.itemgetter(*_NA_KEYS)(pkg)
+                self.index.setdefault(key, []).append((pkg, idx))
+
+        LOG.debug("Loaded %d packages and %d errata",
+                  len(self.nevras), len(self.errata))
+        self._revision = None
+
+    def revision(self):
+        """
+        :return: Content hash of packages and errata in repos
+        """
+        if self._revision is None:
+            digest = hashlib.sha1()
+            for nevra in sorted(self.nevras):
+                digest.update('\t'.join(str(x) for x in nevra) + '\n')
+
+            for errata in sorted(self.errata, key=lambda e: e["advisory"]):
+                digest.update("%(advisory)s\t%(update_date)s\n" % errata)
+
+            self._revision = digest.hexdigest()
+
+        return self._revision
+
+    def list_extras(self, installed):
+        """
+        :param installed: A list of installed package dicts
+        :return: A list of installed packages not available from repos
+        """
+        return [p for p in installed if _nevra(p) not in self.nevras]
+
+    def list_updates(self, installed):
+        """
+        :param installed: A list of installed package dicts
+        :return: A list of the latest available packages newer than installed
+
+        >>> ps = [dict(name="a", epoch=0, version="1", release="2", arch="x"),
+        ...       dict(name="b", epoch=0, version="1", release="1", arch="x")]
+        >>> rd = RepoData(ps, [])
+        >>> ips = [dict(name="a", epoch=0, version="1", release="1", arch="x"),
+        ...        dict(name="b", epoch=0, version="1", release="1", arch="x")]
+        >>> [p["name"] for p in rd.list_updates(ips)]
+        ['a']
+        """
+        ups = []
+        for key, ipkg in sorted(_latests(installed).items()):
+            apkg = self.latests.get(key)
+            if apkg is not None and _newer(apkg, ipkg):
+                ups.append(apkg)
+
+        return ups
+
+    def list_errata(self, installed):
+        """
+        Errata are applicable if they update any installed packages.
+
+        :param installed: A list of installed package dicts
+        :return: A list of errata dicts applicable to installed packages;
+            these are shallow copies of the ones shared among hosts as
+            callers may modify them
+
+        >>> e0 = dict(advisory="RHBA-2014:0", packages=[
+        ...           dict(name="a", epoch=0, version="1", release="2",
+        ...                arch="x")])
+        >>> e1 = dict(advisory="RHBA-2014:1", packages=[
+        ...           dict(name="a", epoch=0, version="1", release="1",
+        ...                arch="x")])
+        >>> rd = RepoData([], [e0, e1])
+        >>> ips = [dict(name="a", epoch=0, version="1", release="1", arch="x")]
+        >>> [e["advisory"] for e in rd.list_errata(ips)]
+        ['RHBA-2014:0']
+        """
+        idxs = set()
+        for key, ipkg in _latests(installed).items():
+            for epkg, idx in self.index.get(key, []):
+                if idx not in idxs and _newer(epkg, ipkg):
+                    idxs.add(idx)
+
+        return [dict(self.errata[i]) for i in sorted(idxs)]
+
+
+def load(base):
+    """
+    Load repo metadata with a backend object.
+
+    :param base: Backend object, an instance of a child class of
+        :class:`rpmkit.updateinfo.base.Base` implementing
+        :method:`list_repo_packages` and :method:`list_repo_errata`
+
+    :return: A :class:`RepoData` object
+    """
+    return RepoData(base.list_repo_packages(), base.list_repo_errata())
+
+
+class Base(rpmkit.updateinfo.base.Base):
+    name = "rpmkit.updateinfo.repodata"
+
+    def __init__(self, root='/', repos=[], disabled_repos=['*'],
+                 workdir=None, repodata=None, **kwargs):
+        """
+        Backend to query the shared repo metadata instead of loading it.
+        Installed packages are read from the RPM DB under `root` directly.
+
+        :param root: RPM DB root dir
+        :param repos: A list of repos to enable
+        :param disabled_repos: A list of repos to disable
+        :param workdir: Working dir to save logs and results
+        :param repodata: A :class:`RepoData` object
+        """
+        super(Base, self).__init__(root, repos, disabled_repos, workdir,
+                                   **kwargs)
+        assert repodata is not None, "No repo metadata was given!"
+        self.repodata = repodata
+
+    def list_installed_impl(self, **kwargs):
+        ips = list(rpmkit.rpmutils.list_installed_rpms_g(self.root,
+                                                         INSTALLED_KEYS))
+        extras = self.repodata.list_extras(ips)
+        extra_names = [e["name"] for e in extras]
+
+        xs = [rpmkit.updateinfo.base.Package(extras=extras,
+                                             extra_names=extra_names, **p)
+              for p in ips]
+        self._packages["installed"] = xs
+
+        return xs
+
+    def list_updates_impl(self, **kwargs):
+        xs = self.repodata.list_updates(self.list_installed())
+        self._packages["updates"] = xs
+
+        return xs
+
+    def list_errata_impl(self, **kwargs):
+        xs = self.repodata.list_errata(self.list_installed())
+        self._packages["errata"] = xs
+
+        return xs
+
+# vim:sw=4:ts=4:et:
@@ -0,0 +1,186 @@
+#
+# Copyright (C) 2014 Red Hat, Inc.
+# Red Hat Author(s): Satoru SATOH <ssato@redhat.com>
+# License: GPLv3+
+#
+"""Writers of analysis reports.
+
+Reports are lists of :class:`Sheet` objects of which rows are generated
+lazily, and writers write them row by row so that whole books are not
+materialized on memory:
+
+- xls: Written with tablib (default); sheets having rows more than the limit
+  of .xls format are split into multiple sheets
+- xlsx: Written with xlsxwriter in 'constant_memory' mode if it's available
+- csv: A dir holding a CSV file per sheet
+"""
+from rpmkit.globals import _
+
+import codecs
+import collections
+import csv
+import logging
+import os.path
+import os
+import re
+import tablib
+
+try:
+    import xlsxwriter
+except ImportError:
+    xlsxwriter = None
+
+
+LOG = logging.getLogger("rpmkit.updateinfo.report")
+
+XLS_MAX_ROWS = 65536
+SHEET_NAME_MAX = 31
+
+FORMATS = ("xls", "xlsx", "csv")
+DEFAULT_FORMAT = "xls"
+
+# :param title: Sheet title to be used as worksheet's name
+# :param headers: Column headers
+# :param rows: An iterable yields rows (lists of cell data)
+Sheet = collections.namedtuple("Sheet", "title headers rows")
+
+_INVALID_CHARS_REG = re.compile(r"[\[\]:*?/\\]")
+
+
+def sheet_name(title, suffix=''):
+    """
+    :param title: Sheet title
+    :param suffix: Suffix appended to the title, e.g. " (2)"
+    :return: Valid worksheet name
+
+    >>> sheet_name("Errata [a/b]")
+    'Errata _a_b_'
+    >>> sheet_name("A very long sheet title over 31 chars", " (2)")
+    'A very long sheet title ove (2)'
+    """
+    title = _INVALID_CHARS_REG.sub('_', title)
+    return title[:SHEET_NAME_MAX - len(suffix)] + suffix
+
+
+def _to_s(cell, encoding="utf-8"):
+    """
+    >>> _to_s(u"\\u3042")
+    '\\xe3\\x81\\x82'
+    >>> _to_s(1)
+    1
+    """
+    return cell.encode(encoding) if isinstance(cell, unicode) else cell
+
+
+def _split_g(rows, nrows):
+    """
+    :param rows: An iterable yields rows
+    :param nrows: Max number of rows in a chunk
+
+    >>> list(_split_g(iter(range(5)), 2))
+    [[0, 1], [2, 3], [4]]
+    >>> list(_split_g(iter(range(4)), 2))
+    [[0, 1], [2, 3]]
+    >>> list(_split_g(iter([]), 2))
+    [[]]
+    """
+    (chunk, nchunks) = ([], 0)
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == nrows:
+            yield chunk
+            (chunk, nchunks) = ([], nchunks + 1)
+
+    if chunk or not nchunks:
+        yield chunk
+
+
+def dump_xls(sheets, filepath, max_rows=XLS_MAX_ROWS):
+    """
+    :param sheets: A list of :class:`Sheet` objects
+    :param filepath: Output file path
+    :param max_rows: Max number of rows per sheet including headers
+    """
+    book = tablib.Databook()
+    for sheet in sheets:
+        chunks = list(_split_g(sheet.rows, max_rows - 1))
+        if len(chunks) > 1:
+            LOG.warn(_("Too many rows in the sheet '%s' and split into %d "
+                       "sheets"), sheet.title, len(chunks))
+
+        for idx, rows in enumerate(chunks):
+            dataset = tablib.Dataset(*rows, headers=list(sheet.headers))
+            dataset.title = sheet_name(sheet.title, " (%d)" % (idx + 1)
+                                       if idx else '')
+            book.add_sheet(dataset)
+
+    with open(filepath, 'wb') as out:
+        out.write(book.xls)
+
+
+def dump_xlsx(sheets, filepath):
+    """
+    :param sheets: A list of :class:`Sheet` objects
+    :param filepath: Output file path
+    """
+    assert xlsxwriter is not None, "xlsxwriter is not available!"
+
+    book = xlsxwriter.Workbook(filepath, dict(constant_memory=True))
+    bold = book.add_format(dict(bold=True))
+    try:
+        for sheet in sheets:
+            wsheet = book.add_worksheet(sheet_name(sheet.title))
+            wsheet.write_row(0, 0, sheet.headers, bold)
+            for idx, row in enumerate(sheet.rows):
+                wsheet.write_row(idx + 1, 0, row)
+    finally:
+        book.close()
+
+
+def dump_csv(sheets, dirpath):
+    """
+    :param sheets: A list of :class:`Sheet` objects
+    :param dirpath: Output dir path to save CSV files of sheets
+    """
+    if not os.path.exists(dirpath):
+        os.makedirs(dirpath)
+
+    for idx, sheet in enumerate(sheets):
+        filename = "%02d_%s.csv" % (idx, sheet_name(sheet.title))
+        with open(os.path.join(dirpath, _to_s(filename)), 'wb') as out:
+            out.write(codecs.BOM_UTF8)
+            writer = csv.writer(out)
+            writer.writerow([_to_s(h) for h in sheet.headers])
+            for row in sheet.rows:
+                writer.writerow([_to_s(c) for c in row])
+
+
+_DUMPERS = dict(xlsx=dump_xlsx, csv=dump_csv, xls=dump_xls)
+
+
+def dump(sheets, path, fmt=None, dumpers=_DUMPERS):
+    """
+    :param sheets: A list of :class:`Sheet` objects
+    :param path: Output path without extension. Extension is added to it
+        for xlsx and xls and it's used as the dir to save CSV files for csv
+    :param fmt: Output format, one of `FORMATS` or None (`DEFAULT_FORMAT`)
+
+    :return: Path of the output file or dir
+    """
+    if fmt is None:
+        fmt = DEFAULT_FORMAT
+
+    if fmt == "xlsx" and xlsxwriter is None:
+        LOG.warn(_("xlsxwriter is not available. Dump results in xls "
+                   "instead of xlsx"))
+        fmt = "xls"
+
+    assert fmt in dumpers, "Unknown output format: %s" % fmt
+
+    if fmt != "csv":
+        path = path + '.' + fmt
+
+    dumpers[fmt](sheets, path)
+    return path
+
+# vim:sw=4:ts=4:et:
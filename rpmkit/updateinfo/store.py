@@ -0,0 +1,171 @@
+#
+# Copyright (C) 2014 Red Hat, Inc.
+# Red Hat Author(s): Satoru SATOH <ssato@redhat.com>
+# License: GPLv3+
+#
+"""SQLite database of analysis results.
+
+Results of hosts (installed RPMs, errata, update RPMs and links between
+errata and update RPMs) are saved in the database alongside JSON files, and
+tools can query it with indexes on advisory and NEVRA, e.g. hosts need some
+errata, without loading JSON files of all hosts.
+
+Hosts having same installed RPMs share results: Rows of results are keyed by
+'ref', an identity of the host analyzed, and hosts table maps hosts to it.
+"""
+import contextlib
+import logging
+import os.path
+import sqlite3
+
+
+LOG = logging.getLogger("rpmkit.updateinfo.store")
+
+STORE_FILE = "results.db"
+
+_NEVRA = "name, epoch, version, release, arch"
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS hosts (id TEXT PRIMARY KEY, ref TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS hosts_ref ON hosts (ref);
+
+CREATE TABLE IF NOT EXISTS packages (ref TEXT NOT NULL, %(nevra)s,
+                                     origin TEXT);
+CREATE INDEX IF NOT EXISTS packages_ref ON packages (ref);
+CREATE INDEX IF NOT EXISTS packages_nevra ON packages (%(nevra)s);
+
+CREATE TABLE IF NOT EXISTS errata (ref TEXT NOT NULL, advisory TEXT NOT NULL,
+                                   type TEXT, severity TEXT,
+                                   issue_date INTEGER, synopsis TEXT,
+                                   url TEXT, PRIMARY KEY (ref, advisory));
+CREATE INDEX IF NOT EXISTS errata_advisory ON errata (advisory);
+
+CREATE TABLE IF NOT EXISTS updates (ref TEXT NOT NULL, %(nevra)s);
+CREATE INDEX IF NOT EXISTS updates_ref ON updates (ref);
+CREATE INDEX IF NOT EXISTS updates_nevra ON updates (%(nevra)s);
+
+CREATE TABLE IF NOT EXISTS errata_updates (ref TEXT NOT NULL,
+                                           advisory TEXT NOT NULL, %(nevra)s);
+CREATE INDEX IF NOT EXISTS errata_updates_advisory
+    ON errata_updates (advisory);
+CREATE INDEX IF NOT EXISTS errata_updates_nevra
+    ON errata_updates (%(nevra)s);
+""" % dict(nevra=_NEVRA)
+
+_NEVRA_KEYS = ("name", "epoch", "version", "release", "arch")
+_TABLES = ("packages", "errata", "updates", "errata_updates")
+
+
+def connect(path):
+    """
+    :param path: Path to the database file
+    :return: A sqlite3.Connection object to the database initialized
+    """
+    conn = sqlite3.connect(path)
+    conn.executescript(_SCHEMA)
+
+    return conn
+
+
+def _nevra(pkg, keys=_NEVRA_KEYS):
+    return tuple(pkg.get(k) for k in keys)
+
+
+def save_results(conn, ref, rpms, errata, updates, hids=None):
+    """
+    Save results of a host. Old results of the host are replaced.
+
+    :param conn: A sqlite3.Connection object :function:`connect` returns
+    :param ref: Identity of the host analyzed
+    :param rpms: An iterable yields installed RPMs
+    :param errata: An iterable yields applicable errata; it's iterated only
+        once
+    :param updates: An iterable yields update RPMs
+    :param hids: A list of identities of hosts share results of `ref`, or
+        None ([ref])
+    """
+    if hids is None:
+        hids = [ref]
+
+    with conn:
+        for table in _TABLES:
+            conn.execute("DELETE FROM %s WHERE ref = ?" % table, (ref, ))
+        conn.execute("DELETE FROM hosts WHERE ref = ?", (ref, ))
+
+        conn.executemany("INSERT OR REPLACE INTO hosts VALUES (?, ?)",
+                         ((hid, ref) for hid in hids))
+        conn.executemany("INSERT INTO packages VALUES (?, ?, ?, ?, ?, ?, ?)",
+                         ((ref, ) + _nevra(p) + (p.get("origin"), ) for p
+                          in rpms))
+        conn.executemany("INSERT INTO updates VALUES (?, ?, ?, ?, ?, ?)",
+                         ((ref, ) + _nevra(u) for u in updates))
+        for e in errata:
+            conn.execute("INSERT OR REPLACE INTO errata "
+                         "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                         (ref, e["advisory"], e.get("type"),
+                          e.get("severity"), e.get("issue_date_i"),
+                          e.get("synopsis"), e.get("url")))
+            conn.executemany("INSERT INTO errata_updates "
+                             "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                             ((ref, e["advisory"]) + _nevra(u) for u
+                              in e.get("updates", [])))
+
+
+def dump_results(workdir, ref, rpms, errata, updates, hids=None,
+                 filename=STORE_FILE):
+    """
+    Save results of a host in the database in `workdir`.
+
+    :param workdir: Working dir to save the database
+    :return: Path to the database file
+
+    see also :function:`save_results` for the other parameters.
+    """
+    path = os.path.join(workdir, filename)
+    with contextlib.closing(connect(path)) as conn:
+        save_results(conn, ref, rpms, errata, updates, hids)
+
+    return path
+
+
+def list_hosts_need_errata(conn, advisory):
+    """
+    :param conn: A sqlite3.Connection object :function:`connect` returns
+    :param advisory: Errata advisory, e.g. "RHSA-2014:0001"
+    :return: A list of identities of hosts need the errata
+    """
+    cur = conn.execute("SELECT hosts.id FROM errata JOIN hosts "
+                       "ON errata.ref = hosts.ref "
+                       "WHERE errata.advisory = ? ORDER BY hosts.id",
+                       (advisory, ))
+    return [r[0] for r in cur]
+
+
+def list_hosts_need_update(conn, name, arch=None):
+    """
+    :param conn: A sqlite3.Connection object :function:`connect` returns
+    :param name: Name of the update RPM
+    :param arch: Arch of the update RPM or None (any arch)
+    :return: A list of identities of hosts need the update RPM
+    """
+    query = ("SELECT DISTINCT hosts.id FROM updates JOIN hosts "
+             "ON updates.ref = hosts.ref WHERE updates.name = ?")
+    params = (name, )
+    if arch is not None:
+        query += " AND updates.arch = ?"
+        params += (arch, )
+
+    return [r[0] for r in conn.execute(query + " ORDER BY hosts.id", params)]
+
+
+def list_errata_of_host(conn, hid):
+    """
+    :param conn: A sqlite3.Connection object :function:`connect` returns
+    :param hid: Host identity
+    :return: A list of advisories of errata the host needs
+    """
+    cur = conn.execute("SELECT errata.advisory FROM errata JOIN hosts "
+                       "ON errata.ref = hosts.ref WHERE hosts.id = ? "
+                       "ORDER BY errata.advisory", (hid, ))
+    return [r[0] for r in cur]
+
+# vim:sw=4:ts=4:et:
@@ -8,14 +8,19 @@
 # PARTICULAR PURPOSE. You should have received a copy of GPLv3 along with this
 # software; if not, see http://www.gnu.org/licenses/gpl.html
 #
-import Queue
+import errno
 import logging
+import os
+import select
 import signal
 import subprocess
-import threading
 import time
 
 
+_READ_SIZE = 8192
+_KILL_GRACE = 3  # [sec]
+
+
 def is_string(s, str_types=(str, unicode)):
     """
     >>> is_string("abc def")
@@ -46,52 +51,119 @@ def check_output_simple(cmd, outfile, **kwargs):
     logging.debug("check_output_simple: cmd=%s" % cmd)
     proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, shell=True, **kwargs)
 
-    while True:
-        out = proc.stdout.readline()
-
-        if out == '':
-            while True:  # It may be blocked forever.
-                if proc.poll() is not None:
-                    break
-
+    for out in iter(proc.stdout.readline, b''):
         outfile.write(out)
         outfile.flush()
 
-        if proc.poll() is not None:
-            break
+    return proc.wait()
+
 
-    return proc.returncode
+def _id(x):
+    return x
 
 
-def enqueue_output(outfd, queue):
+def _terminate(proc, grace=_KILL_GRACE, interval=0.1):
     """
-    :param outfd: Output FD to read results
-    :param queue: Queue to enqueue results read from ``outfd``
+    Terminate the process group of the process, that is, the shell and
+    commands run from it, and kill them if the process is still alive after
+    ``grace`` seconds.
+
+    :param proc: Process object created by :function:`_popen`, leader of the
+        process group
+    :param grace: Seconds to wait for the process to exit after SIGTERM
     """
-    for line in iter(outfd.readline, b''):
-        queue.put(line)
+    try:
+        os.killpg(proc.pid, signal.SIGTERM)
+        for _i in range(int(grace / interval)):
+            if proc.poll() is not None:
+                return
+            time.sleep(interval)
 
+        os.killpg(proc.pid, signal.SIGKILL)
+    except OSError:  # The processes exited already.
+        pass
 
-def _id(x):
-    return x
+
+def _split_lines(data):
+    """
+    :param data: A str might end with a partial line
+    :return: A tuple of (complete lines, remaining partial line)
+
+    >>> _split_lines("a\\nb\\nc")
+    (['a\\n', 'b\\n'], 'c')
+    >>> _split_lines("a\\n")
+    (['a\\n'], '')
+    """
+    lines = data.split('\n')
+    return ([line + '\n' for line in lines[:-1]], lines[-1])
 
 
-def _wait_and_kill(proc, timeout):
+def _select(rfiles, timeout):
     """
-    :param proc: Process object created by subprocess.Popen
-    :param timeout: Timeout in seconds
+    select.select for reading, retried if it's interrupted by signals.
+    """
+    while True:
+        try:
+            return select.select(rfiles, [], [], timeout)[0]
+        except select.error as exc:
+            if exc.args[0] != errno.EINTR:
+                raise
+
+
+def _lines_g(proc, cmd, timeout=None):
     """
-    assert timeout > 0, "Invalid timeout: %s" % str(timeout)
-    time.sleep(timeout)
-    proc.terminate()
+    Yield outputs of the process line by line as soon as they come out. It
+    blocks in select(2) until any outputs are available, so that it uses
+    almost no CPU time while waiting for the process. The process is
+    terminated if it does not finish in time.
 
-    if proc.poll() is None:
-        proc.kill()
+    :param proc: Process object created by subprocess.Popen
+    :param cmd: Command string run by the process
+    :param timeout: Timeout in seconds or None
+
+    :return: A generator yields tuples of (True if the line is from stdout or
+        False if it is from stderr, line)
+    """
+    partials = {proc.stdout: '', proc.stderr: ''}
+    deadline = None if timeout is None else time.time() + timeout
+
+    rfiles = [proc.stdout, proc.stderr]
+    while rfiles:
+        wait = None if deadline is None else deadline - time.time()
+        if wait is not None and wait <= 0:
+            logging.warn("Timeout (%d sec) and terminate: %s" % (timeout,
+                                                                 cmd))
+            _terminate(proc)
+            return
+
+        for rfile in _select(rfiles, wait):
+            data = os.read(rfile.fileno(), _READ_SIZE)
+            if data:
+                data = partials[rfile] + data
+                (lines, partials[rfile]) = _split_lines(data)
+            else:  # EOF
+                (lines, partials[rfile]) = ([partials[rfile]], '')
+                rfiles.remove(rfile)
+
+            for line in lines:
+                if line:
+                    yield (rfile is proc.stdout, line)
+
+
+def _popen(cmd, **kwargs):
+    """
+    Run the command in a new session (process group) so that the shell and
+    commands run from it can be terminated together.
+    """
+    logging.debug("run: cmd=%s" % cmd)
+    return subprocess.Popen(cmd, stdout=subprocess.PIPE,
+                            stderr=subprocess.PIPE, close_fds=True,
+                            shell=True, preexec_fn=os.setsid, **kwargs)
 
 
 def run(cmd, ofunc=_id, efunc=_id, timeout=None, **kwargs):
     """
-    Run commands without blocking I/O. See also http://bit.ly/VoKhdS.
+    Run commands and process outputs line by line as soon as they come out.
 
     :param cmd: Command string[s]
     :param ofunc: Function to process output line by line
@@ -99,7 +171,8 @@ def run(cmd, ofunc=_id, efunc=_id, timeout=None, **kwargs):
     :param efunc: Function to process error line by line
         ex. sys.stderr.write :: str => line -> IO (), etc.
     :param timeout: Timeout to wait for the finish of execution of ``cmd`` in
-        seconds or None to wait it forever
+        seconds or None to wait it forever. The process is terminated if it
+        does not finish in time.
     :param kwargs: Extra arguments passed to subprocess.Popen
 
     :return: (output :: [str] ,err_output :: [str], exitcode :: Int)
@@ -107,56 +180,63 @@ def run(cmd, ofunc=_id, efunc=_id, timeout=None, **kwargs):
     if not is_string(cmd):
         cmd = ' '.join(cmd)
 
-    logging.debug("run: cmd=%s" % cmd)
-    p = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
-                         bufsize=1, close_fds=True, shell=True)
-    outq = Queue.Queue()
-    errq = Queue.Queue()
-
-    oets = [threading.Thread(target=enqueue_output, args=(p.stdout, outq)),
-            threading.Thread(target=enqueue_output, args=(p.stderr, errq))]
+    p = _popen(cmd, **kwargs)
+    (outs, errs) = ([], [])
+    try:
+        for is_out, line in _lines_g(p, cmd, timeout):
+            if is_out:
+                ofunc(line)
+                outs.append(line)
+            else:
+                efunc(line)
+                errs.append(line)
+    finally:
+        p.stdout.close()
+        p.stderr.close()
 
-    for t in oets:
-        t.setDaemon(True)
-        t.start()
+    return (outs, errs, p.wait())
 
-    outs = []
-    errs = []
-
-    def join_threads():
-        for t in oets:
-            t.join()
-
-    for sig in (signal.SIGINT, signal.SIGTERM):
-        signal.signal(sig, join_threads)
-
-    if timeout is not None:
-        threading.Thread(target=_wait_and_kill, args=(p, timeout))
-
-    while True:
-        try:
-            oline = outq.get_nowait()
-        except Queue.Empty:
-            # TODO: How to get info. The following is useful but too verbose.
-            # logging.debug("No output from stdout of #%d yet" % p.pid)
-            pass
-        else:
-            ofunc(oline)
-            outs.append(oline)
 
-        try:
-            eline = errq.get_nowait()
-        except Queue.Empty:
-            pass
-        else:
-            efunc(eline)
-            errs.append(eline)
+def run_g(cmd, efunc=_id, timeout=None, rcs=(0, ), **kwargs):
+    """
+    Run commands and yield output lines as soon as they come out without
+    keeping them, so that callers can process outputs while the command is
+    running in constant memory.
 
-        if p.poll() is not None:
-            break
+    :param cmd: Command string[s]
+    :param efunc: Function to process error line by line
+    :param timeout: Timeout to wait for the finish of execution of ``cmd`` in
+        seconds or None to wait it forever
+    :param rcs: Exit codes of success
+    :param kwargs: Extra arguments passed to subprocess.Popen
 
-    join_threads()
+    :return: A generator yields output lines
+    :raises: subprocess.CalledProcessError if ``cmd`` failed, after all
+        output lines were yielded
+    """
+    if not is_string(cmd):
+        cmd = ' '.join(cmd)
 
-    return (outs, errs, -1 if p.returncode is None else p.returncode)
+    p = _popen(cmd, **kwargs)
+    errs = []
+    done = False
+    try:
+        for is_out, line in _lines_g(p, cmd, timeout):
+            if is_out:
+                yield line
+            else:
+                efunc(line)
+                errs.append(line)
+        done = True
+    finally:
+        p.stdout.close()
+        p.stderr.close()
+        if not done:  # Stopped iteration in the middle.
+            _terminate(p)
+            p.wait()
+
+    rc = p.wait()
+    if rc not in rcs:
+        raise subprocess.CalledProcessError(rc, cmd, ''.join(errs))
 
 # vim:sw=4:ts=4:et:
@@ -7,12 +7,37 @@ import rpmkit.updateinfo.dnfbase as TT
 import rpmkit.updateinfo.utils as RUU
 import rpmkit.tests.common as C
 
+import collections
 import os.path
 import os
 import shutil
 import unittest
 
 
+_Adv = collections.namedtuple("_Adv", "id packages")
+
+
+class _Pkg(collections.namedtuple("_Pkg", "name advisories")):
+
+    def get_advisories(self, cmptype):
+        return self.advisories
+
+
+class Test_00_applicable_advisories_g(unittest.TestCase):
+
+    def test_10_dedup(self):
+        (a1, a2, a3) = (_Adv("RHSA-2014:0001", ["bash", "zlib"]),
+                        _Adv("RHBA-2014:0002", ["bash"]),
+                        _Adv("RHBA-2014:0003", ["kernel"]))
+        pkgs = [_Pkg("bash", [a1, a2]), _Pkg("zlib", [a1]),
+                _Pkg("kernel", [a3])]
+
+        advs = TT.applicable_advisories_g(pkgs, None,
+                                          lambda p: p != "kernel")
+        self.assertEquals([a.id for a in advs],
+                          ["RHSA-2014:0001", "RHBA-2014:0002"])
+
+
 if RUU.is_rhel_or_fedora():
     class Test_10_Base(unittest.TestCase):
 
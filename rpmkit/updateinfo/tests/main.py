@@ -0,0 +1,326 @@
+#
+# Copyright (C) 2014 Red Hat, Inc.
+# Red Hat Author(s): Satoru SATOH <ssato at redhat.com>
+#
+# This software is licensed to you under the GNU General Public License,
+# version 3 (GPLv3). There is NO WARRANTY for this software, express or
+# implied, including the implied warranties of MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE. You should have received a copy of GPLv3 along with this
+# software; if not, see http://www.gnu.org/licenses/gpl.html
+#
+import rpmkit.updateinfo.main as TT
+import rpmkit.utils as U
+import rpmkit.tests.common as C
+
+from operator import itemgetter
+
+import random
+import unittest
+
+
+_SEVERITIES = ("Critical", "Important", "Moderate", "Low")
+_WORDS = ("fix", "the", "issue", "when", "service", "was", "restarted")
+
+
+def _mk_errata(nerrata=5000, npkgs=500, seed=0):
+    """
+    Make a list of fake errata with updates, sorted as
+    :function:`TT.analyze` does.
+    """
+    rand = random.Random(seed)
+    names = ["pkg-%d" % i for i in range(npkgs)]
+    keywords = list(TT.ERRATA_KEYWORDS) + list(TT.CORE_RPMS)
+
+    es = []
+    for i in range(nerrata):
+        echar = rand.choice("SSBBBE")
+        updates = [dict(name=rand.choice(names + list(TT.CORE_RPMS)),
+                        epoch=0, version="1.%d" % rand.randint(0, 9),
+                        release=str(rand.randint(1, 3)),
+                        arch=rand.choice(("x86_64", "i686")))
+                   for _j in range(rand.randint(1, 3))]
+        desc = ' '.join(rand.choice(_WORDS + tuple(keywords)) for _j
+                        in range(rand.randint(5, 50)))
+        e = dict(advisory="RH%sA-%d:%04d" % (echar, 2000 + seed, i),
+                 synopsis="errata #%d" % i, description=desc,
+                 issue_date="2014-%02d-%02d" % (rand.randint(1, 12),
+                                                rand.randint(1, 28)),
+                 updates=updates,
+                 update_names=list(set(u["name"] for u in updates)))
+        if echar == 'S':
+            e["severity"] = rand.choice(_SEVERITIES)
+        es.append(e)
+
+    for e in es:
+        TT.normalize_errata(e)
+
+    return sorted(es, key=itemgetter("id"), reverse=True)
+
+
+class Test_10_KeywordMatcher(unittest.TestCase):
+
+    def test_10_same_as_naive_impl(self):
+        keywords = list(TT.ERRATA_KEYWORDS) + ["fault", "segmentation",
+                                               "data", "kernel panic"]
+        rand = random.Random(0)
+        words = list(_WORDS) + keywords + ["kernel", "Crash", "hangs"]
+        matcher = TT.KeywordMatcher(keywords)
+
+        for _i in range(100):
+            text = ' '.join(rand.choice(words) for _j in range(30))
+            self.assertEquals(matcher.match(text),
+                              [k for k in keywords if k in text])
+
+    def test_20_ignorecase_and_wordmatch(self):
+        matcher = TT.KeywordMatcher(["crash", "hang", "data corruption"],
+                                    True, True)
+        self.assertEquals(matcher.match("Data Corruption, crashes"),
+                          ["data corruption"])
+        self.assertEquals(matcher.match("kernel may HANG"), ["hang"])
+
+    def test_30_match_errata__cached(self):
+        matcher = TT.KeywordMatcher(["crash"])
+        errata = dict(advisory="RHBA-2014:0001", description="crash")
+
+        self.assertEquals(matcher.match_errata(errata), ["crash"])
+        self.assertEquals(matcher.match_errata(dict(errata, description='')),
+                          ["crash"])
+
+
+def _ue(name, version="1.0"):
+    return dict(name=name, epoch=0, version=version, release="1",
+                arch="x86_64")
+
+
+def _ce(advisory, updates, description='', issue_date="2014-01-01",
+        severity=None):
+    e = dict(advisory=advisory, synopsis="errata " + advisory,
+             description=description, issue_date=issue_date,
+             updates=updates,
+             update_names=sorted(set(u["name"] for u in updates)))
+    if severity is not None:
+        e["severity"] = severity
+
+    return TT.normalize_errata(e)
+
+
+def _advs(es):
+    return [e["advisory"] for e in es]
+
+
+class Test_20_classify_errata(unittest.TestCase):
+
+    def setUp(self):
+        self.errata = [
+            _ce("RHSA-2014:0004", [_ue("kernel")], severity="Critical"),
+            _ce("RHSA-2014:0003", [_ue("bash", "2.0"), _ue("zlib")],
+                severity="Important"),
+            _ce("RHSA-2014:0002", [_ue("bash")], severity="Important"),
+            _ce("RHSA-2014:0001", [_ue("foo")], severity="Low"),
+            _ce("RHBA-2014:0005", [_ue("bash")], "may crash and hang",
+                "2014-01-05"),
+            _ce("RHBA-2014:0006", [_ue("foo")], "kernel panic",
+                "2014-01-06"),
+            _ce("RHBA-2014:0007", [_ue("glibc")], "minor fix"),
+            _ce("RHEA-2014:0008", [_ue("foo")], "new feature")]
+
+    def test_10_classify_errata(self):
+        (types, sevs, rhba_by_kwds, rhba_of_rpms) = \
+            TT.classify_errata(self.errata)
+
+        self.assertEquals(dict((c, _advs(b.list)) for c, b in types.items()),
+                          {3: ["RHSA-2014:0004", "RHSA-2014:0003",
+                               "RHSA-2014:0002", "RHSA-2014:0001"],
+                           2: ["RHBA-2014:0005", "RHBA-2014:0006",
+                               "RHBA-2014:0007"],
+                           1: ["RHEA-2014:0008"]})
+        self.assertEquals(dict((s, _advs(b.list)) for s, b in sevs.items()),
+                          {8: ["RHSA-2014:0004"],
+                           6: ["RHSA-2014:0003", "RHSA-2014:0002"],
+                           2: ["RHSA-2014:0001"]})
+        self.assertEquals(_advs(rhba_by_kwds),
+                          ["RHBA-2014:0005", "RHBA-2014:0006"])
+        self.assertEquals([e["keywords"] for e in rhba_by_kwds],
+                          [["crash", "hang"], ["panic"]])
+        self.assertEquals(_advs(rhba_of_rpms),
+                          ["RHBA-2014:0005", "RHBA-2014:0007"])
+
+        self.assertEquals(types[3].list_by_packages(),
+                          [("bash", ["RHSA-2014:0003", "RHSA-2014:0002"]),
+                           ("foo", ["RHSA-2014:0001"]),
+                           ("kernel", ["RHSA-2014:0004"]),
+                           ("zlib", ["RHSA-2014:0003"])])
+        self.assertEquals(types[3].list_n_by_pnames(),
+                          [("bash", 2), ("foo", 1), ("kernel", 1),
+                           ("zlib", 1)])
+
+    def test_20_analyze_errata(self):
+        res = TT.analyze_errata(self.errata, [])
+        (rhsa, rhba) = (res["rhsa"], res["rhba"])
+
+        self.assertEquals(res["rate_by_type"],
+                          [("Security", 4), ("Bug", 3), ("Enhancement", 1)])
+        self.assertEquals(rhsa["rate_by_sev"],
+                          [("Critical", 1), ("Important", 2),
+                           ("Moderate", 0), ("Low", 1)])
+        self.assertEquals(rhsa["list_important_updates"],
+                          [_ue("bash", "2.0"), _ue("zlib")])
+        self.assertEquals(rhsa["list_critical_updates"], [_ue("kernel")])
+        self.assertEquals(_advs(rhba["list_by_kwds"]),
+                          ["RHBA-2014:0005", "RHBA-2014:0006"])
+        self.assertEquals(_advs(rhba["list_by_kwds_of_core_rpms"]),
+                          ["RHBA-2014:0005"])
+        self.assertEquals(_advs(rhba["list_of_core_rpms"]),
+                          ["RHBA-2014:0007", "RHBA-2014:0005"])
+        self.assertEquals(rhba["list_updates_by_kwds"],
+                          [_ue("bash"), _ue("foo")])
+        self.assertEquals(rhba["list_n_by_pnames"],
+                          [("bash", 1), ("foo", 1), ("glibc", 1)])
+        self.assertEquals(res["rhea"]["list_by_packages"],
+                          [("foo", ["RHEA-2014:0008"])])
+
+
+def _u(name, version="1.0", arch="x86_64"):
+    return dict(name=name, epoch=0, version=version, release="1", arch=arch)
+
+
+def _e(advisory, updates, update_date="2014-01-01"):
+    return dict(advisory=advisory, update_date=update_date, updates=updates)
+
+
+class Test_30_compute_delta(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = C.setup_workdir()
+
+        ref_es = [_e("RHBA-2014:0001", [_u("bash")]),
+                  _e("RHBA-2014:0002", [_u("zlib")]),
+                  _e("RHBA-2014:0003", [_u("kernel")])]
+        ref_us = [_u("bash"), _u("zlib"), _u("kernel")]
+
+        U.json_dump(dict(data=ref_es), TT.errata_list_path(self.workdir))
+        U.json_dump(dict(data=ref_us), TT.updates_file_path(self.workdir))
+
+        self.errata = [_e("RHBA-2014:0001", [_u("bash")]),
+                       _e("RHBA-2014:0002", [_u("zlib", "1.1")],
+                          "2014-02-01"),
+                       _e("RHBA-2014:0004", [_u("glibc")])]
+        self.updates = [_u("bash"), _u("zlib", "1.1"), _u("glibc")]
+
+    def tearDown(self):
+        C.cleanup_workdir(self.workdir)
+
+    def test_10_compute_delta(self):
+        (es, us) = TT.compute_delta(self.workdir, self.errata, self.updates)
+
+        self.assertEquals([e["advisory"] for e in es], ["RHBA-2014:0004"])
+        self.assertEquals(us, [_u("glibc"), _u("zlib", "1.1")])
+
+    def test_20_compute_delta_diff(self):
+        diff = TT.compute_delta_diff(self.workdir, self.errata, self.updates)
+        advs = dict((k, [e["advisory"] for e in es]) for k, es
+                    in diff["errata"].items())
+        names = dict((k, [u["name"] for u in us]) for k, us
+                     in diff["updates"].items())
+
+        self.assertEquals(advs, dict(added=["RHBA-2014:0004"],
+                                     removed=["RHBA-2014:0003"],
+                                     changed=["RHBA-2014:0002"]))
+        self.assertEquals(names, dict(added=["glibc"], removed=["kernel"],
+                                      changed=["zlib"]))
+
+
+class Test_40_fetch_cves_cvss_map(unittest.TestCase):
+
+    def test_10_fetch_unique_cves_once(self):
+        cves = ["CVE-2014-%04d" % i for i in range(20)]
+        errata = [dict(advisory="RHSA-2014:%04d" % i,
+                       cves=[dict(id=c, url="http://cve/" + c) for c
+                             in cves[i:i + 5]]) for i in range(10)]
+        (fetched, nbulks) = ([], [])
+
+        def cvss(cveid):
+            return dict(cve=cveid, url="http://nvd/" + cveid, score="5.0",
+                        metrics="AV:N/AC:L/Au:N/C:N/I:N/A:P")
+
+        def fetch(cveid):
+            fetched.append(cveid)
+            if cveid.endswith('0'):  # e.g. older CVEs do not have CVSS.
+                return None
+            return cvss(cveid)
+
+        def fetch_all():
+            nbulks.append(1)
+            return dict((c, cvss(c)) for c in cves[:5])
+
+        cmap = TT.fetch_cves_cvss_map(errata, dict(), fetch_all, fetch)
+
+        # Only CVEs not found in the bulk data are fetched one by one.
+        self.assertEquals(len(nbulks), 1)
+        self.assertEquals(sorted(fetched), cves[5:14])
+        self.assertEquals(sorted(cmap.keys()), cves[:14])
+        self.assertEquals(cmap["CVE-2014-0010"], dict())
+
+        cve = TT.fetch_cve_details(dict(id="CVE-2014-0001",
+                                        url="http://cve/CVE-2014-0001"),
+                                   cmap)
+        self.assertEquals(cve["url"], "http://cve/CVE-2014-0001")
+        self.assertEquals(cve["nvd_url"], "http://nvd/CVE-2014-0001")
+        self.assertEquals(cve["score"], "5.0")
+
+        # Already fetched CVEs are not fetched again.
+        del fetched[:]
+        TT.fetch_cves_cvss_map(errata, cmap, fetch_all, fetch)
+        self.assertEquals((fetched, len(nbulks)), ([], 1))
+
+    def test_20_fetch_cves_not_having_scores_in_bulk_data(self):
+        cves = ["CVE-2014-0001", "CVE-2014-0002", "CVE-2014-0003"]
+        errata = [dict(advisory="RHSA-2014:0001",
+                       cves=[dict(id=c, url="http://cve/" + c) for c
+                             in cves])]
+        fetched = []
+
+        def fetch(cveid):
+            fetched.append(cveid)
+            if cveid == cves[2]:
+                return None
+            return dict(cve=cveid, url="http://nvd/" + cveid, score="5.0",
+                        metrics="AV:N/AC:L/Au:N/C:N/I:N/A:P")
+
+        def fetch_all():
+            return dict((c, dict(cve=c, url="http://nvd/" + c)) for c
+                        in cves[1:])
+
+        cmap = TT.fetch_cves_cvss_map(errata, dict(), fetch_all, fetch)
+
+        self.assertEquals(fetched, cves)
+        self.assertEquals([cmap[c].get("score") for c in cves],
+                          ["5.0", "5.0", None])
+        self.assertEquals(cmap[cves[2]], dict(cve=cves[2],
+                                              url="http://nvd/" + cves[2]))
+
+
+class Test_50_dump_periods_results(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = C.setup_workdir()
+
+    def tearDown(self):
+        C.cleanup_workdir(self.workdir)
+
+    def test_10_same_as_filtering_in_each_period(self):
+        es = _mk_errata(500, 50)
+        TT.classify_errata(es)
+        periods = TT.monthly_periods(12, "2014-12") + [(20140301, 20140701)]
+
+        data = TT.dump_periods_results(self.workdir, es, periods, "csv")
+
+        for summary, (start, end) in zip(data, periods):
+            pes = [e for e in es if TT.errata_in_period(e, start, end)]
+            ref = TT.summarize_errata_in_period(pes, start, end)
+            self.assertEquals(summary, ref)
+
+        self.assertEquals(sum(d["rhsa"] + d["rhba"] + d["rhea"] for d
+                              in data[:12]), len(es))
+
+# vim:sw=4:ts=4:et:
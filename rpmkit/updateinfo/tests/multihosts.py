@@ -0,0 +1,393 @@
+#
+# Copyright (C) 2014 Red Hat, Inc.
+# Red Hat Author(s): Satoru SATOH <ssato at redhat.com>
+#
+# This software is licensed to you under the GNU General Public License,
+# version 3 (GPLv3). There is NO WARRANTY for this software, express or
+# implied, including the implied warranties of MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE. You should have received a copy of GPLv3 along with this
+# software; if not, see http://www.gnu.org/licenses/gpl.html
+#
+import rpmkit.updateinfo.multihosts as TT
+import rpmkit.updateinfo.base as B
+import rpmkit.updateinfo.store as S
+import rpmkit.updateinfo.utils as RUU
+import rpmkit.updateinfo.yumwrapper as RUY
+import rpmkit.rpmutils as RR
+import rpmkit.tests.common as C
+
+import json
+import os.path
+import os
+import unittest
+
+
+def _e(advisory, type_, severity="N/A"):
+    return dict(advisory=advisory, type=type_, severity=severity,
+                synopsis="synopsis of " + advisory, url="")
+
+
+def _u(name, arch="x86_64"):
+    return dict(name=name, epoch=0, version="1.0", release="1", arch=arch)
+
+
+class Test_10_aggregate_results(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = C.setup_workdir()
+
+        results = dict(h1=([_e("RHSA-2014:0001", "security", "Important"),
+                            _e("RHBA-2014:0002", "bugfix")],
+                           [_u("bash"), _u("zlib")]),
+                       h3=([_e("RHSA-2014:0001", "security", "Important")],
+                           [_u("bash")]))
+
+        for hid, (es, us) in results.items():
+            hworkdir = os.path.join(self.workdir, hid)
+            os.makedirs(hworkdir)
+            TT.U.json_dump(dict(data=es), TT.RUM.errata_list_path(hworkdir))
+            TT.U.json_dump(dict(data=us), TT.RUM.updates_file_path(hworkdir))
+
+        # h2 has same installed RPMs as h1 and h4 was not analyzed.
+        self.hss = [["h1", "h2"], ["h3"], ["h4"]]
+
+    def tearDown(self):
+        C.cleanup_workdir(self.workdir)
+
+    def test_10_aggregate(self):
+        data = TT.aggregate_results(self.workdir, self.hss)
+
+        self.assertEquals(data["hosts"], 4)
+        self.assertEquals([(e["advisory"], e["hosts"]) for e
+                           in data["errata"]],
+                          [("RHSA-2014:0001", 3), ("RHBA-2014:0002", 2)])
+        self.assertEquals([(u["name"], u["hosts"]) for u in data["updates"]],
+                          [("bash", 3), ("zlib", 2)])
+        self.assertEquals([(s["type"], s["severity"], s["advisories"],
+                            s["errata"], s["hosts"]) for s
+                           in data["severities"]],
+                          [("bugfix", "N/A", 1, 2, 2),
+                           ("security", "Important", 1, 3, 3)])
+
+    def test_12_load_data_g__stream(self):
+        # Items are yielded before the rest of the file is parsed.
+        path = os.path.join(self.workdir, "broken.json")
+        open(path, 'w').write('{"data": [{"a": 0}, {"a": 1}, {"a": ')
+
+        gen = TT._load_data_g(path)
+        self.assertEquals([gen.next(), gen.next()], [dict(a=0), dict(a=1)])
+        self.assertRaises(ValueError, gen.next)
+        self.assertEquals(list(TT._load_data_g(path + ".not_exist")), [])
+
+    def test_20_dump_fleet_store(self):
+        path = TT.dump_fleet_store(self.workdir, self.hss)
+        conn = S.connect(path)
+        try:
+            self.assertEquals(S.list_hosts_need_errata(conn,
+                                                       "RHSA-2014:0001"),
+                              ["h1", "h2", "h3"])
+        finally:
+            conn.close()
+
+
+_RPMS_FILE = "rpms.json"
+_ANALYZED_FILE = "analyzed"
+_AARGS = (0, TT.RUM.ERRATA_KEYWORDS, [], (), None, "csv", False, ())
+
+
+def _p(name, version="1.0", release="1"):
+    return dict(name=name, epoch=0, version=version, release=release,
+                arch="x86_64")
+
+
+def _check_rpmdb_root(root, *args, **kwargs):
+    return os.path.exists(os.path.join(root, _RPMS_FILE))
+
+
+def _list_installed_rpms_g(root, keys):
+    for p in TT.U.json_load(os.path.join(root, _RPMS_FILE)):
+        yield dict((k, p.get(k)) for k in keys)
+
+
+class _Base(B.Base):
+    """Fake backend reads installed RPMs from the file in the host's root
+    and records each run of analysis.
+    """
+    name = "fake"
+
+    def list_installed_impl(self, **kwargs):
+        open(os.path.join(self.root, _ANALYZED_FILE), 'a').write("x\n")
+        return TT.U.json_load(os.path.join(self.root, _RPMS_FILE))
+
+    def list_updates_impl(self, **kwargs):
+        return []
+
+    def list_errata_impl(self, **kwargs):
+        return []
+
+
+_YUM_ERRATA_LINES = ["RHSA-2013:0587 Moderate/Sec.  "
+                     "openssl-1.0.0-27.el6_4.2.x86_64",
+                     "RHBA-2013:0781 bugfix         "
+                     "perl-libs-4:5.10.1-131.el6_4.x86_64"]
+_YUM_UPDATE_LINE = "bash.x86_64  4.1.2-15.el6_4  rhel-x86_64-server-6"
+
+
+def _run_jobs_g(jobs, nworkers, **kwargs):
+    """Fake yumwrapper.run_jobs_g fails for the host 'h3'.
+    """
+    for job in jobs:
+        error = "'list-sec' failed" if job["id"] == "h3" else None
+        yield dict(id=job["id"], error=error, elapsed=0,
+                   errata=[RUY._parse_errata_line(line) for line
+                           in _YUM_ERRATA_LINES],
+                   updates=[RUY._parse_update_line(_YUM_UPDATE_LINE)])
+
+
+def _num_of_analyses(root):
+    path = os.path.join(root, _ANALYZED_FILE)
+    return len(open(path).readlines()) if os.path.exists(path) else 0
+
+
+class Test_20_analyze_hosts(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = C.setup_workdir()
+        self.datadir = os.path.join(self.workdir, "hosts")
+        self.outdir = os.path.join(self.workdir, "out")
+
+        # h1 and h2 have same installed RPMs and h4 does not have RPM DB.
+        rpms = dict(h1=[_p("bash"), _p("zlib")],
+                    h2=[_p("zlib"), _p("bash")],
+                    h3=[_p("bash"), _p("zlib", release="2")],
+                    h4=None)
+        for hid, ps in rpms.items():
+            root = os.path.join(self.datadir, hid)
+            os.makedirs(root)
+            if ps is not None:
+                TT.U.json_dump(ps, os.path.join(root, _RPMS_FILE))
+
+        self.saved = (RUU.check_rpmdb_root, RR.list_installed_rpms_g)
+        RUU.check_rpmdb_root = _check_rpmdb_root
+        RR.list_installed_rpms_g = _list_installed_rpms_g
+
+    def tearDown(self):
+        (RUU.check_rpmdb_root, RR.list_installed_rpms_g) = self.saved
+        C.cleanup_workdir(self.workdir)
+
+    def _analyze_hosts(self, nprocs=2, **kwargs):
+        TT.analyze_hosts(self.datadir, self.outdir, ["rhel-x"],
+                         backend=_Base.name, backends={_Base.name: _Base},
+                         aargs=_AARGS, nprocs=nprocs, share_repodata=False,
+                         fmt="csv", **kwargs)
+
+    def _root(self, hid):
+        return os.path.join(self.datadir, hid)
+
+    def _hworkdir(self, hid):
+        return os.path.join(self.outdir, hid)
+
+    def test_10_prepare_and_analyze(self):
+        job = ("h1", self._root("h1"), self._hworkdir("h1"), ["rhel-x"],
+               None, _Base.name, {_Base.name: _Base},
+               _AARGS)
+        (hid, ok, _elapsed) = TT.prepare_and_analyze(job)
+
+        self.assertEquals((hid, ok), ("h1", True))
+        self.assertEquals(_num_of_analyses(self._root("h1")), 1)
+        self.assertTrue(os.path.exists(TT.RUM.errata_list_path(
+                                       self._hworkdir("h1"))))
+
+    def test_12_prepare_and_analyze__no_rpmdb(self):
+        job = ("h4", self._root("h4"), self._hworkdir("h4"), ["rhel-x"],
+               None, _Base.name, {_Base.name: _Base}, ())
+        self.assertEquals(TT.prepare_and_analyze(job)[:2], ("h4", False))
+
+    def test_20_analyze_hosts__multiproc(self):
+        self._analyze_hosts(nprocs=2)
+
+        # Only one of hosts having same installed RPMs was analyzed.
+        self.assertEquals([_num_of_analyses(self._root(h)) for h
+                           in ("h1", "h2", "h3", "h4")], [1, 0, 1, 0])
+
+        for hid in ("h1", "h3"):
+            path = TT.RUM.errata_list_path(self._hworkdir(hid))
+            self.assertTrue(os.path.exists(path))
+            self.assertFalse(os.path.islink(path))
+
+        path = TT.RUM.errata_list_path(self._hworkdir("h2"))
+        self.assertTrue(os.path.islink(path))
+        self.assertEquals(TT.U.json_load(os.path.join(self._hworkdir("h1"),
+                                                      "metadata.json"))
+                          ["hosts"], ["h1", "h2"])
+        self.assertTrue(os.path.exists(os.path.join(self._hworkdir("h4"),
+                                                    "RPMDB_NOT_AVAILABLE")))
+
+        state = TT.load_run_state(self.outdir)
+        self.assertEquals(sorted(state.keys()), ["h1", "h3"])
+
+        data = TT.U.json_load(os.path.join(self.outdir,
+                                           TT._FLEET_SUMMARY + ".json"))
+        self.assertEquals(data["hosts"], 3)
+
+    def test_22_analyze_hosts__single_process(self):
+        self._analyze_hosts(nprocs=1)
+        self.assertEquals([_num_of_analyses(self._root(h)) for h
+                           in ("h1", "h2", "h3", "h4")], [1, 0, 1, 0])
+
+    def test_30_map_hosts_g(self):
+        keys = TT.RUM.NEVRA_KEYS
+        rs = [sorted(r[:3] for r in TT._map_hosts_g(TT.fingerprint_rpmdb,
+                                                    self.datadir, keys, n))
+              for n in (1, 2)]
+
+        self.assertEquals(rs[0], rs[1])
+        self.assertEquals([r[0] for r in rs[0]], ["h1", "h2", "h3", "h4"])
+        self.assertEquals(rs[0][0][1], rs[0][1][1])
+        self.assertNotEquals(rs[0][0][1], rs[0][2][1])
+        self.assertEquals(rs[0][3][1:], (None, 0))
+
+    def test_32_map_hosts_g__stop_in_the_middle(self):
+        gen = TT._map_hosts_g(TT.fingerprint_rpmdb, self.datadir,
+                              TT.RUM.NEVRA_KEYS, 2)
+        self.assertTrue(gen.next()[0] in ("h1", "h2", "h3", "h4"))
+        gen.close()  # Must not hang.
+
+    def test_34_scan_rpmdbs_g(self):
+        rs = sorted(TT.scan_rpmdbs_g(self.datadir, ("name", "release"), 2))
+
+        self.assertEquals([(hid, table) for hid, table, _elapsed in rs],
+                          [("h1", [("bash", "1"), ("zlib", "1")]),
+                           ("h2", [("bash", "1"), ("zlib", "1")]),
+                           ("h3", [("bash", "1"), ("zlib", "2")]),
+                           ("h4", None)])
+        self.assertTrue(all(elapsed >= 0 for _h, _t, elapsed in rs))
+
+    def test_40_group_hosts(self):
+        fhss = TT.group_hosts(self.datadir, self.outdir, 2)
+
+        self.assertEquals([hs for _fp, hs in fhss], [["h1", "h2"], ["h3"]])
+        self.assertTrue(os.path.exists(os.path.join(self._hworkdir("h4"),
+                                                    "RPMDB_NOT_AVAILABLE")))
+
+        data = TT.U.json_load(os.path.join(self.outdir, TT._GROUPS_FILE))
+        self.assertEquals((data["hosts"], data["unique"],
+                           data["unavailables"]), (3, 2, ["h4"]))
+        self.assertAlmostEquals(data["dedup_ratio"], 1.0 / 3)
+        self.assertEquals(data["groups"],
+                          [dict(fingerprint=fp, hosts=hs) for fp, hs
+                           in fhss])
+
+    def _mk_repomd(self, content="rev0"):
+        cachedir = os.path.join(self.workdir, "cache")
+        repodir = os.path.join(cachedir, "rhel-x")
+        if not os.path.exists(repodir):
+            os.makedirs(repodir)
+        open(os.path.join(repodir, "repomd.xml"), 'w').write(content)
+        return cachedir
+
+    def _job(self, hid, cachedir=None):
+        return (hid, self._root(hid), self._hworkdir(hid), ["rhel-x"],
+                cachedir, _Base.name, {_Base.name: _Base}, _AARGS)
+
+    def test_50_host_state(self):
+        state = TT.host_state("fp0", self._job("h1"))
+        self.assertEquals(state["revision"], None)
+        self.assertEquals((state["fingerprint"], state["repos"],
+                           state["backend"]), ("fp0", ["rhel-x"], "fake"))
+        self.assertEquals(state["params"], json.loads(json.dumps(_AARGS)))
+
+        cachedir = self._mk_repomd()
+        state = TT.host_state("fp0", self._job("h1", cachedir))
+        self.assertNotEquals(state["revision"], None)
+        self.assertEquals(state, TT.host_state("fp0",
+                                               self._job("h1", cachedir)))
+
+        self._mk_repomd("rev1")
+        self.assertNotEquals(state, TT.host_state("fp0",
+                                                  self._job("h1", cachedir)))
+
+    def test_52_is_unchanged(self):
+        hworkdir = self._hworkdir("h1")
+        os.makedirs(hworkdir)
+        for f in TT._RESULT_FILES:
+            open(os.path.join(hworkdir, f), 'w').write('')
+
+        state = TT.host_state("fp0", self._job("h1", self._mk_repomd()))
+        self.assertTrue(TT.is_unchanged(hworkdir, state, dict(state)))
+        self.assertFalse(TT.is_unchanged(hworkdir, state, None))
+        self.assertFalse(TT.is_unchanged(hworkdir, state,
+                                         dict(state, fingerprint="fp1")))
+
+        # The revision of repos is unknown.
+        state0 = TT.host_state("fp0", self._job("h1"))
+        self.assertFalse(TT.is_unchanged(hworkdir, state0, dict(state0)))
+
+        os.remove(os.path.join(hworkdir, TT._RESULT_FILES[-1]))
+        self.assertFalse(TT.is_unchanged(hworkdir, state, dict(state)))
+
+    def test_54_remove_symlinks(self):
+        hworkdir = self._hworkdir("h2")
+        os.makedirs(hworkdir)
+        open(os.path.join(hworkdir, "a.json"), 'w').write('')
+        os.symlink(os.path.join(hworkdir, "a.json"),
+                   os.path.join(hworkdir, "b.json"))
+
+        TT.remove_symlinks(hworkdir)
+        self.assertEquals(os.listdir(hworkdir), ["a.json"])
+
+    def test_60_analyze_hosts__skip_unchanged_hosts(self):
+        cachedir = self._mk_repomd()
+        hs = ("h1", "h2", "h3", "h4")
+
+        self._analyze_hosts(cachedir=cachedir)
+        self._analyze_hosts(cachedir=cachedir)
+        self.assertEquals([_num_of_analyses(self._root(h)) for h in hs],
+                          [1, 0, 1, 0])
+        self.assertTrue(os.path.islink(TT.RUM.errata_list_path(
+                                       self._hworkdir("h2"))))
+
+        # Installed RPMs of h3 were changed.
+        TT.U.json_dump([_p("bash")], os.path.join(self._root("h3"),
+                                                  _RPMS_FILE))
+        self._analyze_hosts(cachedir=cachedir)
+        self.assertEquals([_num_of_analyses(self._root(h)) for h in hs],
+                          [1, 0, 2, 0])
+
+        # Repo metadata were updated.
+        self._mk_repomd("rev1")
+        self._analyze_hosts(cachedir=cachedir)
+        self.assertEquals([_num_of_analyses(self._root(h)) for h in hs],
+                          [2, 0, 3, 0])
+
+        # Not incremental.
+        self._analyze_hosts(cachedir=cachedir, incremental=False)
+        self.assertEquals([_num_of_analyses(self._root(h)) for h in hs],
+                          [3, 0, 4, 0])
+
+    def test_70_analyze_hosts__yumwrapper(self):
+        saved = RUY.run_jobs_g
+        RUY.run_jobs_g = _run_jobs_g
+        try:
+            TT.analyze_hosts(self.datadir, self.outdir, ["rhel-x"],
+                             backend="yumwrapper",
+                             backends=dict(yumwrapper=RUY.Base),
+                             aargs=_AARGS, nprocs=2, fmt="csv")
+        finally:
+            RUY.run_jobs_g = saved
+
+        es = TT.U.json_load(TT.RUM.errata_list_path(self._hworkdir("h1")))
+        self.assertEquals([e["advisory"] for e in es["data"]],
+                          ["RHSA-2013:0587", "RHBA-2013:0781"])
+        self.assertEquals([[p["name"] for p in e["packages"]] for e
+                           in es["data"]], [["openssl"], ["perl-libs"]])
+        self.assertTrue(os.path.islink(TT.RUM.errata_list_path(
+                                       self._hworkdir("h2"))))
+
+        # Yum failed for h3.
+        self.assertFalse(os.path.exists(TT.RUM.errata_list_path(
+                                        self._hworkdir("h3"))))
+        self.assertEquals(sorted(TT.load_run_state(self.outdir).keys()),
+                          ["h1"])
+
+# vim:sw=4:ts=4:et:
@@ -0,0 +1,89 @@
+#
+# Copyright (C) 2014 Red Hat, Inc.
+# Red Hat Author(s): Satoru SATOH <ssato at redhat.com>
+#
+# This software is licensed to you under the GNU General Public License,
+# version 3 (GPLv3). There is NO WARRANTY for this software, express or
+# implied, including the implied warranties of MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE. You should have received a copy of GPLv3 along with this
+# software; if not, see http://www.gnu.org/licenses/gpl.html
+#
+import rpmkit.updateinfo.repodata as TT
+import unittest
+
+
+def _p(name, version, release, arch="x86_64", epoch=0):
+    return dict(name=name, epoch=epoch, version=version, release=release,
+                arch=arch)
+
+
+def _e(advisory, pkgs):
+    return dict(advisory=advisory, packages=pkgs)
+
+
+class Test_10_RepoData(unittest.TestCase):
+
+    def setUp(self):
+        self.packages = [_p("bash", "4.1.2", "15.el6"),
+                         _p("bash", "4.1.2", "29.el6"),
+                         _p("kernel", "2.6.32", "431.el6"),
+                         _p("kernel", "2.6.32", "504.el6"),
+                         _p("zlib", "1.2.3", "29.el6"),
+                         _p("zlib", "1.2.3", "29.el6", "i686")]
+        self.errata = [_e("RHBA-2014:0001", [_p("bash", "4.1.2", "29.el6")]),
+                       _e("RHSA-2014:0002",
+                          [_p("kernel", "2.6.32", "504.el6")]),
+                       _e("RHBA-2013:0003", [_p("bash", "4.1.2", "15.el6")]),
+                       _e("RHBA-2013:0004",
+                          [_p("zlib", "1.2.3", "29.el6", "i686")])]
+        self.repodata = TT.RepoData(self.packages, self.errata)
+
+    def test_10_list_updates(self):
+        ips = [_p("bash", "4.1.2", "15.el6"),
+               _p("kernel", "2.6.32", "431.el6"),
+               _p("kernel", "2.6.32", "504.el6"),
+               _p("zlib", "1.2.3", "29.el6")]
+        ups = self.repodata.list_updates(ips)
+
+        self.assertEquals(ups, [_p("bash", "4.1.2", "29.el6")])
+
+    def test_20_list_errata(self):
+        ips = [_p("bash", "4.1.2", "15.el6"),
+               _p("kernel", "2.6.32", "431.el6"),
+               _p("zlib", "1.2.3", "28.el6", "i686")]
+        es = self.repodata.list_errata(ips)
+
+        self.assertEquals([e["advisory"] for e in es],
+                          ["RHBA-2014:0001", "RHSA-2014:0002",
+                           "RHBA-2013:0004"])
+
+    def test_22_list_errata__no_installed(self):
+        self.assertEquals(self.repodata.list_errata([]), [])
+
+    def test_24_list_errata__not_shared(self):
+        ips = [_p("bash", "4.1.2", "15.el6")]
+        es = self.repodata.list_errata(ips)
+        es[0]["updates"] = []
+
+        self.assertFalse("updates" in self.repodata.list_errata(ips)[0])
+        self.assertFalse("updates" in self.errata[0])
+
+    def test_30_list_extras(self):
+        ips = [_p("bash", "4.1.2", "15.el6"), _p("foo", "0.1", "1")]
+        extras = self.repodata.list_extras(ips)
+
+        self.assertEquals(extras, [_p("foo", "0.1", "1")])
+
+    def test_32_list_extras__epochs_of_different_types(self):
+        # Epochs of packages from repos are str and the ones of installed
+        # packages read from RPM DBs are None or int.
+        repodata = TT.RepoData([_p("bash", "4.1.2", "15.el6", epoch='0'),
+                                _p("perl", "5.10.1", "136.el6", epoch='4')],
+                               [])
+        ips = [_p("bash", "4.1.2", "15.el6", epoch=None),
+               _p("perl", "5.10.1", "136.el6", epoch=4),
+               _p("perl", "5.10.1", "136.el6", "i686", epoch=4)]
+
+        self.assertEquals(repodata.list_extras(ips), ips[2:])
+
+# vim:sw=4:ts=4:et:
@@ -0,0 +1,81 @@
+#
+# Copyright (C) 2014 Red Hat, Inc.
+# Red Hat Author(s): Satoru SATOH <ssato at redhat.com>
+#
+# This software is licensed to you under the GNU General Public License,
+# version 3 (GPLv3). There is NO WARRANTY for this software, express or
+# implied, including the implied warranties of MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE. You should have received a copy of GPLv3 along with this
+# software; if not, see http://www.gnu.org/licenses/gpl.html
+#
+import rpmkit.updateinfo.report as TT
+import rpmkit.tests.common as C
+
+import csv
+import os.path
+import os
+import tablib
+import unittest
+
+
+def _sheet(nrows, title="Errata"):
+    return TT.Sheet(title, ["advisory", "synopsis"],
+                    ([u"RHBA-2014:%04d" % i, u"synopsis \u3042"] for i
+                     in range(nrows)))
+
+
+class Test_10_dump(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = C.setup_workdir()
+
+    def tearDown(self):
+        C.cleanup_workdir(self.workdir)
+
+    def test_10_dump_csv(self):
+        path = TT.dump([_sheet(3), _sheet(0, "Updates")],
+                       os.path.join(self.workdir, "summary"), "csv")
+
+        self.assertEquals(sorted(os.listdir(path)),
+                          ["00_Errata.csv", "01_Updates.csv"])
+
+        with open(os.path.join(path, "00_Errata.csv")) as inp:
+            rows = list(csv.reader(inp))
+
+        self.assertEquals(len(rows), 4)
+        self.assertEquals(rows[1], ["RHBA-2014:0000", "synopsis \xe3\x81\x82"])
+
+    def test_20_dump_xls__split_sheets(self):
+        path = os.path.join(self.workdir, "summary.xls")
+        TT.dump_xls([_sheet(5), _sheet(1, "Updates")], path, 3)
+
+        book = tablib.Databook()
+        with open(path, 'rb') as inp:
+            book.xls = inp.read()
+
+        self.assertEquals([(s.title, s.height) for s in book.sheets()],
+                          [("Errata", 2), ("Errata (2)", 2),
+                           ("Errata (3)", 1), ("Updates", 1)])
+
+    def test_22_dump__xls_by_default(self):
+        path = TT.dump([_sheet(1)], os.path.join(self.workdir, "summary"))
+        self.assertEquals(path, os.path.join(self.workdir, "summary.xls"))
+        self.assertTrue(os.path.exists(path))
+
+    def test_24_dump__xlsx_fallback_to_xls(self):
+        saved = TT.xlsxwriter
+        TT.xlsxwriter = None
+        try:
+            path = TT.dump([_sheet(1)], os.path.join(self.workdir, "summary"),
+                           "xlsx")
+        finally:
+            TT.xlsxwriter = saved
+
+        self.assertEquals(path, os.path.join(self.workdir, "summary.xls"))
+        self.assertTrue(os.path.exists(path))
+
+    def test_30_dump__unknown_format(self):
+        self.assertRaises(AssertionError, TT.dump, [_sheet(1)],
+                          os.path.join(self.workdir, "a"), "pdf")
+
+# vim:sw=4:ts=4:et:
@@ -0,0 +1,61 @@
+#
+# Copyright (C) 2014 Red Hat, Inc.
+# Red Hat Author(s): Satoru SATOH <ssato at redhat.com>
+#
+# This software is licensed to you under the GNU General Public License,
+# version 3 (GPLv3). There is NO WARRANTY for this software, express or
+# implied, including the implied warranties of MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE. You should have received a copy of GPLv3 along with this
+# software; if not, see http://www.gnu.org/licenses/gpl.html
+#
+import rpmkit.updateinfo.store as TT
+import unittest
+
+
+def _u(name, version="1.0", arch="x86_64"):
+    return dict(name=name, epoch=0, version=version, release="1", arch=arch)
+
+
+def _e(advisory, updates):
+    return dict(advisory=advisory, type="bugfix", severity="N/A",
+                issue_date_i=20140101, updates=updates)
+
+
+class Test_10_save_results(unittest.TestCase):
+
+    def setUp(self):
+        self.conn = TT.connect(":memory:")
+
+        bash = _u("bash", "1.1")
+        TT.save_results(self.conn, "h1", [_u("bash"), _u("zlib")],
+                        [_e("RHBA-2014:0001", [bash])], [bash],
+                        ["h1", "h2"])
+        TT.save_results(self.conn, "h3", [_u("zlib")],
+                        [_e("RHBA-2014:0002", [_u("zlib", "1.1")])],
+                        [_u("zlib", "1.1")])
+
+    def tearDown(self):
+        self.conn.close()
+
+    def test_10_list_hosts_need_errata(self):
+        self.assertEquals(TT.list_hosts_need_errata(self.conn,
+                                                    "RHBA-2014:0001"),
+                          ["h1", "h2"])
+        self.assertEquals(TT.list_hosts_need_errata(self.conn,
+                                                    "RHBA-2014:0003"), [])
+
+    def test_20_list_hosts_need_update(self):
+        self.assertEquals(TT.list_hosts_need_update(self.conn, "zlib"),
+                          ["h3"])
+        self.assertEquals(TT.list_hosts_need_update(self.conn, "bash",
+                                                    "i686"), [])
+
+    def test_30_save_results__replace(self):
+        TT.save_results(self.conn, "h1", [], [], [], ["h1"])
+
+        self.assertEquals(TT.list_errata_of_host(self.conn, "h1"), [])
+        self.assertEquals(TT.list_errata_of_host(self.conn, "h2"), [])
+        self.assertEquals(TT.list_errata_of_host(self.conn, "h3"),
+                          ["RHBA-2014:0002"])
+
+# vim:sw=4:ts=4:et:
@@ -13,9 +13,22 @@ import rpmkit.tests.common as C
 
 import os.path
 import os
+import time
 import unittest
 
 
+def _is_alive(pid):
+    """
+    :return: True if the process is alive and not a zombie
+    """
+    try:
+        stat = open("/proc/%d/stat" % pid).read()
+    except IOError:
+        return False
+
+    return stat.rsplit(')', 1)[-1].split()[0] != 'Z'
+
+
 class Test_00(unittest.TestCase):
 
     def test_10_check_output_simple__assert_outfile(self):
@@ -68,14 +81,62 @@ class Test_10_effectful_functions(unittest.TestCase):
         self.assertEquals(rc, 0)
         self.assertEquals(open(outfile, 'r').read(), "OK\n")
 
-    def test_28_run__success__w_timeout(self):
-        """FIXME: timeout is not work yet.
-        """
-        return
-        (out, err, rc) = TT.run("sleep 10", timeout=3)
+    def test_27_run__stderr_and_partial_line(self):
+        lines = []
+        (out, err, rc) = TT.run("echo NG >&2; printf 'OK\\nabc'",
+                                lines.append)
 
-        self.assertEquals(out, [])
+        self.assertEquals(out, ["OK\n", "abc"])
+        self.assertEquals(lines, out)
+        self.assertEquals(err, ["NG\n"])
+        self.assertEquals(rc, 0)
+
+    def test_28_run__failure__w_timeout(self):
+        start = time.time()
+        (out, err, rc) = TT.run("echo OK; sleep 10", timeout=1)
+
+        self.assertTrue(time.time() - start < 5)
+        self.assertEquals(out, ["OK\n"])
         self.assertEquals(err, [])
         self.assertNotEquals(rc, 0)
 
+    def test_29_run__timeout__kill_children(self):
+        if not os.path.exists("/proc/self/stat"):
+            return
+
+        (out, _err, _rc) = TT.run("sleep 60 & echo $!; wait", timeout=1)
+        pid = int(out[0])
+
+        for _i in range(50):
+            if not _is_alive(pid):
+                break
+            time.sleep(0.1)
+
+        self.assertFalse(_is_alive(pid))
+
+    def test_30_run_g__stream(self):
+        # The command blocks until the fifo is written after the first line
+        # was yielded, so that it cannot finish before it if not streamed.
+        fifo = os.path.join(self.workdir, "fifo")
+        os.mkfifo(fifo)
+        lines = TT.run_g("echo OK; read x < %s; echo $x" % fifo, timeout=10)
+
+        self.assertEquals(next(lines), "OK\n")
+        with open(fifo, 'w') as out:
+            out.write("NG\n")
+
+        self.assertEquals(list(lines), ["NG\n"])
+
+    def test_32_run_g__failure(self):
+        errs = []
+        lines = TT.run_g("echo OK; echo NG >&2; exit 1", errs.append)
+
+        self.assertEquals(next(lines), "OK\n")
+        self.assertRaises(TT.subprocess.CalledProcessError, next, lines)
+        self.assertEquals(errs, ["NG\n"])
+
+    def test_34_run_g__other_rcs(self):
+        lines = TT.run_g("echo OK; exit 100", rcs=(0, 100))
+        self.assertEquals(list(lines), ["OK\n"])
+
 # vim:sw=4:ts=4:et:
@@ -18,6 +18,42 @@ import shutil
 import unittest
 
 
+def _p(name, version, release="1", arch="x86_64", epoch=0):
+    return dict(name=name, epoch=epoch, version=version, release=release,
+                arch=arch)
+
+
+class Test_00_updateinfo_index(unittest.TestCase):
+
+    def setUp(self):
+        errata = [dict(advisory="RHSA-2014:0001",
+                       packages=[_p("bash", "4.1"), _p("zlib", "1.3")]),
+                  dict(advisory="RHBA-2014:0002",
+                       packages=[_p("bash", "4.2"),
+                                 _p("bash", "4.2", arch="i686")])]
+        self.index = TT.mk_updateinfo_index(errata)
+
+    def test_10_mk_updateinfo_index(self):
+        self.assertEquals(sorted(self.index.keys()),
+                          ["bash.i686", "bash.x86_64", "zlib.x86_64"])
+        self.assertEquals(self.index["bash.x86_64"],
+                          [('0', "4.1", '1', "RHSA-2014:0001"),
+                           ('0', "4.2", '1', "RHBA-2014:0002")])
+
+    def test_20_list_applicable_advisories(self):
+        ips = [_p("bash", "4.0"), _p("zlib", "1.3")]
+        self.assertEquals(TT.list_applicable_advisories(self.index, ips),
+                          ["RHBA-2014:0002", "RHSA-2014:0001"])
+
+    def test_22_list_applicable_advisories__latest_installed(self):
+        ips = [_p("bash", "4.0"), _p("bash", "4.1"), _p("zlib", "1.2")]
+        self.assertEquals(TT.list_applicable_advisories(self.index, ips),
+                          ["RHBA-2014:0002", "RHSA-2014:0001"])
+
+        ips = [_p("bash", "4.2"), _p("zlib", "1.3")]
+        self.assertEquals(TT.list_applicable_advisories(self.index, ips), [])
+
+
 if RUU.is_rhel_or_fedora():
     class Test_10_Base(unittest.TestCase):
 
@@ -10,6 +10,7 @@
 #
 import rpmkit.updateinfo.yumwrapper as TT
 import rpmkit.updateinfo.utils as RUU
+import rpmkit.yum_makelistcache as YMLC
 import rpmkit.tests.common as C
 
 import os.path
@@ -18,6 +19,96 @@ import shutil
 import unittest
 
 
+# Fake yum to emulate 'yum list-sec' and 'yum check-update'. 'list-sec' fails
+# once for the host 'h2' to test retries.
+_FAKE_YUM = """#! /bin/sh
+echo "$*" >> %(workdir)s/yum.log
+case "$*" in
+  *list-sec*)
+    if test "$*" != "${*#*/h2}" -a ! -f %(workdir)s/h2.failed; then
+       touch %(workdir)s/h2.failed; exit 1
+    fi
+    echo "RHSA-2013:0587 Moderate/Sec.  openssl-1.0.0-27.el6_4.2.x86_64" ;;
+  *check-update*)
+    echo "bash.x86_64  4.1.2-15.el6_4  rhel-x86_64-server-6"; exit 100 ;;
+esac
+"""
+
+
+class Test_20_run_jobs(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = C.setup_workdir()
+        self.saved_path = os.environ["PATH"]
+
+        bindir = os.path.join(self.workdir, "bin")
+        os.makedirs(bindir)
+        for cmd, content in (("yum", _FAKE_YUM % dict(workdir=self.workdir)),
+                             ("fakeroot", "#! /bin/sh\nexec \"$@\"\n")):
+            path = os.path.join(bindir, cmd)
+            open(path, 'w').write(content)
+            os.chmod(path, 0o755)
+
+        os.environ["PATH"] = bindir + os.pathsep + self.saved_path
+
+    def tearDown(self):
+        os.environ["PATH"] = self.saved_path
+        C.cleanup_workdir(self.workdir)
+
+    def _jobs(self, hids):
+        return [dict(id=h, root=os.path.join(self.workdir, h),
+                     workdir=os.path.join(self.workdir, h, "out"))
+                for h in hids]
+
+    def test_10_run_jobs_g(self):
+        rs = sorted(TT.run_jobs_g(self._jobs(["h1", "h3"]), 2),
+                    key=lambda r: r["id"])
+
+        self.assertEquals([r["id"] for r in rs], ["h1", "h3"])
+        for r in rs:
+            self.assertEquals(r["error"], None)
+            self.assertEquals([e["advisory"] for e in r["errata"]],
+                              ["RHSA-2013:0587"])
+            self.assertEquals([u["name"] for u in r["updates"]], ["bash"])
+
+    def test_20_run_jobs_g__retries(self):
+        r = list(TT.run_jobs_g(self._jobs(["h2"])))[0]
+        self.assertNotEquals(r["error"], None)
+
+        os.remove(os.path.join(self.workdir, "h2.failed"))
+        r = list(TT.run_jobs_g(self._jobs(["h2"]), retries=1))[0]
+        self.assertEquals(r["error"], None)
+        self.assertEquals(len(r["errata"]), 1)
+
+    def test_30_run_jobs_g__shared_cache(self):
+        cachedir = os.path.join(self.workdir, "cache")
+        jobs = self._jobs(["h1", "h3"])
+        rs = list(TT.run_jobs_g(jobs, shared_cachedir=cachedir))
+
+        self.assertEquals([r["error"] for r in rs], [None, None])
+        for job in jobs:
+            path = os.path.join(job["root"], YMLC.CACHE_SUBDIR)
+            self.assertEquals(os.path.realpath(path), cachedir)
+
+        cmds = open(os.path.join(self.workdir, "yum.log")).readlines()
+        self.assertEquals(len([c for c in cmds if "makecache" in c]), 1)
+        self.assertTrue(all(" -C " in c for c in cmds if "list-sec" in c or
+                            "check-update" in c))
+
+    def test_32_setup_shared_cache__system_root(self):
+        cachedir = os.path.join(self.workdir, "cache")
+        YMLC.setup_shared_cache('/', cachedir)
+        self.assertFalse(os.path.exists(cachedir))
+        self.assertFalse(os.path.islink(os.path.join('/',
+                                                     YMLC.CACHE_SUBDIR)))
+
+    def test_40_list_errata__failure(self):
+        job = self._jobs(["h2"])[0]
+        base = TT.Base(job["root"], workdir=job["workdir"])
+        self.assertRaises(TT.subprocess.CalledProcessError, base.list_errata)
+        self.assertEquals(len(base.list_errata()), 1)
+
+
 if RUU.is_rhel_or_fedora():
     class Test_10_Base__no_enabled_repos(unittest.TestCase):
 
@@ -179,6 +179,24 @@ def errata_type_to_int(adv):
         return 2
 
 
+def errata_sort_key(errata):
+    """
+    :param errata: A dict represents errata info
+    :return: A tuple of ints and str to sort errata, RHSA (more severe first)
+        < RHBA < RHEA
+
+    >>> errata_sort_key(dict(advisory="RHSA-2009:1238", severity="Low"))
+    (0, 3, 'RHSA-2009:1238')
+    >>> errata_sort_key(dict(advisory="RHBA-2009:1403", ))
+    (1, 0, 'RHBA-2009:1403')
+    """
+    adv = errata["advisory"]
+    sev = errata.get("severity")
+
+    return (errata_type_to_int(adv), rhsa_sev_to_int(sev) if sev else 0,
+            adv)
+
+
 def cmp_errata(lhs, rhs):
     """
     :param lhs: A dict represents errata info
@@ -192,18 +210,7 @@ def cmp_errata(lhs, rhs):
     >>> cmp_errata(lhs, rhs2)
     -1
     """
-    lhs_adv = lhs["advisory"]
-    rhs_adv = rhs["advisory"]
-
-    if lhs_adv[:4] == rhs_adv[:4]:
-        lhs_sev = lhs.get("severity")
-        if lhs_sev:
-            rhs_sev = rhs.get("severity")
-            return cmp(rhsa_sev_to_int(lhs_sev), rhsa_sev_to_int(rhs_sev))
-
-        return cmp(lhs_adv, rhs_adv)
-    else:
-        return cmp(errata_type_to_int(lhs_adv), errata_type_to_int(rhs_adv))
+    return cmp(errata_sort_key(lhs), errata_sort_key(rhs))
 
 
 def guess_rhel_repos(root, with_extras=False):
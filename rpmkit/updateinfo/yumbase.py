@@ -8,9 +8,11 @@ import rpmkit.updateinfo.utils
 import rpmkit.utils as RU
 
 import collections
-import itertools
 import logging
+import os.path
+import rpm
 import yum
+import yum.update_md
 
 
 LOG = logging.getLogger("rpmkit.updateinfo.yumbase")
@@ -100,6 +102,119 @@ def _notice_to_errata(notice):
     return errata
 
 
+_UPDATEINFO_CACHE = "rk-updateinfo-%s.json"
+
+
+def _na_key(pkg):
+    """
+    :param pkg: A dict represents a package
+    :return: A str key of name and arch of the package
+
+    >>> _na_key(dict(name="kernel", arch="x86_64"))
+    'kernel.x86_64'
+    """
+    return "%(name)s.%(arch)s" % pkg
+
+
+def mk_updateinfo_index(errata):
+    """
+    :param errata: A list of errata dicts
+    :return: An index of errata by update packages, a dict of
+        {"name.arch": [(epoch, version, release, advisory)]}
+
+    >>> e = dict(advisory="RHBA-2014:0001",
+    ...          packages=[dict(name="a", arch="x", epoch=None,
+    ...                         version="1", release="2")])
+    >>> mk_updateinfo_index([e])
+    {'a.x': [('0', '1', '2', 'RHBA-2014:0001')]}
+    """
+    index = collections.defaultdict(list)
+    for e in errata:
+        for pkg in e.get("packages", []):
+            evr = rpmkit.updateinfo.base.evr(pkg)
+            index[_na_key(pkg)].append(evr + (e["advisory"], ))
+
+    return dict(index)
+
+
+def list_applicable_advisories(index, installed):
+    """
+    Errata are applicable if they update the latest installed packages, same
+    as yum.update_md.UpdateMetadata.get_applicable_notices.
+
+    :param index: An index of errata :function:`mk_updateinfo_index` returns
+    :param installed: A list of installed package dicts
+    :return: A sorted list of advisories of applicable errata
+    """
+    latests = dict()
+    for pkg in installed:
+        key = _na_key(pkg)
+        cur = latests.get(key)
+        pevr = rpmkit.updateinfo.base.evr(pkg)
+        if cur is None or rpm.labelCompare(pevr, cur) > 0:
+            latests[key] = pevr
+
+    advs = set()
+    for key, ievr in latests.items():
+        for entry in index.get(key, []):
+            if entry[3] not in advs and \
+                    rpm.labelCompare(tuple(entry[:3]), ievr) > 0:
+                advs.add(entry[3])
+
+    return sorted(advs)
+
+
+def _updateinfo_checksum(repo):
+    """
+    :param repo: An instance of yum.yumRepo.YumRepository
+    :return: Checksum of updateinfo.xml of the repo or None if it's missing
+    """
+    try:
+        return repo.repoXML.getData("updateinfo").checksum[1]
+    except Exception:  # yum.Errors.RepoMDError, etc.
+        return None
+
+
+def load_repo_updateinfo(repo, cache=True):
+    """
+    Load notices in updateinfo.xml of a repo converted to errata dicts and
+    the index of them. These are cached in the repo's cachedir, keyed by the
+    checksum of updateinfo.xml, so that updateinfo.xml of the repo is parsed
+    only once while it's not changed.
+
+    :param repo: An instance of yum.yumRepo.YumRepository
+    :param cache: Load and save the cache if True
+
+    :return: A dict of {checksum: checksum, errata: [errata], index: index}
+        where index is :function:`mk_updateinfo_index` returns
+    """
+    checksum = _updateinfo_checksum(repo)
+    if checksum is None:
+        LOG.debug("No updateinfo in the repo: %s", repo.id)
+        return dict(checksum=None, errata=[], index=dict())
+
+    path = os.path.join(repo.cachedir, _UPDATEINFO_CACHE % checksum)
+    if cache and os.path.exists(path):
+        try:
+            return RU.json_load(path)
+        except (IOError, ValueError) as exc:
+            LOG.warn("Failed to load the cache %s: %s", path, exc)
+
+    LOG.debug("Parse updateinfo of the repo: %s", repo.id)
+    notices = yum.update_md.UpdateMetadata(repos=[repo]).notices
+    errata = [_notice_to_errata(n) for n in notices]
+    data = dict(checksum=checksum, errata=errata,
+                index=mk_updateinfo_index(errata))
+
+    if cache:
+        try:
+            RU.json_dump(data, path)
+        except (IOError, OSError) as exc:
+            LOG.warn("Failed to save the cache %s: %s", path, exc)
+
+    return data
+
+
 def _to_pkg(pkg, extras=[], extra_names=[]):
     """
     Convert Package object, instance of yum.rpmsack.RPMInstalledPackage,
@@ -159,6 +274,7 @@ class Base(rpmkit.updateinfo.base.Base):
         self.packages = dict()
         self.load_available_repos = load_available_repos
         self.populated = False
+        self.updateinfo = None
 
     def cachedir(self):
         return self.base.conf.cachedir
@@ -271,23 +387,60 @@ class Base(rpmkit.updateinfo.base.Base):
         else:
             return ups
 
+    def load_updateinfo(self):
+        """
+        Load errata in all enabled repos and the index of them.
+
+        :return: A tuple of ({advisory: errata}, index) where index is
+            :function:`mk_updateinfo_index` returns
+        """
+        if self.updateinfo is not None:
+            return self.updateinfo
+
+        self._load_repos()
+        (errata, index) = (dict(), collections.defaultdict(list))
+        for repo in self.base.repos.listEnabled():
+            data = load_repo_updateinfo(repo)
+
+            for e in data["errata"]:
+                cur = errata.get(e["advisory"])
+                if cur is None:
+                    errata[e["advisory"]] = e
+                else:  # Same errata in another repo, e.g. optional repo.
+                    cur["packages"] = RU.uniq(cur["packages"] +
+                                              e["packages"], sort=False)
+                    cur["package_names"] = \
+                        ','.join(RU.uniq(p["name"] for p in cur["packages"]))
+
+            for key, entries in data["index"].items():
+                index[key].extend(entries)
+
+        self.updateinfo = (errata, dict(index))
+        return self.updateinfo
+
     def list_errata(self):
         """
         List applicable Errata.
 
-        :param root: RPM DB root dir in absolute path
-        :param repos: List of Yum repos to enable
-        :param disabled_repos: List of Yum repos to disable
+        :return: A list of dicts of errata
+        """
+        (errata, index) = self.load_updateinfo()
+        ips = self.packages.get("installed") or self.list_installed()
+
+        return [errata[adv] for adv in list_applicable_advisories(index, ips)]
 
-        :return: A dict contains lists of dicts of errata
+    def list_repo_packages(self):
+        """
+        :return: List of dicts of all available packages in enabled repos
         """
         self._load_repos()
-        oldpkgtups = [t[1] for t in self.base.up.getUpdatesTuples()]
-        npss_g = itertools.ifilter(None,
-                                   (self.base.upinfo.get_applicable_notices(o)
-                                    for o in oldpkgtups))
-        es = itertools.chain(*((_notice_to_errata(t[1]) for t in ts) for ts
-                               in npss_g))
-        return list(es)
+        return [_to_pkg(p) for p in self.base.pkgSack.returnPackages()]
+
+    def list_repo_errata(self):
+        """
+        :return: List of dicts of all errata in enabled repos
+        """
+        errata = self.load_updateinfo()[0]
+        return [errata[adv] for adv in sorted(errata)]
 
 # vim:sw=4:ts=4:et:
@@ -6,16 +6,21 @@
 import rpmkit.updateinfo.base
 import rpmkit.updateinfo.subproc
 import rpmkit.updateinfo.utils
+import rpmkit.yum_makelistcache
 
 import itertools
+import multiprocessing.pool
 import os.path
 import os
 import re
+import subprocess
 import sys
 import tempfile
+import time
 
 
 NAME = "rpmkit.updateinfo.yumwrapper"
+NWORKERS = 4
 ERRATA_REG = re.compile(r"^(?:FEDORA|RH[SBE]A)-")
 UPDATE_REG = re.compile(r"^(?P<name>[A-Za-z0-9][^.]+)[.](?P<arch>\w+) +"
                         r"(?:(?P<epoch>\d+):)?(?P<version>[^-]+)-"
@@ -215,7 +220,26 @@ def _run(cmd, ofunc=sys.stdout.write, efunc=sys.stderr.write,
     :return: (output :: [str] ,err_output :: [str], exitcode :: Int)
     """
     return rpmkit.updateinfo.subproc.run(cmd, ofunc, efunc, timeout,
-                                         env={"LANG": "C"}, **kwargs)
+                                         env=dict(os.environ, LANG="C"),
+                                         **kwargs)
+
+
+def _run_g(cmd, efunc=sys.stderr.write, timeout=None, rcs=(0, ), **kwargs):
+    """
+    An wrapper furnction for rpmkit.updateinfo.subproc.run_g
+
+    :param cmd: Command string[s]
+    :param efunc: Function to process error line by line
+    :param timeout: Timeout to wait for the finish of execution of
+        ``cmd`` in seconds or None to wait it forever
+    :param rcs: Exit codes of success
+    :param kwargs: Extra arguments passed to subprocess.Popen
+
+    :return: A generator yields output lines
+    """
+    return rpmkit.updateinfo.subproc.run_g(cmd, efunc, timeout, rcs,
+                                           env=dict(os.environ, LANG="C"),
+                                           **kwargs)
 
 
 def _mk_repo_opts(repos=[], disabled_repos=[]):
@@ -240,22 +264,83 @@ def _is_root():
     return os.getuid() == 0
 
 
+def refresh_shared_cache(root, cachedir, repos=[], disabled_repos=['*'],
+                         workdir=None, timeout=None):
+    """
+    Download repo metadata into the shared cache dir with 'yum makecache'.
+    It should be run only once before yum runs for hosts using the cache.
+
+    :param root: RPM DB root dir of a host to resolve yum variables such as
+        $releasever of repos
+    :param cachedir: Shared cache dir
+    :param repos: A list of repos to enable
+    :param disabled_repos: A list of repos to disable
+    :param workdir: Working dir to save logs
+    :param timeout: Timeout of yum in seconds or None
+
+    :return: True if succeeded else False
+    """
+    rpmkit.yum_makelistcache.setup_shared_cache(root, cachedir)
+    base = Base(root, repos, disabled_repos, workdir, timeout=timeout)
+    (outs, errs, rc) = base.run("makecache", base.repo_opts)
+    if rc != 0:
+        LOG.error("Failed to refresh the cache %s: %s", cachedir,
+                  ''.join(errs))
+
+    return rc == 0
+
+
+def _errata_g(lines):
+    """
+    :param lines: Output lines of 'yum list-sec' or 'yum updateinfo list'
+    :return: A generator yields errata found in `lines`
+    """
+    for line in lines:
+        if _is_errata_line(line):
+            yield _parse_errata_line(line)
+        else:
+            LOG.debug("Not errata line: %s" % line.rstrip())
+
+
+def _updates_g(lines):
+    """
+    :param lines: Output lines of 'yum check-update'
+    :return: A generator yields update packages found in `lines`
+    """
+    for line in lines:
+        if line:
+            line = line.rstrip()
+            p = _parse_update_line(line)
+            if p:
+                yield p
+            else:
+                LOG.debug("Not errata line: %s" % line)
+
+
 class Base(rpmkit.updateinfo.base.Base):
     name = "rpmkit.updateinfo.yumwrapper"
 
     def __init__(self, root='/', repos=[], disabled_repos=['*'], workdir=None,
-                 timeout=None, **kwargs):
+                 timeout=None, cachedir=None, cacheonly=False, **kwargs):
         """
         :param root: RPM DB root dir
         :param repos: A list of repos to enable
         :param disabled_repos: A list of repos to disable
         :param workdir: Working dir to save logs and results
+        :param timeout: Timeout of yum commands in seconds or None
+        :param cachedir: Yum's cache dir or None (yum's default under `root`)
+        :param cacheonly: Run yum only from the cache (-C) if True
 
         >>> base = Base()
         """
         super(Base, self).__init__(root, repos, disabled_repos, workdir,
-                                   **kwargs)
+                                   cachedir, **kwargs)
         self.repo_opts = _mk_repo_opts(repos, disabled_repos)
+        self.timeout = timeout
+        self.yum_opts = [] if cachedir is None else \
+            ["--setopt=cachedir=%s" % cachedir]
+        if cacheonly:
+            self.yum_opts.append("-C")
         self.ready = False
 
     def prepare(self):
@@ -270,6 +355,20 @@ class Base(rpmkit.updateinfo.base.Base):
 
         self.ready = True
 
+    def _mk_cmd(self, command, opts=[]):
+        # To avoid unneeded check.
+        cs = _is_root() and ["yum"] or ["fakeroot", "yum"]
+
+        if self.root != '/':
+            cs.append("--installroot=%s" % self.root)
+
+        return cs + self.yum_opts + opts + [command]
+
+    def _logpaths(self, command):
+        command_s = command.replace(' ', '_')
+        return (os.path.join(self.workdir, "yum_%s_log.txt" % command_s),
+                os.path.join(self.workdir, "yum_%s_log.err.txt" % command_s))
+
     def run(self, command, opts=[], fakeroot=False):
         """
         Run yum command and get results.
@@ -278,68 +377,74 @@ class Base(rpmkit.updateinfo.base.Base):
         :param extra_opts: Extra options for yum, e.g. "--skip-broken ..."
         """
         self.prepare()
-
-        # To avoid unneeded check.
-        cs = _is_root() and ["yum"] or ["fakeroot", "yum"]
+        cs = self._mk_cmd(command, opts)
 
         if self.root == '/':  # It will refer the system's RPM DB.
             # NOTE: Users except for root cannot make $root/var/log and write
             # logs so try just logging out to stdout and stderr.
-            cs.extend(opts + [command])
-            (out, err, rc) = _run(cs)
+            (out, err, rc) = _run(cs, timeout=self.timeout)
         else:
-            cs.extend(["--installroot=%s" % self.root] + opts + [command])
-
-            command_s = command.replace(' ', '_')
-            outpath = os.path.join(self.workdir, "yum_%s_log.txt" % command_s)
-            errpath = os.path.join(self.workdir,
-                                   "yum_%s_log.err.txt" % command_s)
-
+            (outpath, errpath) = self._logpaths(command)
             with open(outpath, 'w') as out:
                 with open(errpath, 'w') as err:
-                    (out, err, rc) = _run(cs, out.write, err.write)
+                    (out, err, rc) = _run(cs, out.write, err.write,
+                                          self.timeout)
 
         return (out, err, rc)
 
-    def list_errata_g(self, extra_opts=[]):
+    def run_g(self, command, opts=[], rcs=(0, )):
         """
-        A generator to return errata found in the output result of 'yum
-        list-sec' or 'yum updateinfo list' one by one.
+        Run yum command and yield output lines as soon as yum prints them.
+
+        :param command: Yum sub command, ex. 'list-sec'
+        :param opts: Extra options for yum, e.g. "--skip-broken ..."
+        :param rcs: Exit codes of success
+
+        :raises: subprocess.CalledProcessError if yum failed
         """
-        (outs, errs, rc) = self.run("list-sec", self.repo_opts + extra_opts)
+        self.prepare()
+        cs = self._mk_cmd(command, opts)
 
-        if rc == 0:
-            for line in outs:
-                if _is_errata_line(line):
-                    yield _parse_errata_line(line)
-                else:
-                    LOG.debug("Not errata line: %s" % line.rstrip())
+        if self.root == '/':  # see :method:`run`
+            for line in _run_g(cs, timeout=self.timeout, rcs=rcs):
+                yield line
         else:
-            LOG.error("Failed to fetch the errata list: %s" % ''.join(errs))
+            (outpath, errpath) = self._logpaths(command)
+            with open(outpath, 'w') as out:
+                with open(errpath, 'w') as err:
+                    for line in _run_g(cs, err.write, self.timeout, rcs):
+                        out.write(line)
+                        yield line
+
+    def list_errata_g(self, extra_opts=[]):
+        """
+        A generator to return errata found in the output result of 'yum
+        list-sec' or 'yum updateinfo list' one by one, as soon as yum prints
+        them.
+
+        :raises: subprocess.CalledProcessError if yum failed, after errata
+            found were yielded, so that callers do not take them as all
+        """
+        lines = self.run_g("list-sec", self.repo_opts + extra_opts)
+        for errata in _errata_g(lines):
+            yield errata
 
     def list_updates_g(self, extra_opts=[]):
         """
         A generator to return updates found in the output result of
-        'yum check-update'.
-        """
-        (outs, errs, rc) = self.run("check-update",
-                                    self.repo_opts + extra_opts)
+        'yum check-update' as soon as yum prints them.
 
+        :raises: subprocess.CalledProcessError if yum failed, see
+            :method:`list_errata_g`
+        """
         # NOTE: 'yum check-update' looks returning non-zero exit code
         # (e.g. 100) when there are any updates found.
         #
         # see also: /usr/share/yum-cli/yummain.py#main
-        if rc in (0, 100):
-            for line in outs:
-                if line:
-                    line = line.rstrip()
-                    p = _parse_update_line(line)
-                    if p:
-                        yield p
-                    else:
-                        LOG.debug("Not errata line: %s" % line)
-        else:
-            LOG.error("Failed to fetch the updates list: %s" % ''.join(errs))
+        lines = self.run_g("check-update", self.repo_opts + extra_opts,
+                           (0, 100))
+        for p in _updates_g(lines):
+            yield p
 
     def list_installed(self):
         raise NotImplementedError("list_installed")
@@ -349,6 +454,7 @@ class Base(rpmkit.updateinfo.base.Base):
         Method wraps "yum list-sec" / "yum updateinfo list".
 
         :return: List of dicts of errata info
+        :raises: subprocess.CalledProcessError if yum failed
         """
         return list(self.list_errata_g())
 
@@ -357,6 +463,7 @@ class Base(rpmkit.updateinfo.base.Base):
         Method wraps "yum check-update".
 
         :return: List of dicts of errata info
+        :raises: subprocess.CalledProcessError if yum failed
         """
         return list(itertools.ifilter(None, self.list_updates_g()))
 
@@ -395,4 +502,130 @@ class Base(rpmkit.updateinfo.base.Base):
 
         return rc in (0, 1)
 
+
+# :: (result key, yum command, parser of outputs, exit codes of success)
+_JOB_COMMANDS = (("errata", "list-sec", _errata_g, (0, )),
+                 ("updates", "check-update", _updates_g, (0, 100)))
+
+
+def run_job(job, timeout=None, retries=0, cacheonly=False):
+    """
+    Run 'yum list-sec' and 'yum check-update' for a host. Each command is
+    retried up to `retries` times if it fails or times out.
+
+    :param job: A dict represents a job, {id, root, repos, disabled_repos,
+        workdir, cachedir} where keys other than 'id' and 'root' are optional.
+        Yum uses its cache dir under `root` unless 'cachedir' is given so that
+        jobs of different hosts do not share (and lock) cache dirs.
+    :param timeout: Timeout of each yum command in seconds or None
+    :param retries: Number of retries of each yum command
+    :param cacheonly: Run yum only from the cache (-C) if True
+
+    :return: A dict of {id, errata, updates, error, elapsed} where error is
+        None if all commands succeeded or an error message
+    """
+    start = time.time()
+    base = Base(job["root"], job.get("repos", []),
+                job.get("disabled_repos", ['*']), job.get("workdir"),
+                timeout=timeout, cachedir=job.get("cachedir"),
+                cacheonly=cacheonly)
+    result = dict(id=job["id"], errata=[], updates=[], error=None)
+
+    try:
+        for key, command, parse, rcs in _JOB_COMMANDS:
+            last_error = None
+            for ntry in range(retries + 1):
+                try:
+                    lines = base.run_g(command, base.repo_opts, rcs)
+                    result[key] = list(parse(lines))
+                    break
+                except subprocess.CalledProcessError as exc:
+                    last_error = exc
+                    LOG.warn("%s: '%s' failed (exit code: %d, try: %d/%d)",
+                             job["id"], command, exc.returncode, ntry + 1,
+                             retries + 1)
+            else:
+                result["error"] = "'%s' failed: %s" % (command,
+                                                       last_error.output)
+                break
+    except Exception as exc:
+        LOG.error("%s: Failed to run yum: %s", job["id"], exc)
+        result["error"] = str(exc)
+
+    result["elapsed"] = time.time() - start
+    return result
+
+
+def _repos_key(job):
+    return (tuple(job.get("repos", [])),
+            tuple(job.get("disabled_repos", ['*'])))
+
+
+def setup_shared_cache(jobs, cachedir, timeout=None):
+    """
+    Refresh the shared cache once per set of repos with the first job's root
+    and link roots of all jobs to it.
+
+    :param jobs: A list of jobs, see :function:`run_job`
+    :param cachedir: Shared cache dir
+    :param timeout: Timeout of yum in seconds or None
+
+    :return: A list of jobs of which repos were refreshed successfully
+    """
+    refreshed = dict()
+    for job in jobs:
+        key = _repos_key(job)
+        if key not in refreshed:
+            LOG.info("Refresh the shared cache %s for repos: %s", cachedir,
+                     ', '.join(key[0]))
+            (repos, disabled_repos) = key
+            refreshed[key] = refresh_shared_cache(job["root"], cachedir,
+                                                  list(repos),
+                                                  list(disabled_repos),
+                                                  job.get("workdir"), timeout)
+
+    ok_jobs = [j for j in jobs if refreshed[_repos_key(j)]]
+    for job in ok_jobs:
+        rpmkit.yum_makelistcache.setup_shared_cache(job["root"], cachedir)
+
+    return ok_jobs
+
+
+def run_jobs_g(jobs, nworkers=NWORKERS, timeout=None, retries=0,
+               shared_cachedir=None):
+    """
+    Run jobs with at most `nworkers` yum processes running concurrently and
+    yield results in order of completion.
+
+    :param jobs: An iterable yields jobs, see :function:`run_job`
+    :param nworkers: Max number of jobs run concurrently
+    :param timeout: Timeout of each yum command in seconds or None
+    :param retries: Number of retries of each yum command
+    :param shared_cachedir: Shared cache dir or None. If given, repo metadata
+        is downloaded into it only once and jobs read it with -C, instead of
+        downloading it into each host's root.
+
+    :return: A generator yields results of jobs, see :function:`run_job`
+    """
+    cacheonly = shared_cachedir is not None
+    if cacheonly:
+        jobs = list(jobs)
+        ok_jobs = setup_shared_cache(jobs, shared_cachedir, timeout)
+        for job in jobs:
+            if job not in ok_jobs:
+                yield dict(id=job["id"], errata=[], updates=[], elapsed=0,
+                           error="Failed to refresh the shared cache")
+        jobs = ok_jobs
+
+    pool = multiprocessing.pool.ThreadPool(nworkers)
+    try:
+        for result in pool.imap_unordered(lambda job: run_job(job, timeout,
+                                                              retries,
+                                                              cacheonly),
+                                          jobs):
+            yield result
+    finally:
+        pool.terminate()
+        pool.join()
+
 # vim:sw=4:ts=4:et:
@@ -21,6 +21,7 @@
 from itertools import izip, takewhile
 
 import codecs
+import csv
 import datetime
 import itertools
 import logging
@@ -143,6 +144,69 @@ def _flatten(xss):
         return [xss]
 
 
+def _canonical_key(x):
+    """
+    Make a hash-able key from ``x`` compared equally if and only if the
+    original objects equal each other. Dicts, lists and sets in ``x`` may be
+    nested.
+
+    >>> _canonical_key("aaa")
+    'aaa'
+    >>> _canonical_key(dict(b=[1, 2], a=dict(c=None)))  # doctest: +ELLIPSIS
+    (<type 'dict'>, (('a', (<type 'dict'>, (('c', None),))), ('b', (<...
+    >>> _canonical_key([1, 2]) == _canonical_key((1, 2))
+    False
+    """
+    if isinstance(x, dict):
+        return (dict, tuple(sorted((k, _canonical_key(v)) for k, v
+                                   in x.iteritems())))
+    if isinstance(x, list):
+        return (list, tuple(_canonical_key(y) for y in x))
+    if isinstance(x, tuple):
+        return tuple(_canonical_key(y) for y in x)
+    if isinstance(x, (set, frozenset)):
+        return frozenset(_canonical_key(y) for y in x)
+
+    return x
+
+
+def unique_g(xs, key=None):
+    """
+    Yield unique items in ``xs`` in order of appearance. Items are compared
+    with hash-able canonical keys made from them so that it runs in O(n) even
+    if items are dicts or lists.
+
+    NOTE: Objects defining __eq__ but keeping the default hash based on their
+    identity are compared by that hash, so equal ones are not made unique;
+    pass ``key`` to compare them by their values.
+
+    :param xs: Any iterables such as a list, tuple and generator.
+    :param key: Function to compute the value to compare items with, or None
+        to compare items themselves.
+
+    >>> list(unique_g([0, 3, 1, 2, 1, 0, 4, 5]))
+    [0, 3, 1, 2, 4, 5]
+    >>> list(unique_g([dict(a=1, b=[1]), dict(b=[1], a=1), dict(a=2)]))
+    [{'a': 1, 'b': [1]}, {'a': 2}]
+    >>> list(unique_g(["a", "B", "A"], key=str.lower))
+    ['a', 'B']
+    """
+    seen = set()
+    others = []  # Keys still not hash-able, e.g. objects having __eq__ only.
+    for x in xs:
+        k = _canonical_key(x if key is None else key(x))
+        try:
+            if k in seen:
+                continue
+            seen.add(k)
+        except TypeError:
+            if k in others:
+                continue
+            others.append(k)
+
+        yield x
+
+
 def unique_(xs, sort=True, cmp=None, key=None, reverse=False, use_set=False):
     """
     Returns new list of no duplicated items.
@@ -153,9 +217,11 @@ def unique_(xs, sort=True, cmp=None, key=None, reverse=False, use_set=False):
         if ``sort`` is True.
     :param reverse: Sorted result list reversed if ``sort`` is True.
     :param use_set: Use :function:`set` to make unique items set if True.
-        It's much faster than naive implementation but items must be hash-able
-        objects as :function:`set` requires this as its inputs. Also, result
-        list will be sorted even if ``sort`` is not True in this case.
+        Items must be hash-able objects as :function:`set` requires this as
+        its inputs. Also, result list will be sorted even if ``sort`` is not
+        True in this case.
+
+    See :function:`unique_g` also about how items are compared.
 
     >>> unique_([])
     []
@@ -167,15 +233,13 @@ def unique_(xs, sort=True, cmp=None, key=None, reverse=False, use_set=False):
     [0, 3, 1, 2, 4, 5]
     >>> unique_((0, 3, 1, 2, 1, 0, 4, 5), sort=False)
     [0, 3, 1, 2, 4, 5]
+    >>> unique_([dict(a=1), dict(a=0), dict(a=1)], key=lambda d: d["a"])
+    [{'a': 0}, {'a': 1}]
     """
     if use_set:
         return sorted(set(xs), cmp=cmp, key=key, reverse=reverse)
 
-    acc = []
-    for x in xs:
-        if x not in acc:
-            acc.append(x)
-
+    acc = list(unique_g(xs))
     return sorted(acc, cmp=cmp, key=key, reverse=reverse) if sort else acc
 
 
@@ -403,6 +467,181 @@ def json_dump(data, filepath):
     json.dump(data, copen(filepath, 'w'))
 
 
+_JSON_WS_REG = re.compile(r"\s*")
+
+
+class _JSONReader(object):
+    """
+    Read JSON tokens and values from a file object incrementally.
+    """
+
+    def __init__(self, inp, bufsize=65536, wsreg=_JSON_WS_REG):
+        """
+        :param inp: Input file object
+        :param bufsize: Size to read from ``inp`` at once at least
+        """
+        self.inp = inp
+        self.bufsize = bufsize
+        self.wsreg = wsreg
+        self.decoder = json.JSONDecoder()
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self, size):
+        """
+        Read more data and drop data already consumed from the buffer.
+
+        :return: False if no more data to read else True
+        """
+        data = self.inp.read(size)
+        if not data:
+            self.eof = True
+            return False
+
+        (self.buf, self.pos) = (self.buf[self.pos:] + data, 0)
+        return True
+
+    def peek(self):
+        """
+        :return: Next char after white spaces or '' if it reached EOF
+        """
+        while True:
+            self.pos = self.wsreg.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+
+            if not self._fill(self.bufsize):
+                return ''
+
+    def expect(self, chars):
+        """
+        Consume next char after white spaces which must be one of ``chars``.
+
+        :return: The char consumed
+        """
+        char = self.peek()
+        if not char or char not in chars:
+            raise ValueError("Expected one of %r but got %r" % (chars, char))
+
+        self.pos += 1
+        return char
+
+    def decode(self):
+        """
+        Decode next JSON value after white spaces. Data is read until the
+        whole value is in the buffer and the size to read is doubled every
+        time not to decode the same data again and again.
+
+        :return: The JSON value decoded
+        """
+        self.peek()
+        while True:
+            try:
+                (obj, end) = self.decoder.raw_decode(self.buf, self.pos)
+                # Number, etc. may continue in the next chunk.
+                if end < len(self.buf) or self.eof:
+                    self.pos = end
+                    return obj
+            except ValueError:
+                if self.eof:
+                    raise
+
+            self._fill(max(self.bufsize, len(self.buf) - self.pos))
+
+
+def json_load_g(inp, key=None, bufsize=65536):
+    """
+    Load items of a JSON list from ``inp`` one by one without loading all of
+    them on memory. Values of other keys before ``key`` in the top level JSON
+    object are decoded and discarded.
+
+    :param inp: Input file object
+    :param key: Key of the list in the top level JSON object, or None if the
+        top level JSON data is the list
+    :param bufsize: Size to read from ``inp`` at once
+
+    :return: A generator to yield items in the list
+
+    >>> import StringIO
+    >>> inp = StringIO.StringIO('{"data": [{"a": 0}, {"a": "]"}, [1, 2]]}')
+    >>> list(json_load_g(inp, "data", 4))
+    [{u'a': 0}, {u'a': u']'}, [1, 2]]
+    >>> list(json_load_g(StringIO.StringIO(" [ ] ")))
+    []
+    >>> inp = StringIO.StringIO('{"a": {"data": [0]}, "b": ["data", [1]], '
+    ...                         '"data": [2, 3]}')
+    >>> list(json_load_g(inp, "data", 3))
+    [2, 3]
+    """
+    reader = _JSONReader(inp, bufsize)
+
+    if key is not None:
+        reader.expect('{')
+        while reader.peek() == '"':
+            if reader.decode() == key:
+                reader.expect(':')
+                break
+
+            reader.expect(':')
+            reader.decode()  # Skip the value of other key.
+            if reader.expect(",}") == '}':
+                raise ValueError("List was not found in JSON data")
+        else:
+            raise ValueError("List was not found in JSON data")
+
+    if reader.expect('[') and reader.peek() == ']':
+        return
+
+    while True:
+        yield reader.decode()
+        if reader.expect(",]") == ']':
+            return
+
+
+def json_dump_g(xs, out):
+    """
+    Dump items from given iterable ``xs`` into ``out`` as a JSON list one by
+    one without loading all of them on memory.
+
+    :param xs: Any iterables such as a list, tuple and generator
+    :param out: Output file object
+
+    >>> import StringIO
+    >>> out = StringIO.StringIO()
+    >>> json_dump_g((dict(a=i) for i in range(3)), out)
+    >>> json.loads(out.getvalue())
+    [{u'a': 0}, {u'a': 1}, {u'a': 2}]
+    """
+    out.write('[')
+    for i, x in enumerate(xs):
+        if i:
+            out.write(", ")
+        out.write(json.dumps(x))
+    out.write("]\n")
+
+
+def csv_dump_g(xs, out, keys):
+    """
+    Dump dicts from given iterable ``xs`` into ``out`` in CSV format one by
+    one with a header line of ``keys``.
+
+    :param xs: Any iterables of dicts such as a list, tuple and generator
+    :param out: Output file object
+    :param keys: Keys of dicts to dump as columns
+
+    >>> import StringIO
+    >>> out = StringIO.StringIO()
+    >>> csv_dump_g((dict(a=i, b=None) for i in range(2)), out, ("a", "b"))
+    >>> out.getvalue().splitlines()
+    ['a,b', '0,', '1,']
+    """
+    writer = csv.writer(out)
+    writer.writerow(keys)
+    for x in xs:
+        writer.writerow([x.get(k) for k in keys])
+
+
 def select_from_list_g(xs, ref_xs=[]):
     """
     Filter out xs not in ref_xs and select only xs found in ref_xs one by one.
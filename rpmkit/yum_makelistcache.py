@@ -25,6 +25,8 @@ import optparse
 import os.path
 import os
 import re
+import signal
+import subprocess
 import sys
 import yum
 
@@ -154,6 +156,45 @@ def setup_root(root, readonly=True):
     return True
 
 
+CACHE_SUBDIR = "var/cache/yum"
+
+
+def setup_shared_cache(root, cachedir, subdir=CACHE_SUBDIR):
+    """
+    Make yum's cache dir under ``root`` a symlink to the shared cache dir
+    ``cachedir`` so that repo metadata is downloaded only once and shared
+    among roots instead of being kept in each root.
+
+    :param root: The pivot root directry where target's RPM DB files exist.
+        The system's cache dir is kept as it is if it's '/'.
+    :param cachedir: Shared cache dir
+    :param subdir: Yum's cache dir relative to ``root``
+    """
+    if os.path.abspath(root) == '/':
+        LOG.warn("Not link the system's cache dir to " + cachedir)
+        return
+
+    path = os.path.join(root, subdir)
+    cachedir = os.path.abspath(cachedir)
+
+    if os.path.islink(path):
+        if os.path.realpath(path) == os.path.realpath(cachedir):
+            return
+
+        os.remove(path)
+    elif os.path.exists(path):
+        LOG.info("Keep the original cache dir as %s.save" % path)
+        os.rename(path, path + ".save")
+    elif not os.path.exists(os.path.dirname(path)):
+        os.makedirs(os.path.dirname(path))
+
+    if not os.path.exists(cachedir):
+        os.makedirs(cachedir)
+
+    LOG.info("Use the shared cache dir: " + cachedir)
+    os.symlink(cachedir, path)
+
+
 def noop(*args, **kwargs):
     pass
 
@@ -183,7 +224,7 @@ _PKG_NARROWS = ("installed", "updates", "obsoletes")
 
 
 def yum_list(root, enablerepos=[], disablerepos=['*'],
-             pkgnarrows=_PKG_NARROWS):
+             pkgnarrows=_PKG_NARROWS, cacheonly=False):
     """
     List installed or update RPMs similar to
     "repoquery --pkgnarrow=updates --all --plugins --qf '%{nevra}'".
@@ -192,6 +233,7 @@ def yum_list(root, enablerepos=[], disablerepos=['*'],
     :param enablerepos: List of Yum repos to enable
     :param disablerepos: List of Yum repos to disable
     :param pkgnarrows: List of types to narrrow packages list
+    :param cacheonly: Run entirely from the cache (same as yum -C) if True
 
     :return: A dict contains lists of dicts of packages
     """
@@ -202,6 +244,9 @@ def yum_list(root, enablerepos=[], disablerepos=['*'],
     except:
         base.conf.installroot = root
 
+    if cacheonly:
+        base.conf.cache = 1
+
     base.logger = base.verbose_logger = LOG
     _activate_repos(base, enablerepos, disablerepos)
 
@@ -351,32 +396,67 @@ def _run(cmd, output=None, curdir=os.curdir):
     return (rc, rc == 0 and '' or out)
 
 
+class YumError(RuntimeError):
+    """Yum exited with errors."""
+    pass
+
+
+def _terminate(proc):
+    """
+    Kill the process group of ``proc``, the shell and yum run from it, and
+    wait for it.
+    """
+    try:
+        os.killpg(proc.pid, signal.SIGTERM)
+    except OSError:  # It has already gone.
+        pass
+
+    proc.wait()
+
+
 def list_errata_g(root, opts=[], dist=None):
     """
     A generator to return errata found in the output result of 'yum list-sec'
-    one by one.
+    one by one, as soon as yum prints them. Outputs are also saved in the log
+    file line by line.
 
     :param root: Pivot root dir where var/lib/rpm/ exist.
     :param opts: Extra options for yum, e.g. "--enablerepo='...' ..."
     :param dist: Distribution name or None
+
+    :raises: YumError if yum failed, after errata found were yielded, so that
+        callers do not take them as all
     """
     cs = ["yum", "--installroot=" + root] + opts + ["list-sec"]
     output = logpath(root, "yum_list-sec.log")
-    (rc, err) = _run(cs, output)
+    reg = _reg_by_dist()
 
-    if rc == 0:
-        lines = open(output).readlines()
-        reg = _reg_by_dist()
+    LOG.info("Run '%s'" % ' '.join(cs))
+    proc = subprocess.Popen(' '.join(cs), shell=True, stdout=subprocess.PIPE,
+                            stderr=subprocess.STDOUT, preexec_fn=os.setsid)
+    out = open(output, 'w')
 
-        for line in lines:
+    # NOTE: Older python (2.4.x in RHEL 5) does not allow yield in try
+    # clauses having finally clauses.
+    try:
+        for line in iter(proc.stdout.readline, ''):
+            out.write(line)
             line = line.rstrip()
             if _is_errata_line(line, reg):
                 # LOG.debug("Errata line: " + line)
                 yield parse_errata_line(line)
             else:
                 LOG.debug("Not errata line: " + line)
-    else:
-        LOG.error("Failed to fetch the errata list: " + err)
+    except:  # Stopped in the middle, e.g. GeneratorExit.
+        out.close()
+        proc.stdout.close()
+        _terminate(proc)
+        raise
+
+    out.close()
+    proc.stdout.close()
+    if proc.wait() != 0:
+        raise YumError("Failed to fetch the errata list. See " + output)
 
 
 def _mk_repo_opts(enablerepos, disablerepos):
@@ -389,20 +469,45 @@ def _mk_repo_opts(enablerepos, disablerepos):
            ["--enablerepo='%s'" % repo for repo in enablerepos]
 
 
-def yum_list_errata(root, enablerepos=[], disablerepos=['*']):
+def yum_list_errata(root, enablerepos=[], disablerepos=['*'],
+                    cacheonly=False):
     """
     List errata similar to "yum list-sec".
 
     :param root: RPM DB root dir in absolute path
     :param enablerepos: List of Yum repos to enable
     :param disablerepos: List of Yum repos to disable
+    :param cacheonly: Run entirely from the cache (yum -C) if True
 
     :return: List of dicts contain each errata info
     """
     opts = _mk_repo_opts(enablerepos, disablerepos)
+    if cacheonly:
+        opts.append("-C")
+
     return list(list_errata_g(root, opts))
 
 
+def yum_makecache(root, enablerepos=[], disablerepos=['*']):
+    """
+    Download and make metadata cache of repos similar to "yum makecache".
+
+    :param root: RPM DB root dir in absolute path
+    :param enablerepos: List of Yum repos to enable
+    :param disablerepos: List of Yum repos to disable
+
+    :return: True if success else False
+    """
+    opts = _mk_repo_opts(enablerepos, disablerepos)
+    cs = ["yum", "--installroot=" + root] + opts + ["makecache"]
+
+    (rc, err) = _run(cs, logpath(root, "yum_makecache.log"))
+    if rc != 0:
+        LOG.error("Failed to make the cache: " + err)
+
+    return rc == 0
+
+
 def _is_root():
     return os.getuid() == 0
 
@@ -561,11 +666,22 @@ Examples:
   # --downloadonly':
   %prog --disablerepo='*' --enablerepo='rhel-x86_64-server-6' \\
      --root=/var/lib/yum_makelistcache/root.d/aaa --download
+
+  # Refresh the metadata cache shared among roots once and then make lists
+  # of each root only from the shared cache:
+  %prog --disablerepo='*' --enablerepo='rhel-x86_64-server-6' \\
+     --root=/var/lib/yum_makelistcache/root.d/aaa \\
+     --cachedir=/var/lib/yum_makelistcache/cache --makecache
+  for root in /var/lib/yum_makelistcache/root.d/*; do \\
+    %prog --disablerepo='*' --enablerepo='rhel-x86_64-server-6' \\
+      --root=$root --cachedir=/var/lib/yum_makelistcache/cache --cacheonly; \\
+  done
 """
 
 _DEFAULTS = dict(root=os.curdir, log=False,
                  enablerepos=[], disablerepos=[], download=False,
-                 downloaddir=None, conf=None, outdir=None,
+                 downloaddir=None, cachedir=None, cacheonly=False,
+                 makecache=False, conf=None, outdir=None,
                  header_file=None, verbosity=0)
 
 
@@ -595,6 +711,15 @@ def option_parser(usage=_USAGE, defaults=_DEFAULTS):
     p.add_option("", "--downloaddir",
                  help="Dir to save update RPMs downloaded")
 
+    p.add_option("", "--cachedir",
+                 help="Metadata cache dir shared among roots. <root>/"
+                      "var/cache/yum will be a symlink to it")
+    p.add_option("", "--cacheonly", action="store_true",
+                 help="Run entirely from the cache without updating it, "
+                      "same as yum -C")
+    p.add_option("", "--makecache", action="store_true",
+                 help="Only refresh the metadata cache and exit")
+
     p.add_option("-C", "--conf", help="Specify .ini style config file path")
     p.add_option("-O", "--outdir",
                  help="Specify outputs dir, ex. '/tmp/root/sys_a/' "
@@ -631,16 +756,33 @@ def main(argv=sys.argv, pkgnarrows=_PKG_NARROWS):
         LOG.info("Log will be saved to: " + logfile)
         LOG.addHandler(logging.FileHandler(logfile))
 
+    if options.cachedir:
+        setup_shared_cache(options.root, options.cachedir)
+
+    if options.makecache:
+        ok = yum_makecache(options.root, options.enablerepos,
+                           options.disablerepos)
+        if not ok:
+            sys.exit(1)
+
+        sys.exit(0)
+
     if not options.outdir:
         options.outdir = os.path.join(options.root, "var/log")
 
     # Get errata list:
-    es = yum_list_errata(options.root, options.enablerepos,
-                         options.disablerepos)
+    try:
+        es = yum_list_errata(options.root, options.enablerepos,
+                             options.disablerepos, options.cacheonly)
+    except YumError:
+        LOG.error(str(sys.exc_info()[1]))
+        sys.exit(1)
+
     outputs_result(es, options.outdir, "errata", options.header_file)
 
     # Get installed and update rpms list:
-    pkgs = yum_list(options.root, options.enablerepos, options.disablerepos)
+    pkgs = yum_list(options.root, options.enablerepos, options.disablerepos,
+                    cacheonly=options.cacheonly)
 
     for narrow in pkgnarrows:
         pdicts = _pkgs2dicts(pkgs[narrow])
@@ -18,6 +18,7 @@ import rpmkit.updateinfo.yumwrapper as RUY
 
 import logging
 import optparse
+import subprocess
 import sys
 
 try:
@@ -181,7 +182,12 @@ def main(argv=sys.argv, fmtble_cmds=_FORMATABLE_COMMANDS):
         if f is None:
             run_yum_cmd(root, ' '.join(yum_argv))
         else:
-            res = [x for x in f(root, *yum_argv)]
+            try:
+                res = [x for x in f(root, *yum_argv)]
+            except subprocess.CalledProcessError as exc:
+                logging.error("yum failed: %s" % exc.output)
+                sys.exit(exc.returncode)
+
             json.dump(res, sys.stdout, indent=2)
             print
     else: